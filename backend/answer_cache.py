@@ -0,0 +1,165 @@
+"""
+OpenHire — Semantic Answer Cache
+================================
+Caches Claude answers to policy-only chat questions so repeated FAQs
+("how many days can I work remotely?") skip the LLM call entirely.
+
+An entry is only reused when all of these match:
+  - the user role (answers are role-aware),
+  - the exact set of retrieved policy chunk IDs,
+  - the question embedding, by cosine similarity >= threshold.
+
+Entries expire after a TTL and the cache is LRU-bounded. Call
+`invalidate()` whenever the policy collection is re-ingested.
+"""
+
+import os
+import re
+import math
+import time
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+CACHE_MAX_ENTRIES = int(os.getenv("CHAT_CACHE_MAX_ENTRIES", "512"))
+CACHE_TTL_SECONDS = float(os.getenv("CHAT_CACHE_TTL_SECONDS", "3600"))
+CACHE_SIMILARITY_THRESHOLD = float(os.getenv("CHAT_CACHE_SIMILARITY", "0.92"))
+
+
+def normalize_question(text: str) -> str:
+    """Lowercase, strip punctuation and collapse whitespace."""
+    text = re.sub(r"[^\w\s]", " ", text.lower())
+    return " ".join(text.split())
+
+
+def _unit(vector) -> tuple[float, ...]:
+    """Return the L2-normalized embedding as a plain tuple of floats."""
+    values = [float(v) for v in vector]
+    norm = math.sqrt(sum(v * v for v in values)) or 1.0
+    return tuple(v / norm for v in values)
+
+
+class SemanticAnswerCache:
+    """Thread-safe LRU + TTL cache of chat answers keyed by question meaning."""
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES,
+                 ttl_seconds: float = CACHE_TTL_SECONDS,
+                 similarity_threshold: float = CACHE_SIMILARITY_THRESHOLD):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[int, dict] = OrderedDict()
+        self._buckets: dict[tuple, set[int]] = {}
+        self._next_id = 0
+        self._generation = 0
+        self._hits = 0
+        self._misses = 0
+        self._stores = 0
+        self._evictions = 0
+        self._invalidations = 0
+        self._saved_latency = 0.0
+
+    @staticmethod
+    def _bucket_key(role: str, chunk_ids: list[str]) -> tuple:
+        return (role, tuple(sorted(chunk_ids)))
+
+    def _drop(self, entry_id: int):
+        entry = self._entries.pop(entry_id, None)
+        if entry is None:
+            return
+        bucket = self._buckets.get(entry["bucket"])
+        if bucket is not None:
+            bucket.discard(entry_id)
+            if not bucket:
+                del self._buckets[entry["bucket"]]
+
+    def lookup(self, question: str, embedding, chunk_ids: list[str], role: str) -> Optional[dict]:
+        """Return the cached answer payload for a semantically equal question, or None."""
+        key = self._bucket_key(role, chunk_ids)
+        normalized = normalize_question(question)
+        query = _unit(embedding)
+        now = time.monotonic()
+
+        with self._lock:
+            best_id, best_score = None, -1.0
+            for entry_id in list(self._buckets.get(key, ())):
+                entry = self._entries[entry_id]
+                if entry["expires_at"] <= now:
+                    self._drop(entry_id)
+                    continue
+                if entry["question"] == normalized:
+                    best_id, best_score = entry_id, 1.0
+                    break
+                score = sum(a * b for a, b in zip(query, entry["embedding"]))
+                if score > best_score:
+                    best_id, best_score = entry_id, score
+
+            if best_id is None or best_score < self.similarity_threshold:
+                self._misses += 1
+                return None
+
+            self._entries.move_to_end(best_id)
+            entry = self._entries[best_id]
+            entry["hits"] += 1
+            self._hits += 1
+            self._saved_latency += entry["llm_latency"]
+            return dict(entry["answer"])
+
+    @property
+    def generation(self) -> int:
+        """Bumped on every invalidation; pass it back to `store` to reject stale answers."""
+        return self._generation
+
+    def store(self, question: str, embedding, chunk_ids: list[str], role: str,
+              answer: dict, llm_latency: float, generation: Optional[int] = None):
+        """Cache an answer payload together with the LLM time it cost to produce."""
+        key = self._bucket_key(role, chunk_ids)
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                # Policies were re-ingested while this answer was being generated
+                return
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = {
+                "bucket": key,
+                "question": normalize_question(question),
+                "embedding": _unit(embedding),
+                "answer": dict(answer),
+                "llm_latency": llm_latency,
+                "expires_at": time.monotonic() + self.ttl_seconds,
+                "hits": 0,
+            }
+            self._buckets.setdefault(key, set()).add(entry_id)
+            self._stores += 1
+
+            while len(self._entries) > self.max_entries:
+                oldest_id = next(iter(self._entries))
+                self._drop(oldest_id)
+                self._evictions += 1
+
+    def invalidate(self):
+        """Drop every entry (e.g. after the policy collection is re-ingested)."""
+        with self._lock:
+            self._entries.clear()
+            self._buckets.clear()
+            self._generation += 1
+            self._invalidations += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "similarity_threshold": self.similarity_threshold,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0,
+                "stores": self._stores,
+                "evictions": self._evictions,
+                "invalidations": self._invalidations,
+                "generation": self._generation,
+                "saved_llm_seconds": round(self._saved_latency, 3),
+            }
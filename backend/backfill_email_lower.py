@@ -0,0 +1,58 @@
+"""
+One-off backfill: add the normalized `email_lower` field to every employee.
+
+The backend looks employees up with a single indexed equality query on
+`email_lower` (maintained automatically for rows written through
+server.py). Run this once for rows created before that, or by other
+writers such as the seed scripts.
+
+Usage: python backend/backfill_email_lower.py
+"""
+
+import os
+from dotenv import load_dotenv
+import firebase_admin
+from firebase_admin import credentials, firestore
+
+load_dotenv()
+
+# Initialize Firebase
+_sa_path = os.getenv("FIREBASE_SERVICE_ACCOUNT_PATH", "firebase-service-account.json")
+if not os.path.exists(_sa_path):
+    _sa_path = os.path.join(os.path.dirname(__file__), _sa_path)
+
+if not firebase_admin._apps:
+    cred = credentials.Certificate(_sa_path)
+    firebase_admin.initialize_app(cred)
+
+db = firestore.client()
+
+BATCH_LIMIT = 500  # Firestore max writes per batch
+
+batch = db.batch()
+pending = 0
+updated = 0
+scanned = 0
+
+for doc in db.collection("employees").stream():
+    scanned += 1
+    data = doc.to_dict()
+    email = data.get("email")
+    if not isinstance(email, str):
+        continue
+    email_lower = email.strip().lower()
+    if data.get("email_lower") == email_lower:
+        continue
+
+    batch.update(doc.reference, {"email_lower": email_lower})
+    pending += 1
+    updated += 1
+    if pending == BATCH_LIMIT:
+        batch.commit()
+        batch = db.batch()
+        pending = 0
+
+if pending:
+    batch.commit()
+
+print(f"Scanned {scanned} employees, set email_lower on {updated}")
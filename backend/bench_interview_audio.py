@@ -0,0 +1,107 @@
+"""
+Micro-benchmark: interview audio relay cost, JSON/base64 frames vs binary frames.
+
+Replays the per-chunk work handle_interview_ws does for one session
+(sockets excluded) and reports CPU milliseconds per second of audio:
+
+  legacy  browser JSON+base64 → json.loads → dict → json.dumps → Gemini
+          Gemini JSON → json.loads → dict → send_json (json.dumps) → browser
+  binary  browser frame → header unpack → base64 into a pre-built envelope → Gemini
+          Gemini JSON → json.loads → base64 decode → header + PCM → browser
+
+Text frames are counted with their UTF-8 decode/encode at the socket,
+as the ASGI server and websockets do. Gemini's replies are JSON on both
+paths, so that json.loads is counted on both.
+
+Usage: python backend/bench_interview_audio.py [seconds of audio]
+"""
+
+import os
+import sys
+import json
+import time
+import base64
+
+from interview_audio import (
+    BYTES_PER_SAMPLE,
+    INPUT_SAMPLE_RATE,
+    OUTPUT_SAMPLE_RATE,
+    pack_audio_frame,
+    pack_audio_frame_b64,
+    realtime_audio_message,
+    unpack_frame,
+)
+
+INPUT_CHUNK_SAMPLES = 1024    # browser ScriptProcessor buffer (~64 ms at 16 kHz)
+OUTPUT_CHUNK_MS = 40          # typical Gemini Live audio part
+
+
+def _inputs(seconds: float):
+    chunk = os.urandom(INPUT_CHUNK_SAMPLES * BYTES_PER_SAMPLE)
+    count = int(seconds * INPUT_SAMPLE_RATE / INPUT_CHUNK_SAMPLES)
+    legacy = json.dumps({"type": "audio", "data": base64.b64encode(chunk).decode("ascii")}).encode("utf-8")
+    binary = pack_audio_frame(chunk, 0)
+    return count, legacy, binary
+
+
+def _outputs(seconds: float):
+    samples = OUTPUT_SAMPLE_RATE * OUTPUT_CHUNK_MS // 1000
+    chunk = os.urandom(samples * BYTES_PER_SAMPLE)
+    count = int(seconds * 1000 / OUTPUT_CHUNK_MS)
+    message = json.dumps({"serverContent": {"modelTurn": {"parts": [
+        {"inlineData": {"mimeType": "audio/pcm;rate=24000", "data": base64.b64encode(chunk).decode("ascii")}},
+    ]}}})
+    return count, message
+
+
+def legacy_input(raw: bytes) -> bytes:
+    msg = json.loads(raw.decode("utf-8"))
+    gemini_msg = {"realtime_input": {"media_chunks": [{"data": msg["data"], "mime_type": "audio/pcm"}]}}
+    return json.dumps(gemini_msg).encode("utf-8")
+
+
+def binary_input(frame: bytes) -> bytes:
+    _, _, pcm = unpack_frame(frame)
+    return realtime_audio_message(pcm).encode("utf-8")
+
+
+def legacy_output(raw: str) -> list[bytes]:
+    response = json.loads(raw)
+    parts = response["serverContent"]["modelTurn"]["parts"]
+    # Starlette's send_json serializes with json.dumps
+    return [json.dumps({"type": "audio", "data": p["inlineData"]["data"]}).encode("utf-8") for p in parts]
+
+
+def binary_output(raw: str, sequence: int = 0) -> list[bytes]:
+    response = json.loads(raw)
+    parts = response["serverContent"]["modelTurn"]["parts"]
+    return [pack_audio_frame_b64(p["inlineData"]["data"], sequence) for p in parts]
+
+
+def _cpu_ms(fn, arg, count: int) -> float:
+    start = time.process_time()
+    for _ in range(count):
+        fn(arg)
+    return (time.process_time() - start) * 1000
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 600.0
+    in_count, in_legacy, in_binary = _inputs(seconds)
+    out_count, out_message = _outputs(seconds)
+
+    rows = [
+        ("input  16 kHz", _cpu_ms(legacy_input, in_legacy, in_count), _cpu_ms(binary_input, in_binary, in_count)),
+        ("output 24 kHz", _cpu_ms(legacy_output, out_message, out_count), _cpu_ms(binary_output, out_message, out_count)),
+    ]
+    rows.append(("total", sum(r[1] for r in rows), sum(r[2] for r in rows)))
+
+    print(f"{seconds:.0f} s of audio per direction; CPU ms per second of audio, one session")
+    print(f"{'direction':<16}{'legacy':>10}{'binary':>10}{'speedup':>10}")
+    for name, legacy, binary in rows:
+        print(f"{name:<16}{legacy / seconds:>10.3f}{binary / seconds:>10.3f}{legacy / binary:>9.1f}x")
+    print(f"bytes on the browser link per input chunk: legacy {len(in_legacy)}, binary {len(in_binary)}")
+
+
+if __name__ == "__main__":
+    main()
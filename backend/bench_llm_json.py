@@ -0,0 +1,213 @@
+"""
+Micro-benchmark: llm_json.parse_llm_json vs the previous resume-analysis helpers.
+
+The legacy functions below are verbatim copies of the nested helpers that
+used to live in server.py's analyze-resume handler. Their repair path
+re-scans the rest of the text for every quote (quadratic) and the
+brace-matching / greedy-regex fallbacks re-parse the same text several
+times; parse_llm_json repairs in one linear pass.
+
+Usage: python backend/bench_llm_json.py [repeats]
+"""
+
+import re
+import sys
+import json
+import timeit
+
+from llm_json import parse_llm_json
+
+
+# ── Legacy helpers (verbatim) ──
+
+def _clean_llm_json(text: str) -> str:
+    """Clean common LLM JSON issues: markdown fences, trailing commas, etc."""
+    # Strip markdown code fences
+    text = re.sub(r'^```(?:json)?\s*\n?', '', text, flags=re.MULTILINE)
+    text = re.sub(r'\n?```\s*$', '', text, flags=re.MULTILINE)
+    text = text.strip()
+    # Remove trailing commas before } or ]
+    text = re.sub(r',\s*([}\]])', r'\1', text)
+    return text
+
+def _repair_json_string(text: str) -> str:
+    """Aggressively repair broken JSON by escaping problematic characters inside string values."""
+    # Replace literal control characters that break JSON
+    text = text.replace('\r\n', '\\n').replace('\r', '\\n').replace('\n', '\\n')
+    text = text.replace('\t', '\\t')
+
+    # Fix unescaped quotes inside JSON string values using a state machine
+    result = []
+    i = 0
+    in_string = False
+    prev_was_backslash = False
+
+    while i < len(text):
+        ch = text[i]
+
+        if prev_was_backslash:
+            result.append(ch)
+            prev_was_backslash = False
+            i += 1
+            continue
+
+        if ch == '\\':
+            result.append(ch)
+            prev_was_backslash = True
+            i += 1
+            continue
+
+        if ch == '"':
+            if not in_string:
+                in_string = True
+                result.append(ch)
+            else:
+                # Check if this quote is a legitimate string terminator
+                # Look ahead: if next non-whitespace is : , } ] or end — it's legit
+                rest = text[i+1:].lstrip()
+                if not rest or rest[0] in ':,}]':
+                    in_string = False
+                    result.append(ch)
+                else:
+                    # It's an unescaped quote inside a string — escape it
+                    result.append('\\"')
+            i += 1
+            continue
+
+        result.append(ch)
+        i += 1
+
+    return ''.join(result)
+
+def _extract_and_parse_object(text: str) -> dict:
+    """Extract JSON object from text, trying multiple strategies."""
+    cleaned = _clean_llm_json(text)
+
+    # Strategy 1: Direct parse
+    try:
+        return json.loads(cleaned)
+    except json.JSONDecodeError:
+        pass
+
+    # Strategy 2: Nested brace matching
+    depth = 0
+    start = None
+    for i, ch in enumerate(cleaned):
+        if ch == '{':
+            if depth == 0:
+                start = i
+            depth += 1
+        elif ch == '}':
+            depth -= 1
+            if depth == 0 and start is not None:
+                candidate = cleaned[start:i+1]
+                try:
+                    return json.loads(candidate)
+                except json.JSONDecodeError:
+                    # Strategy 3: Repair the extracted candidate
+                    try:
+                        repaired = _repair_json_string(candidate)
+                        return json.loads(repaired)
+                    except json.JSONDecodeError:
+                        pass
+                start = None
+
+    # Strategy 4: Greedy regex + repair
+    m = re.search(r'(\{.*\})', cleaned, re.DOTALL)
+    if m:
+        candidate = m.group(1)
+        try:
+            return json.loads(candidate)
+        except json.JSONDecodeError:
+            repaired = _repair_json_string(candidate)
+            try:
+                return json.loads(repaired)
+            except json.JSONDecodeError:
+                pass
+
+    # Strategy 5: Repair entire cleaned text
+    repaired = _repair_json_string(cleaned)
+    try:
+        return json.loads(repaired)
+    except json.JSONDecodeError:
+        pass
+
+    raise json.JSONDecodeError("No valid JSON object found after all repair strategies", text, 0)
+
+def _extract_and_parse_array(raw: str) -> list:
+    """Robustly extract a JSON array from LLM output."""
+    cleaned = _clean_llm_json(raw)
+    try:
+        return json.loads(cleaned)
+    except json.JSONDecodeError:
+        pass
+    m = re.search(r'(\[.*\])', cleaned, re.DOTALL)
+    if m:
+        try:
+            return json.loads(m.group(1))
+        except json.JSONDecodeError:
+            repaired = _repair_json_string(m.group(1))
+            try:
+                return json.loads(repaired)
+            except json.JSONDecodeError:
+                pass
+    raise json.JSONDecodeError("No valid JSON array found", raw, 0)
+
+
+# ── Inputs ──
+
+def _analysis(criteria: int) -> dict:
+    return {
+        "candidate_name": "Jane Doe",
+        "criteria": [
+            {
+                "name": f"Criterion {i}",
+                "score": i % 10,
+                "weight": 10,
+                "evidence": "Led a team of 5 engineers; shipped the payments service. " * 4,
+            }
+            for i in range(criteria)
+        ],
+        "summary": "Strong backend candidate with distributed systems experience.",
+    }
+
+
+def _cases() -> dict[str, tuple[str, str]]:
+    """name -> (expect, raw model output)"""
+    small = json.dumps(_analysis(5), indent=2)
+    large = json.dumps(_analysis(200), indent=2)
+    # Unescaped quotes and raw newlines inside string values
+    broken = large.replace("payments service", 'payments "v2"\nservice')
+    questions = json.dumps([f"Tell me about project {i}, what was \"hard\"?" for i in range(50)], indent=2)
+    return {
+        "clean_small": ("object", small),
+        "fenced_large": ("object", f"```json\n{large}\n```"),
+        "prose_large": ("object", f"Here is the analysis:\n{large}\nLet me know if you need more."),
+        "trailing_commas": ("object", large.replace("\n    }", ",\n    }")),
+        "broken_quotes": ("object", f"```json\n{broken}\n```"),
+        "questions_array": ("array", f"```json\n{questions}\n```"),
+    }
+
+
+def _legacy(expect: str, raw: str):
+    return _extract_and_parse_object(raw) if expect == "object" else _extract_and_parse_array(raw)
+
+
+def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    print(f"{'case':<18}{'bytes':>9}{'legacy ms':>12}{'new ms':>10}{'speedup':>9}")
+    for name, (expect, raw) in _cases().items():
+        try:
+            legacy_ok = _legacy(expect, raw) == parse_llm_json(raw, expect=expect)
+        except json.JSONDecodeError:
+            legacy_ok = False
+        legacy = min(timeit.repeat(lambda: _legacy(expect, raw) if legacy_ok else None, number=1, repeat=repeats))
+        new = min(timeit.repeat(lambda: parse_llm_json(raw, expect=expect), number=1, repeat=repeats))
+        if legacy_ok:
+            print(f"{name:<18}{len(raw):>9}{legacy * 1000:>12.2f}{new * 1000:>10.2f}{legacy / new:>8.1f}x")
+        else:
+            print(f"{name:<18}{len(raw):>9}{'failed':>12}{new * 1000:>10.2f}{'-':>9}")
+
+
+if __name__ == "__main__":
+    main()
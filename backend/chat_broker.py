@@ -0,0 +1,235 @@
+"""
+OpenHire — Chat Pub/Sub Broker
+==============================
+Routes /ws/chat frames between uvicorn workers.
+
+Each worker only holds its own WebSocket connections. The broker tracks
+which worker a user is connected to (presence) and forwards direct
+messages and broadcasts to the right worker(s), which then deliver to
+their local sockets.
+
+Backends:
+  - InMemoryBroker (default): single-process; delivery is a direct call.
+  - RedisBroker: any Redis-compatible server (Redis, Valkey, KeyDB), for
+    multi-worker / multi-host deployments. Enabled by CHAT_BROKER_URL,
+    e.g. redis://localhost:6379/0 or unix:///var/run/redis/redis.sock.
+    Requires the optional `redis` package.
+
+Channels (Redis):
+  openhire:chat:worker:<id>   direct frames for users on that worker
+  openhire:chat:broadcast     frames for every worker
+Presence is a hash user_id → worker id; each worker refreshes a heartbeat
+key so users of a crashed worker stop showing as online.
+"""
+
+import os
+import json
+import uuid
+import asyncio
+from typing import Awaitable, Callable, Optional
+
+BROKER_URL = os.getenv("CHAT_BROKER_URL", "")
+HEARTBEAT_SECONDS = 10
+HEARTBEAT_TTL_SECONDS = 30
+
+DeliverFn = Callable[[str, dict], Awaitable[bool]]
+BroadcastFn = Callable[[dict, Optional[str]], Awaitable[None]]
+
+
+class ChatBroker:
+    """Interface shared by broker backends."""
+
+    worker_id: str = "local"
+
+    async def start(self, deliver: DeliverFn, broadcast: BroadcastFn):
+        """Register the local delivery callbacks and start receiving."""
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+    async def set_online(self, user_id: str):
+        raise NotImplementedError
+
+    async def set_offline(self, user_id: str):
+        raise NotImplementedError
+
+    async def online_users(self) -> list[str]:
+        raise NotImplementedError
+
+    async def publish_direct(self, user_id: str, frame: dict) -> bool:
+        """Route a frame to the worker holding `user_id`; False if the user is offline."""
+        raise NotImplementedError
+
+    async def publish_broadcast(self, frame: dict, exclude: Optional[str] = None):
+        raise NotImplementedError
+
+    def stats(self) -> dict:
+        return {}
+
+
+class InMemoryBroker(ChatBroker):
+    """Single-process broker: presence is a local set, delivery is a direct call."""
+
+    def __init__(self):
+        self._online: set[str] = set()
+        self._deliver: Optional[DeliverFn] = None
+        self._broadcast: Optional[BroadcastFn] = None
+
+    async def start(self, deliver: DeliverFn, broadcast: BroadcastFn):
+        self._deliver, self._broadcast = deliver, broadcast
+
+    async def set_online(self, user_id: str):
+        self._online.add(user_id)
+
+    async def set_offline(self, user_id: str):
+        self._online.discard(user_id)
+
+    async def online_users(self) -> list[str]:
+        return sorted(self._online)
+
+    async def publish_direct(self, user_id: str, frame: dict) -> bool:
+        if user_id not in self._online or self._deliver is None:
+            return False
+        return await self._deliver(user_id, frame)
+
+    async def publish_broadcast(self, frame: dict, exclude: Optional[str] = None):
+        if self._broadcast is not None:
+            await self._broadcast(frame, exclude)
+
+    def stats(self) -> dict:
+        return {"backend": "memory", "worker_id": self.worker_id, "online": len(self._online)}
+
+
+class RedisBroker(ChatBroker):
+    """Redis-compatible pub/sub broker for multiple workers."""
+
+    PREFIX = "openhire:chat"
+
+    def __init__(self, url: str):
+        import redis.asyncio as aioredis  # optional dependency
+
+        self.url = url
+        self.worker_id = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._redis = aioredis.from_url(url, decode_responses=True)
+        self._pubsub = None
+        self._tasks: list[asyncio.Task] = []
+        self._local_users: set[str] = set()
+        self._deliver: Optional[DeliverFn] = None
+        self._broadcast: Optional[BroadcastFn] = None
+        self.published = 0
+        self.received = 0
+
+    @property
+    def _presence_key(self) -> str:
+        return f"{self.PREFIX}:presence"
+
+    def _worker_channel(self, worker_id: str) -> str:
+        return f"{self.PREFIX}:worker:{worker_id}"
+
+    def _heartbeat_key(self, worker_id: str) -> str:
+        return f"{self.PREFIX}:alive:{worker_id}"
+
+    async def start(self, deliver: DeliverFn, broadcast: BroadcastFn):
+        self._deliver, self._broadcast = deliver, broadcast
+        self._pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+        await self._pubsub.subscribe(self._worker_channel(self.worker_id), f"{self.PREFIX}:broadcast")
+        await self._redis.set(self._heartbeat_key(self.worker_id), "1", ex=HEARTBEAT_TTL_SECONDS)
+        self._tasks = [
+            asyncio.create_task(self._listen()),
+            asyncio.create_task(self._heartbeat()),
+        ]
+        print(f"Chat broker connected: {self.url} (worker {self.worker_id})")
+
+    async def close(self):
+        for task in self._tasks:
+            task.cancel()
+        if self._local_users:
+            await self._redis.hdel(self._presence_key, *self._local_users)
+        await self._redis.delete(self._heartbeat_key(self.worker_id))
+        if self._pubsub is not None:
+            await self._pubsub.aclose()
+        await self._redis.aclose()
+
+    async def _heartbeat(self):
+        while True:
+            await asyncio.sleep(HEARTBEAT_SECONDS)
+            try:
+                await self._redis.set(self._heartbeat_key(self.worker_id), "1", ex=HEARTBEAT_TTL_SECONDS)
+            except Exception as e:
+                print(f" Chat broker heartbeat failed: {e}")
+
+    async def _listen(self):
+        async for message in self._pubsub.listen():
+            try:
+                envelope = json.loads(message["data"])
+            except (TypeError, ValueError):
+                continue
+            self.received += 1
+            try:
+                if envelope.get("to"):
+                    await self._deliver(envelope["to"], envelope["frame"])
+                elif envelope.get("origin") != self.worker_id:
+                    await self._broadcast(envelope["frame"], envelope.get("exclude"))
+            except Exception as e:
+                print(f" Chat broker delivery error: {e}")
+
+    async def set_online(self, user_id: str):
+        self._local_users.add(user_id)
+        await self._redis.hset(self._presence_key, user_id, self.worker_id)
+
+    async def set_offline(self, user_id: str):
+        self._local_users.discard(user_id)
+        # Only clear presence we own; the user may have reconnected elsewhere
+        if await self._redis.hget(self._presence_key, user_id) == self.worker_id:
+            await self._redis.hdel(self._presence_key, user_id)
+
+    async def _worker_for(self, user_id: str) -> Optional[str]:
+        worker_id = await self._redis.hget(self._presence_key, user_id)
+        if worker_id and await self._redis.exists(self._heartbeat_key(worker_id)):
+            return worker_id
+        return None
+
+    async def online_users(self) -> list[str]:
+        presence = await self._redis.hgetall(self._presence_key)
+        alive = {}
+        for worker_id in set(presence.values()):
+            alive[worker_id] = bool(await self._redis.exists(self._heartbeat_key(worker_id)))
+        return sorted(uid for uid, worker_id in presence.items() if alive[worker_id])
+
+    async def publish_direct(self, user_id: str, frame: dict) -> bool:
+        worker_id = await self._worker_for(user_id)
+        if worker_id is None:
+            return False
+        if worker_id == self.worker_id:
+            return await self._deliver(user_id, frame)
+        envelope = json.dumps({"to": user_id, "frame": frame, "origin": self.worker_id})
+        self.published += 1
+        return await self._redis.publish(self._worker_channel(worker_id), envelope) > 0
+
+    async def publish_broadcast(self, frame: dict, exclude: Optional[str] = None):
+        # Deliver locally right away; other workers pick it up from the channel
+        await self._broadcast(frame, exclude)
+        envelope = json.dumps({"frame": frame, "exclude": exclude, "origin": self.worker_id})
+        self.published += 1
+        await self._redis.publish(f"{self.PREFIX}:broadcast", envelope)
+
+    def stats(self) -> dict:
+        return {
+            "backend": "redis",
+            "worker_id": self.worker_id,
+            "local_users": len(self._local_users),
+            "published": self.published,
+            "received": self.received,
+        }
+
+
+def create_chat_broker() -> ChatBroker:
+    """RedisBroker when CHAT_BROKER_URL is set (and `redis` is installed), else in-memory."""
+    if not BROKER_URL:
+        return InMemoryBroker()
+    try:
+        return RedisBroker(BROKER_URL)
+    except ImportError as e:
+        print(f"Warning: CHAT_BROKER_URL set but redis client not installed ({e}); using in-memory broker")
+        return InMemoryBroker()
@@ -9,11 +9,12 @@ import os
 import time
 import json
 import base64
-import requests
+import asyncio
 from typing import Optional
 
+import http_clients
+
 # ── Judge0 API config ──────────────────────────────────
-JUDGE0_API_URL = os.getenv("JUDGE0_API_URL", "https://judge0-ce.p.rapidapi.com")
 JUDGE0_API_KEY = os.getenv("JUDGE0_API_KEY", "")
 JUDGE0_API_HOST = os.getenv("JUDGE0_API_HOST", "judge0-ce.p.rapidapi.com")
 
@@ -247,8 +248,6 @@ async def execute_code(code: str, language: str, problem: dict) -> dict:
     # Wrap candidate code with I/O handling
     full_code = wrapper_template.replace("{code}", code)
 
-    import asyncio
-
     async def _run_test_case(i: int, tc: dict) -> dict:
         try:
             payload = {
@@ -260,16 +259,13 @@ async def execute_code(code: str, language: str, problem: dict) -> dict:
                 "memory_limit": 128000,
             }
 
-            # Run synchronous requests.post in a background thread to allow concurrency
-            def _post():
-                return requests.post(
-                    f"{JUDGE0_API_URL}/submissions?base64_encoded=true&wait=true",
-                    json=payload,
-                    headers=_judge0_headers(),
-                    timeout=30,
-                )
-            
-            resp = await asyncio.to_thread(_post)
+            # Shared keep-alive pool to Judge0 (capped at JUDGE0_MAX_CONCURRENCY)
+            resp = await http_clients.request(
+                "judge0", "POST", "/submissions",
+                params={"base64_encoded": "true", "wait": "true"},
+                json=payload,
+                headers=_judge0_headers(),
+            )
 
             if resp.status_code != 200 and resp.status_code != 201:
                 return {
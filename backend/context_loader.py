@@ -0,0 +1,131 @@
+"""
+OpenHire — Request-Scoped Batched Data Loader
+=============================================
+DataLoader-style helper used while assembling chat context.
+
+Instead of issuing one Firestore query per employee per topic, callers ask
+for rows of many employees at once. The loader:
+  - coalesces the keys into `in` queries, chunked to Firestore's
+    30-value disjunction limit,
+  - memoizes results for the lifetime of one request, so repeated lookups
+    (e.g. the same leave balances for the user and for the HR view) cost
+    nothing extra,
+  - pushes ordering and limits down to the query when a single key is
+    requested (e.g. the latest payslip), and applies them per key in memory
+    on the multi-key `in` path, so no composite index is needed for
+    `in` + `order_by`.
+
+A new loader is created for every chat request and must not be shared
+between requests. Within a request it may be used from several worker
+threads at once (context sources run concurrently).
+"""
+
+import threading
+from typing import Callable, Iterable, Optional
+
+# Firestore allows at most 30 values in a single `in` filter
+FIRESTORE_IN_LIMIT = 30
+
+
+def _sort_key(field: str):
+    # Rows missing the field sort last in descending order, first in ascending
+    return lambda row: (row.get(field) is not None, row.get(field))
+
+
+class RequestDataLoader:
+    """Batches and memoizes per-key table lookups for a single request."""
+
+    def __init__(self, db, employee_lookup: Optional[Callable[[str], Optional[dict]]] = None):
+        self._db = db
+        self._employee_lookup = employee_lookup
+        self._rows: dict[tuple, dict] = {}
+        # Ordered/limited single-key results, keyed by the full query shape
+        self._limited: dict[tuple, list[dict]] = {}
+        self._employees_by_email: dict[str, Optional[dict]] = {}
+        self._lock = threading.Lock()
+        self.round_trips = 0
+
+    def employee_by_email(self, email: str) -> Optional[dict]:
+        """Resolve the requesting user once per request."""
+        with self._lock:
+            if email in self._employees_by_email:
+                return self._employees_by_email[email]
+        employee = self._employee_lookup(email) if self._employee_lookup else None
+        with self._lock:
+            return self._employees_by_email.setdefault(email, employee)
+
+    def load_many(self, table: str, key_field: str, keys: Iterable,
+                  select: str = "*", filters: Optional[dict] = None,
+                  order_by: Optional[str] = None, desc: bool = False,
+                  limit_per_key: Optional[int] = None) -> dict:
+        """
+        Return {key: [rows]} for every key, fetching only keys not already
+        loaded for this (table, key_field, select, filters) combination.
+        `select` must include `key_field` (or be "*") so rows can be grouped.
+        When only one key has to be fetched, order_by / limit_per_key run on
+        the server; otherwise they are applied per key in memory.
+        """
+        keys = list(dict.fromkeys(keys))
+        filter_items = tuple(sorted((filters or {}).items()))
+        with self._lock:
+            memo = self._rows.setdefault((table, key_field, select, filter_items), {})
+            missing = [k for k in keys if k not in memo]
+
+        pushed_down: dict = {}
+        if len(missing) == 1 and (order_by or limit_per_key is not None):
+            # One key: let the server order and trim instead of reading the whole history
+            key = missing.pop()
+            limited_key = (table, key_field, select, filter_items, key, order_by, desc, limit_per_key)
+            with self._lock:
+                rows = self._limited.get(limited_key)
+            if rows is None:
+                rows = self._query_limited(table, key_field, key, select, filter_items,
+                                           order_by, desc, limit_per_key)
+                with self._lock:
+                    rows = self._limited.setdefault(limited_key, rows)
+            pushed_down[key] = rows
+
+        for start in range(0, len(missing), FIRESTORE_IN_LIMIT):
+            chunk = missing[start:start + FIRESTORE_IN_LIMIT]
+            query = self._db.table(table).select(select).in_(key_field, chunk)
+            for field, value in filter_items:
+                query = query.eq(field, value)
+            rows = query.execute().data or []
+            grouped = {key: [] for key in chunk}
+            for row in rows:
+                grouped.setdefault(row.get(key_field), []).append(row)
+            with self._lock:
+                self.round_trips += 1
+                memo.update(grouped)
+
+        result = {}
+        for key in keys:
+            if key in pushed_down:
+                result[key] = pushed_down[key]
+                continue
+            with self._lock:
+                rows = memo.get(key, [])
+            if order_by:
+                rows = sorted(rows, key=_sort_key(order_by), reverse=desc)
+            if limit_per_key is not None:
+                rows = rows[:limit_per_key]
+            result[key] = rows
+        return result
+
+    def _query_limited(self, table: str, key_field: str, key, select: str, filter_items: tuple,
+                       order_by: Optional[str], desc: bool, limit: Optional[int]) -> list[dict]:
+        query = self._db.table(table).select(select).eq(key_field, key)
+        for field, value in filter_items:
+            query = query.eq(field, value)
+        if order_by:
+            query = query.order(order_by, desc=desc)
+        if limit is not None:
+            query = query.limit(limit)
+        rows = query.execute().data or []
+        with self._lock:
+            self.round_trips += 1
+        return rows
+
+    def load(self, table: str, key_field: str, key, **kwargs) -> list[dict]:
+        """Single-key convenience wrapper around load_many."""
+        return self.load_many(table, key_field, [key], **kwargs)[key]
@@ -0,0 +1,227 @@
+"""
+OpenHire — In-Process Employee Directory
+========================================
+Keeps the `employees` collection in memory so HR chat can detect which
+employee a question is about without scanning Firestore per message.
+
+Freshness:
+  - preferred: a Firestore snapshot listener rebuilds the directory on
+    every change to the collection,
+  - fallback: if no listener is running, rows are reloaded once they are
+    older than the TTL.
+
+Name matching uses a token-phrase index over full names and first names,
+so detection is a handful of dict lookups per question word and only
+matches whole words ("Al" no longer matches "salary").
+"""
+
+import os
+import re
+import time
+import threading
+from typing import Callable, Optional
+
+DIRECTORY_TTL_SECONDS = float(os.getenv("EMPLOYEE_DIRECTORY_TTL", "300"))
+
+_TOKEN_RE = re.compile(r"\w+")
+
+# Match priority: a full-name mention beats a first-name-only mention
+_FULL_NAME = 0
+_FIRST_NAME = 1
+
+
+def _tokens(text: str) -> tuple[str, ...]:
+    return tuple(_TOKEN_RE.findall(text.lower()))
+
+
+class _DirectorySnapshot:
+    """Immutable rows + name index; swapped atomically on refresh."""
+
+    def __init__(self, rows: list[dict]):
+        self.rows = rows
+        self.by_id = {row.get("id"): row for row in rows}
+        self.phrases: dict[tuple[str, ...], tuple[int, int]] = {}
+        self.max_phrase_len = 0
+
+        for order, row in enumerate(rows):
+            first = _tokens(str(row.get("first_name") or ""))
+            full = _tokens(f"{row.get('first_name') or ''} {row.get('last_name') or ''}")
+            for phrase, priority in ((full, _FULL_NAME), (first, _FIRST_NAME)):
+                if not phrase:
+                    continue
+                # Keep the best (priority, directory order) candidate per phrase
+                candidate = (priority, order)
+                if phrase not in self.phrases or candidate < self.phrases[phrase]:
+                    self.phrases[phrase] = candidate
+                self.max_phrase_len = max(self.max_phrase_len, len(phrase))
+
+    def find_mentioned(self, text: str) -> Optional[dict]:
+        words = _tokens(text)
+        best = None
+        for start in range(len(words)):
+            for length in range(min(self.max_phrase_len, len(words) - start), 0, -1):
+                hit = self.phrases.get(words[start:start + length])
+                if hit and (best is None or hit < best):
+                    best = hit
+        return self.rows[best[1]] if best else None
+
+
+class EmployeeDirectory:
+    """Cached employee rows with a name index, refreshed by listener or TTL."""
+
+    def __init__(self, load_rows: Callable[[], list[dict]], ttl_seconds: float = DIRECTORY_TTL_SECONDS):
+        self._load_rows = load_rows
+        self.ttl_seconds = ttl_seconds
+        self._snapshot: Optional[_DirectorySnapshot] = None
+        self._loaded_at = 0.0
+        self._stale = False
+        self._lock = threading.Lock()
+        self._watch = None
+        self._listeners: list[Callable[[], None]] = []
+        self.refreshes = 0
+
+    # ── Refresh ──
+
+    def _install(self, rows: list[dict]):
+        snapshot = _DirectorySnapshot(rows)
+        self._snapshot = snapshot
+        self._loaded_at = time.monotonic()
+        self._stale = False
+        self.refreshes += 1
+        return snapshot
+
+    def on_change(self, callback: Callable[[], None]):
+        """Register a callback fired whenever the listener sees a collection change."""
+        self._listeners.append(callback)
+
+    def invalidate(self):
+        """Force a reload on next access (only matters when no listener is running)."""
+        self._stale = True
+
+    def refresh(self) -> _DirectorySnapshot:
+        """Reload all rows from the backing store."""
+        with self._lock:
+            return self._install(self._load_rows())
+
+    def start_listener(self, collection_ref):
+        """Keep the directory live via a Firestore snapshot listener."""
+        def on_snapshot(doc_snapshots, changes, read_time):
+            rows = []
+            for doc in doc_snapshots:
+                row = doc.to_dict()
+                row["id"] = doc.id
+                rows.append(row)
+            with self._lock:
+                self._install(rows)
+            for callback in self._listeners:
+                callback()
+            print(f"Employee directory updated from listener: {len(rows)} employees")
+
+        try:
+            self._watch = collection_ref.on_snapshot(on_snapshot)
+        except Exception as e:
+            print(f" Employee directory listener not started, using {self.ttl_seconds:.0f}s TTL: {e}")
+            self._watch = None
+
+    def stop_listener(self):
+        if self._watch is not None:
+            self._watch.unsubscribe()
+            self._watch = None
+
+    def _fresh(self) -> bool:
+        return not self._stale and time.monotonic() - self._loaded_at < self.ttl_seconds
+
+    def _current(self) -> _DirectorySnapshot:
+        snapshot = self._snapshot
+        if snapshot is not None:
+            if self._watch is not None or self._fresh():
+                return snapshot
+        with self._lock:
+            # Another thread may have refreshed while we waited
+            if self._snapshot is not None and self._fresh():
+                return self._snapshot
+            return self._install(self._load_rows())
+
+    # ── Queries ──
+
+    def rows(self) -> list[dict]:
+        return self._current().rows
+
+    def get(self, employee_id: str) -> Optional[dict]:
+        return self._current().by_id.get(employee_id)
+
+    def active(self) -> list[dict]:
+        return [row for row in self._current().rows if row.get("status") == "active"]
+
+    def find_mentioned(self, text: str) -> Optional[dict]:
+        """Return the employee named in `text` (full name preferred over first name)."""
+        return self._current().find_mentioned(text)
+
+    def find_by_email_fragments(self, *fragments: str) -> Optional[dict]:
+        """First employee whose email contains every fragment, in order (like ILIKE '%a%b%')."""
+        for row in self._current().rows:
+            email = normalize_email(str(row.get("email") or ""))
+            pos = 0
+            for fragment in fragments:
+                pos = email.find(fragment, pos)
+                if pos < 0:
+                    break
+                pos += len(fragment)
+            else:
+                return row
+        return None
+
+    def stats(self) -> dict:
+        snapshot = self._snapshot
+        return {
+            "employees": len(snapshot.rows) if snapshot else 0,
+            "live_listener": self._watch is not None,
+            "age_seconds": round(time.monotonic() - self._loaded_at, 1) if snapshot else None,
+            "stale": self._stale,
+            "refreshes": self.refreshes,
+        }
+
+
+EMAIL_CACHE_TTL_SECONDS = float(os.getenv("EMPLOYEE_EMAIL_CACHE_TTL", "600"))
+
+
+def normalize_email(email: str) -> str:
+    return (email or "").strip().lower()
+
+
+class EmployeeEmailCache:
+    """
+    Memoizes email → employee resolution (including demo fallbacks).
+    Cleared whenever an employee row is written through the compat layer
+    or the directory listener reports a change.
+    """
+
+    def __init__(self, ttl_seconds: float = EMAIL_CACHE_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self._entries: dict[str, tuple[float, Optional[dict]]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, email: str) -> tuple[bool, Optional[dict]]:
+        """Return (found, employee). `found` is False on a miss or expired entry."""
+        key = normalize_email(email)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > time.monotonic():
+                self.hits += 1
+                return True, entry[1]
+            self.misses += 1
+            return False, None
+
+    def put(self, email: str, employee: Optional[dict]):
+        with self._lock:
+            self._entries[normalize_email(email)] = (time.monotonic() + self.ttl_seconds, employee)
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
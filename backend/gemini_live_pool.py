@@ -0,0 +1,255 @@
+"""
+IntelliView — Gemini Live Connection Pool
+=========================================
+Takes Gemini Live connection and setup latency off the path between the
+candidate joining and the interviewer speaking.
+
+Two layers:
+  - Warm pool: GEMINI_LIVE_POOL_SIZE already-open sockets (DNS, TCP, TLS
+    and the WebSocket upgrade done), refilled in the background. Idle
+    sockets older than GEMINI_LIVE_POOL_MAX_IDLE_SECONDS are replaced,
+    since the server may drop connections that never send setup.
+  - Prepared sessions: prepare(session_id, setup) takes a warm socket,
+    sends the setup message and waits for setupComplete ahead of time
+    (e.g. while the candidate is on the pre-join screen). claim() hands
+    the ready connection to the interview handler, or None on a miss.
+    At most GEMINI_LIVE_MAX_PREPARED are held at once (further prepare()
+    calls are refused), one per owner (a new one replaces it), and
+    unclaimed sessions are closed after GEMINI_LIVE_PREPARED_TTL_SECONDS.
+    The setup exchange is bounded by GEMINI_LIVE_SETUP_TIMEOUT_SECONDS so
+    claim() never holds up a candidate for long.
+
+Payloads are opaque here; the caller builds and caches them.
+"""
+
+import os
+import time
+import asyncio
+from typing import Awaitable, Callable, Optional
+
+GEMINI_LIVE_POOL_SIZE = int(os.getenv("GEMINI_LIVE_POOL_SIZE", "2"))
+GEMINI_LIVE_POOL_MAX_IDLE_SECONDS = float(os.getenv("GEMINI_LIVE_POOL_MAX_IDLE_SECONDS", "45"))
+# How long a prepared (set-up) session waits for its candidate to connect
+GEMINI_LIVE_PREPARED_TTL_SECONDS = float(os.getenv("GEMINI_LIVE_PREPARED_TTL_SECONDS", "120"))
+# Upper bound on set-up upstream sessions held for candidates who have not joined yet
+GEMINI_LIVE_MAX_PREPARED = int(os.getenv("GEMINI_LIVE_MAX_PREPARED", str(GEMINI_LIVE_POOL_SIZE)))
+# Longest a prepared session may wait for setupComplete
+GEMINI_LIVE_SETUP_TIMEOUT_SECONDS = float(os.getenv("GEMINI_LIVE_SETUP_TIMEOUT_SECONDS", "5"))
+
+Connector = Callable[[], Awaitable]
+
+
+def _is_open(conn) -> bool:
+    state = getattr(conn, "state", None)
+    return state is not None and state.name == "OPEN"
+
+
+async def _close_quietly(conn):
+    try:
+        await conn.close()
+    except Exception:
+        pass
+
+
+class _Prepared:
+    def __init__(self, key: str, task: asyncio.Task, owner: Optional[str] = None):
+        self.key = key
+        self.task = task
+        self.owner = owner
+        self.created_at = time.monotonic()
+
+
+class GeminiLivePool:
+    """Warm Gemini Live sockets plus sessions whose setup already completed."""
+
+    def __init__(self, connect: Connector, size: int = GEMINI_LIVE_POOL_SIZE,
+                 max_idle: float = GEMINI_LIVE_POOL_MAX_IDLE_SECONDS,
+                 prepared_ttl: float = GEMINI_LIVE_PREPARED_TTL_SECONDS,
+                 max_prepared: int = GEMINI_LIVE_MAX_PREPARED,
+                 setup_timeout: float = GEMINI_LIVE_SETUP_TIMEOUT_SECONDS):
+        self._connect = connect
+        self.size = size
+        self.max_idle = max_idle
+        self.prepared_ttl = prepared_ttl
+        self.max_prepared = max_prepared
+        self.setup_timeout = setup_timeout
+        self._idle: list[tuple[float, object]] = []   # (opened_at, connection), oldest first
+        self._prepared: dict[str, _Prepared] = {}
+        self._refill_wakeup: Optional[asyncio.Event] = None
+        self._refill_task: Optional[asyncio.Task] = None
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "stale_discarded": 0,
+            "connect_errors": 0,
+            "prepared": 0,
+            "prepared_hits": 0,
+            "prepared_misses": 0,
+            "prepared_expired": 0,
+            "prepared_rejected": 0,
+            "prepared_replaced": 0,
+            "setup_timeouts": 0,
+        }
+        self._connects = 0
+        self._connect_total = 0.0
+
+    # ── Lifecycle ──
+
+    def start(self):
+        if self._refill_task is not None or self.size <= 0:
+            return
+        self._refill_wakeup = asyncio.Event()
+        self._refill_task = asyncio.create_task(self._refill_loop())
+        print(f"Gemini Live pool warming {self.size} connections")
+
+    async def stop(self):
+        if self._refill_task:
+            self._refill_task.cancel()
+            self._refill_task = None
+        for prepared in self._prepared.values():
+            self._discard_prepared(prepared)
+        self._prepared.clear()
+        idle, self._idle = self._idle, []
+        await asyncio.gather(*(_close_quietly(conn) for _, conn in idle))
+
+    async def _open(self):
+        started = time.monotonic()
+        conn = await self._connect()
+        self._connects += 1
+        self._connect_total += time.monotonic() - started
+        return conn
+
+    async def _refill_loop(self):
+        while True:
+            self._discard_stale()
+            self._expire_prepared()
+            while len(self._idle) < self.size:
+                try:
+                    conn = await self._open()
+                except Exception as e:
+                    self.stats["connect_errors"] += 1
+                    print(f"Gemini Live pool: connect failed: {e}")
+                    break
+                self._idle.append((time.monotonic(), conn))
+            self._refill_wakeup.clear()
+            try:
+                # Wake on acquire, or in time to replace the oldest idle socket
+                await asyncio.wait_for(self._refill_wakeup.wait(), timeout=max(self.max_idle / 3, 1.0))
+            except asyncio.TimeoutError:
+                pass
+
+    def _discard_stale(self):
+        cutoff = time.monotonic() - self.max_idle
+        keep = []
+        for opened_at, conn in self._idle:
+            if opened_at < cutoff or not _is_open(conn):
+                self.stats["stale_discarded"] += 1
+                asyncio.create_task(_close_quietly(conn))
+            else:
+                keep.append((opened_at, conn))
+        self._idle = keep
+
+    # ── Warm sockets ──
+
+    async def acquire(self):
+        """An open connection: a warm one when available, otherwise a fresh connect."""
+        self._discard_stale()
+        conn = None
+        if self._idle:
+            # Newest first: it has the most idle time left
+            _, conn = self._idle.pop()
+            self.stats["hits"] += 1
+        if self._refill_wakeup is not None:
+            self._refill_wakeup.set()
+        if conn is not None:
+            return conn
+        self.stats["misses"] += 1
+        return await self._open()
+
+    # ── Prepared sessions ──
+
+    def prepare(self, session_id: str, key: str, setup_payload: str, owner: Optional[str] = None) -> bool:
+        """
+        Connect and complete setup for `session_id` in the background (no-op if
+        already preparing). A session already prepared for the same `owner`
+        is discarded first. False when the pool is disabled or max_prepared
+        sessions are already held; the handler then connects on join as usual.
+        """
+        self._expire_prepared()
+        existing = self._prepared.get(session_id)
+        if existing and existing.key == key:
+            return True
+        if existing:
+            del self._prepared[session_id]
+            self._discard_prepared(existing)
+        if owner is not None:
+            for other_id in [s for s, p in self._prepared.items() if p.owner == owner]:
+                self.stats["prepared_replaced"] += 1
+                self._discard_prepared(self._prepared.pop(other_id))
+        if self.size <= 0 or len(self._prepared) >= self.max_prepared:
+            self.stats["prepared_rejected"] += 1
+            return False
+        self.stats["prepared"] += 1
+        task = asyncio.create_task(self._prepare(setup_payload))
+        self._prepared[session_id] = _Prepared(key, task, owner)
+        return True
+
+    async def _prepare(self, setup_payload: str):
+        conn = await self.acquire()
+
+        async def exchange():
+            await conn.send(setup_payload)
+            return await conn.recv()
+
+        try:
+            setup_response = await asyncio.wait_for(exchange(), timeout=self.setup_timeout)
+        except asyncio.TimeoutError:
+            self.stats["setup_timeouts"] += 1
+            await _close_quietly(conn)
+            raise
+        except BaseException:
+            await _close_quietly(conn)
+            raise
+        return conn, setup_response
+
+    async def claim(self, session_id: str, key: str) -> Optional[tuple]:
+        """(connection, setup response) prepared for this session and setup, or None."""
+        prepared = self._prepared.pop(session_id, None)
+        if prepared is None or prepared.key != key:
+            if prepared is not None:
+                self._discard_prepared(prepared)
+            self.stats["prepared_misses"] += 1
+            return None
+        try:
+            conn, setup_response = await prepared.task
+        except Exception as e:
+            print(f"Gemini Live pool: prepared session {session_id} failed: {e!r}")
+            self.stats["prepared_misses"] += 1
+            return None
+        if not _is_open(conn):
+            self.stats["prepared_misses"] += 1
+            return None
+        self.stats["prepared_hits"] += 1
+        return conn, setup_response
+
+    def _discard_prepared(self, prepared: _Prepared):
+        if not prepared.task.done():
+            prepared.task.cancel()
+        elif not prepared.task.cancelled() and prepared.task.exception() is None:
+            asyncio.create_task(_close_quietly(prepared.task.result()[0]))
+
+    def _expire_prepared(self):
+        cutoff = time.monotonic() - self.prepared_ttl
+        for session_id in [s for s, p in self._prepared.items() if p.created_at < cutoff]:
+            self.stats["prepared_expired"] += 1
+            self._discard_prepared(self._prepared.pop(session_id))
+
+    def snapshot(self) -> dict:
+        return {
+            **self.stats,
+            "size": self.size,
+            "idle": len(self._idle),
+            "preparing": len(self._prepared),
+            "max_prepared": self.max_prepared,
+            "avg_connect_ms": round(self._connect_total / self._connects * 1000, 1) if self._connects else 0.0,
+        }
@@ -0,0 +1,135 @@
+"""
+OpenHire — Shared Outbound HTTP Clients
+=======================================
+One pooled `httpx.AsyncClient` per backend service (Ollama, Judge0, ...),
+so calls reuse keep-alive connections instead of opening a socket per
+request and no longer tie up threads via `asyncio.to_thread`.
+
+Per service:
+  - max_connections caps concurrent requests to that host; extra callers
+    wait for a free connection (pool timeout),
+  - timeouts are set once,
+  - `request()` retries connection failures with exponential backoff.
+    Services marked idempotent also retry retryable statuses
+    (429/502/503/504/529, honouring Retry-After), read timeouts and
+    dropped connections. Non-idempotent ones (Judge0 submissions) only
+    retry when the request never reached the server, since a gateway
+    error may come after the submission was accepted.
+
+Clients are created lazily on first use inside the running event loop and
+closed by `close_all()` on shutdown.
+"""
+
+import os
+import asyncio
+from typing import Optional
+
+import httpx
+
+OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
+# Concurrent generations the local model server can actually serve (OLLAMA_NUM_PARALLEL)
+OLLAMA_MAX_CONCURRENCY = int(os.getenv("OLLAMA_MAX_CONCURRENCY", "2"))
+JUDGE0_API_URL = os.getenv("JUDGE0_API_URL", "https://judge0-ce.p.rapidapi.com")
+JUDGE0_MAX_CONCURRENCY = int(os.getenv("JUDGE0_MAX_CONCURRENCY", "8"))
+
+RETRY_STATUSES = {429, 502, 503, 504, 529}
+
+SERVICES = {
+    "ollama": {
+        "base_url": OLLAMA_BASE_URL,
+        "max_connections": OLLAMA_MAX_CONCURRENCY,
+        # Generations are slow; waiting for a free slot is expected, not an error
+        "timeout": httpx.Timeout(180.0, connect=5.0, pool=None),
+        "retries": 2,
+        "idempotent": True,   # temperature 0 generations are safe to repeat
+    },
+    "judge0": {
+        "base_url": JUDGE0_API_URL,
+        "max_connections": JUDGE0_MAX_CONCURRENCY,
+        "timeout": httpx.Timeout(30.0, connect=5.0, pool=30.0),
+        "retries": 2,
+        "idempotent": False,  # a timed-out or 5xx submission may still have been created
+    },
+}
+
+RETRY_BASE_DELAY = 0.5
+
+_clients: dict[str, httpx.AsyncClient] = {}
+_metrics: dict[str, dict] = {name: {"requests": 0, "retries": 0, "errors": 0} for name in SERVICES}
+
+
+def get_client(service: str) -> httpx.AsyncClient:
+    """Shared pooled client for a configured service."""
+    client = _clients.get(service)
+    if client is None or client.is_closed:
+        config = SERVICES[service]
+        client = httpx.AsyncClient(
+            base_url=config["base_url"],
+            timeout=config["timeout"],
+            limits=httpx.Limits(
+                max_connections=config["max_connections"],
+                max_keepalive_connections=config["max_connections"],
+                keepalive_expiry=60.0,
+            ),
+        )
+        _clients[service] = client
+    return client
+
+
+def _retry_delay(attempt: int, response: Optional[httpx.Response]) -> float:
+    if response is not None:
+        retry_after = response.headers.get("Retry-After", "")
+        if retry_after.isdigit():
+            return float(retry_after)
+    return RETRY_BASE_DELAY * (2 ** attempt)
+
+
+async def request(service: str, method: str, url: str, **kwargs) -> httpx.Response:
+    """
+    Send a request through the service's pool with its retry policy.
+    Returns the final response (callers decide how to treat non-2xx);
+    raises the last transport error if every attempt failed to connect.
+    """
+    config = SERVICES[service]
+    client = get_client(service)
+    metrics = _metrics[service]
+    retry_statuses = RETRY_STATUSES if config["idempotent"] else ()
+    for attempt in range(config["retries"] + 1):
+        metrics["requests"] += 1
+        response = None
+        try:
+            response = await client.request(method, url, **kwargs)
+            if response.status_code not in retry_statuses or attempt == config["retries"]:
+                return response
+        except (httpx.ConnectError, httpx.ConnectTimeout):
+            metrics["errors"] += 1
+            if attempt == config["retries"]:
+                raise
+        except (httpx.ReadTimeout, httpx.RemoteProtocolError):
+            # The server may already have acted on the request
+            metrics["errors"] += 1
+            if not config["idempotent"] or attempt == config["retries"]:
+                raise
+        metrics["retries"] += 1
+        await asyncio.sleep(_retry_delay(attempt, response))
+    raise RuntimeError("unreachable")
+
+
+def stream(service: str, method: str, url: str, **kwargs):
+    """Streaming request on the service's pool (async context manager; not retried)."""
+    _metrics[service]["requests"] += 1
+    return get_client(service).stream(method, url, **kwargs)
+
+
+async def close_all():
+    for client in _clients.values():
+        await client.aclose()
+    _clients.clear()
+
+
+def stats() -> dict:
+    return {
+        name: {**_metrics[name], "max_connections": SERVICES[name]["max_connections"],
+               "open": name in _clients and not _clients[name].is_closed}
+        for name in SERVICES
+    }
@@ -0,0 +1,464 @@
+"""
+IntelliView — Interview Audio Wire Format
+=========================================
+Binary WebSocket frames between the browser and handle_interview_ws, so
+audio no longer goes browser → base64 → JSON → json.loads → json.dumps
+→ Gemini (and the mirror image on the way back).
+
+Binary frame layout (network byte order):
+
+  byte 0     frame type (FRAME_AUDIO)
+  byte 1     protocol version
+  bytes 2-3  sequence number (uint16, wraps)
+  bytes 4-   raw 16-bit little-endian mono PCM
+             (16 kHz browser → server, 24 kHz server → browser)
+
+Control messages (proctoring events, coding submissions, transcripts,
+phase changes, ...) stay JSON text frames.
+
+Gemini still wants JSON with base64 audio, so outgoing chunks are spliced
+into a pre-serialized envelope: one base64 encode per chunk and no
+dict building or json.dumps.
+
+AudioCoalescer re-frames PCM per session and direction:
+  - input:  browser chunks → 40–100 ms frames for Gemini (small chunks
+            are batched, oversized ones split), flushed early on silence
+            or after a max wait,
+  - output: Gemini's bursty audio parts → frames of a fixed duration for
+            the browser, holding a short prebuffer at the start of every
+            turn. Frames are released as soon as they are complete, not
+            paced to real time: the browser schedules playback itself
+            (nextPlayTime), so the prebuffer only guards against a gap
+            between the first parts of a turn.
+Larger frames mean fewer messages (less framing and fewer syscalls) at
+the cost of added latency; the env knobs below trade one for the other.
+
+VoiceActivityDetector is an energy / zero-crossing-rate VAD for the
+uplink. While the candidate is silent (typically while coding), chunks
+are suppressed (or thinned to a keep-alive rate) instead of being
+streamed to Gemini, and speech start/stop markers are emitted.
+"""
+
+import os
+import sys
+import json
+import time
+import math
+import array
+import base64
+import struct
+import asyncio
+import binascii
+import operator
+from typing import Awaitable, Callable, Optional
+
+try:
+    import numpy as np
+except ImportError:  # pure-Python fallback below
+    np = None
+
+FRAME_AUDIO = 0x01
+PROTOCOL_VERSION = 1
+FRAME_HEADER = struct.Struct("!BBH")
+
+INPUT_SAMPLE_RATE = 16000
+OUTPUT_SAMPLE_RATE = 24000
+BYTES_PER_SAMPLE = 2
+
+
+def _clamp_ms(name: str, default: str, low: float, high: float) -> float:
+    return min(max(float(os.getenv(name, default)), low), high)
+
+
+# Browser → Gemini frame size (40–100 ms) and how long a partial frame may wait
+AUDIO_IN_FRAME_MS = _clamp_ms("INTERVIEW_AUDIO_IN_FRAME_MS", "60", 40, 100)
+AUDIO_IN_MAX_WAIT_MS = float(os.getenv("INTERVIEW_AUDIO_IN_MAX_WAIT_MS", "100"))
+# Peak amplitude (int16) below which an input chunk counts as silence and flushes
+AUDIO_SILENCE_PEAK = int(os.getenv("INTERVIEW_AUDIO_SILENCE_PEAK", "500"))
+# Gemini → browser jitter buffer: frame size, max wait, and prebuffer at turn start
+AUDIO_OUT_FRAME_MS = _clamp_ms("INTERVIEW_AUDIO_OUT_FRAME_MS", "80", 20, 200)
+AUDIO_OUT_MAX_WAIT_MS = float(os.getenv("INTERVIEW_AUDIO_OUT_MAX_WAIT_MS", "60"))
+AUDIO_OUT_PREBUFFER_MS = float(os.getenv("INTERVIEW_AUDIO_OUT_PREBUFFER_MS", "120"))
+
+# Uplink VAD: "off", "coding" (only during the coding assessment) or "always"
+INTERVIEW_VAD = os.getenv("INTERVIEW_VAD", "coding")
+VAD_FRAME_MS = 20
+# RMS (int16) above which a 20 ms frame is speech; half of it counts when the
+# zero-crossing rate looks like unvoiced speech (fricatives)
+VAD_ENERGY_THRESHOLD = float(os.getenv("INTERVIEW_VAD_ENERGY", "600"))
+VAD_ZCR_RANGE = (0.1, 0.45)
+# Silence kept after speech (trailing words, Gemini's own end-of-turn detection)
+VAD_HANGOVER_MS = float(os.getenv("INTERVIEW_VAD_HANGOVER_MS", "800"))
+# While silent, still forward one chunk this often (0 = suppress entirely)
+VAD_KEEPALIVE_MS = float(os.getenv("INTERVIEW_VAD_KEEPALIVE_MS", "0"))
+
+
+class AudioSinkError(RuntimeError):
+    """The coalescer's sink raised (e.g. the Gemini socket closed); it has stopped."""
+
+
+class FrameError(ValueError):
+    """Binary frame is malformed or of an unknown type/version."""
+
+
+def pack_audio_frame(pcm: bytes, sequence: int) -> bytes:
+    """Binary frame carrying a PCM chunk."""
+    return FRAME_HEADER.pack(FRAME_AUDIO, PROTOCOL_VERSION, sequence & 0xFFFF) + pcm
+
+
+def pack_audio_frame_b64(data_b64: str, sequence: int) -> bytes:
+    """Binary frame from base64 PCM as Gemini sends it (a2b_base64 skips b64decode's str→bytes copy)."""
+    return FRAME_HEADER.pack(FRAME_AUDIO, PROTOCOL_VERSION, sequence & 0xFFFF) + binascii.a2b_base64(data_b64)
+
+
+def unpack_frame(data: bytes) -> tuple[int, int, memoryview]:
+    """(frame type, sequence, payload) — the payload is a view into `data`, not a copy."""
+    if len(data) < FRAME_HEADER.size:
+        raise FrameError(f"Frame too short ({len(data)} bytes)")
+    frame_type, version, sequence = FRAME_HEADER.unpack_from(data)
+    if version != PROTOCOL_VERSION:
+        raise FrameError(f"Unsupported frame version {version}")
+    if frame_type != FRAME_AUDIO:
+        raise FrameError(f"Unknown frame type {frame_type}")
+    return frame_type, sequence, memoryview(data)[FRAME_HEADER.size:]
+
+
+def audio_seconds(pcm_bytes: int, sample_rate: int) -> float:
+    return pcm_bytes / (sample_rate * BYTES_PER_SAMPLE)
+
+
+# ── Gemini envelope ──
+
+def _envelope(template: dict, placeholder: str = "\x00") -> tuple[str, str]:
+    """Serialize `template` once and split it around the placeholder data value."""
+    head, tail = json.dumps(template, separators=(",", ":")).split(json.dumps(placeholder))
+    return head + '"', '"' + tail
+
+
+_AUDIO_HEAD, _AUDIO_TAIL = _envelope({
+    "realtime_input": {
+        "media_chunks": [
+            {
+                "mime_type": "audio/pcm",
+                "data": "\x00",
+            }
+        ]
+    }
+})
+
+
+def realtime_audio_message(pcm) -> str:
+    """Gemini Live realtime_input message for a PCM chunk (bytes-like)."""
+    return _AUDIO_HEAD + base64.b64encode(pcm).decode("ascii") + _AUDIO_TAIL
+
+
+# Sent after speech stops and the uplink goes quiet, so Gemini flushes its buffered audio
+AUDIO_STREAM_END_MESSAGE = json.dumps({"realtime_input": {"audio_stream_end": True}}, separators=(",", ":"))
+
+
+# ── Coalescing / jitter buffer ──
+
+def pcm_peak(pcm) -> int:
+    """Peak absolute amplitude of 16-bit little-endian PCM."""
+    samples = array.array("h")
+    samples.frombytes(pcm[:len(pcm) - len(pcm) % BYTES_PER_SAMPLE])
+    if not samples:
+        return 0
+    if sys.byteorder == "big":
+        samples.byteswap()
+    return max(max(samples), -min(samples))
+
+
+_FLUSH = object()   # queue marker: release everything buffered (end of turn)
+_CLEAR = object()   # queue marker: drop everything buffered (interrupted)
+
+
+class AudioCoalescer:
+    """
+    Batches PCM chunks into frames of `frame_ms` and hands them to `sink`.
+
+    push() never blocks; a single task per coalescer does the batching and
+    awaits the sink, so frames leave in order. A partial frame is sent once
+    `max_wait_ms` has passed since its first chunk, or immediately when a
+    silent chunk arrives (`silence_peak`) or flush() is called. Buffered
+    audio much longer than a frame is split into near-equal frames. With
+    `prebuffer_ms`, the first frame after start / flush() / clear() waits
+    for that much audio (or the max wait) before anything is released.
+
+    If the sink raises, the task stops: pending and later drain() calls and
+    later push() calls raise AudioSinkError.
+    """
+
+    def __init__(self, sink: Callable[[bytes], Awaitable[None]], sample_rate: int,
+                 frame_ms: float, max_wait_ms: float, prebuffer_ms: float = 0.0,
+                 silence_peak: int = 0):
+        self._sink = sink
+        self.sample_rate = sample_rate
+        self.frame_ms = frame_ms
+        self.frame_bytes = self._bytes_for(frame_ms)
+        self.prebuffer_bytes = self._bytes_for(prebuffer_ms)
+        self.max_wait = max_wait_ms / 1000
+        self.silence_peak = silence_peak
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._task: asyncio.Task | None = None
+        self.error: Optional[BaseException] = None
+        self._started_at = time.monotonic()
+        self.stats = {
+            "chunks_in": 0,
+            "frames_out": 0,
+            "bytes": 0,
+            "dropped_bytes": 0,
+            "sink_errors": 0,
+            "flushes": {"size": 0, "prebuffer": 0, "silence": 0, "timeout": 0, "marker": 0},
+        }
+
+    def _bytes_for(self, ms: float) -> int:
+        samples = int(self.sample_rate * ms / 1000)
+        return samples * BYTES_PER_SAMPLE
+
+    # ── Producer side ──
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self, drain: bool = True):
+        if self._task is None:
+            return
+        if drain:
+            self._queue.put_nowait(_FLUSH)
+            self._queue.put_nowait(None)
+            try:
+                await asyncio.wait_for(self._task, timeout=1.0)
+            except Exception:
+                pass
+        self._task.cancel()
+        self._task = None
+
+    def _raise_if_failed(self):
+        if self.error is not None:
+            raise AudioSinkError(f"audio sink failed: {self.error}") from self.error
+
+    def push(self, pcm):
+        self._raise_if_failed()
+        self.stats["chunks_in"] += 1
+        self._queue.put_nowait(bytes(pcm))
+
+    def flush(self):
+        """Release whatever is buffered (e.g. end of a turn)."""
+        self._queue.put_nowait(_FLUSH)
+
+    async def drain(self):
+        """flush() and wait until the buffered audio has been handed to the sink."""
+        self._raise_if_failed()
+        if self._task is None or self._task.done():
+            return
+        done = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait(_FLUSH)
+        self._queue.put_nowait(done)
+        # The task may end (sink error, stop()) without reaching the marker
+        await asyncio.wait({done, self._task}, return_when=asyncio.FIRST_COMPLETED)
+        if not done.done():
+            done.cancel()
+        self._raise_if_failed()
+
+    def clear(self):
+        """Drop whatever is buffered (e.g. Gemini was interrupted)."""
+        self._queue.put_nowait(_CLEAR)
+
+    # ── Batching task ──
+
+    def _split(self, frame: bytes) -> list[bytes]:
+        """Near-equal, sample-aligned frames of roughly frame_bytes (0.75–1.5x)."""
+        count = max(1, round(len(frame) / self.frame_bytes))
+        if count == 1:
+            return [frame]
+        samples = len(frame) // BYTES_PER_SAMPLE
+        bounds = [samples * i // count * BYTES_PER_SAMPLE for i in range(count)] + [len(frame)]
+        return [frame[bounds[i]:bounds[i + 1]] for i in range(count)]
+
+    async def _run(self):
+        try:
+            await self._batch()
+        except Exception as e:
+            # Typically the socket behind the sink closed; fail waiters instead of hanging them
+            self.error = e
+            self.stats["sink_errors"] += 1
+            while not self._queue.empty():
+                item = self._queue.get_nowait()
+                if isinstance(item, asyncio.Future) and not item.done():
+                    item.set_result(None)   # drain() re-raises self.error
+
+    async def _batch(self):
+        parts: list[bytes] = []
+        size = 0
+        deadline = None
+        primed = self.prebuffer_bytes == 0
+        while True:
+            try:
+                if deadline is None:
+                    item = await self._queue.get()
+                else:
+                    item = await asyncio.wait_for(self._queue.get(), max(deadline - time.monotonic(), 0))
+            except asyncio.TimeoutError:
+                item, reason = _FLUSH, "timeout"
+            else:
+                reason = "marker"
+
+            if item is None:
+                return
+            if isinstance(item, asyncio.Future):
+                if not item.done():
+                    item.set_result(None)
+                continue
+            if item is _CLEAR:
+                self.stats["dropped_bytes"] += size
+                parts, size, deadline = [], 0, None
+                primed = self.prebuffer_bytes == 0
+                continue
+            if item is not _FLUSH:
+                parts.append(item)
+                size += len(item)
+                if deadline is None:
+                    deadline = time.monotonic() + self.max_wait
+                if not primed:
+                    if size < self.prebuffer_bytes:
+                        continue
+                    reason = "prebuffer"
+                elif size >= self.frame_bytes:
+                    reason = "size"
+                elif self.silence_peak and pcm_peak(item) < self.silence_peak:
+                    reason = "silence"
+                else:
+                    continue
+
+            if parts:
+                frame = parts[0] if len(parts) == 1 else b"".join(parts)
+                parts, size, deadline = [], 0, None
+                self.stats["flushes"][reason] += 1
+                self.stats["bytes"] += len(frame)
+                for piece in self._split(frame):
+                    self.stats["frames_out"] += 1
+                    await self._sink(piece)
+            deadline = None
+            if reason == "marker":
+                primed = self.prebuffer_bytes == 0
+            elif reason in ("prebuffer", "timeout"):
+                primed = True
+
+    def snapshot(self) -> dict:
+        elapsed = max(time.monotonic() - self._started_at, 1e-6)
+        return {
+            **self.stats,
+            "flushes": dict(self.stats["flushes"]),
+            "frame_ms": self.frame_ms,
+            "messages_per_second": round(self.stats["frames_out"] / elapsed, 2),
+            "audio_seconds": round(audio_seconds(self.stats["bytes"], self.sample_rate), 2),
+        }
+
+
+# ── Voice activity detection ──
+
+def frame_energy_zcr(pcm) -> tuple[float, float]:
+    """(RMS amplitude, zero-crossing rate per sample) of 16-bit little-endian PCM."""
+    pcm = pcm[:len(pcm) - len(pcm) % BYTES_PER_SAMPLE]
+    if not pcm:
+        return 0.0, 0.0
+    if np is not None:
+        x = np.frombuffer(pcm, dtype="<i2").astype(np.float32)
+        negative = np.signbit(x)
+        crossings = np.count_nonzero(negative[1:] != negative[:-1])
+        return float(np.sqrt(np.mean(x * x))), crossings / x.size
+    samples = array.array("h")
+    samples.frombytes(pcm)
+    if sys.byteorder == "big":
+        samples.byteswap()
+    n = len(samples)
+    rms = math.sqrt(sum(map(operator.mul, samples, samples)) / n)
+    negative = [v < 0 for v in samples]
+    crossings = sum(map(operator.ne, negative, negative[1:]))
+    return rms, crossings / n
+
+
+class VoiceActivityDetector:
+    """
+    Energy + zero-crossing VAD with hangover, fed the uplink chunk by chunk.
+
+    process() returns (forward, marker): whether to send the chunk on and
+    "speech_start" / "speech_stop" when the state changes. Speech starts
+    on the first voiced 20 ms frame; it stops after `hangover_ms` of
+    continuous silence (that silence is still forwarded).
+    """
+
+    def __init__(self, sample_rate: int = INPUT_SAMPLE_RATE,
+                 energy_threshold: float = VAD_ENERGY_THRESHOLD,
+                 hangover_ms: float = VAD_HANGOVER_MS,
+                 keepalive_ms: float = VAD_KEEPALIVE_MS):
+        self.sample_rate = sample_rate
+        self.energy_threshold = energy_threshold
+        self.hangover = hangover_ms / 1000
+        self.keepalive = keepalive_ms / 1000
+        self.frame_bytes = int(sample_rate * VAD_FRAME_MS / 1000) * BYTES_PER_SAMPLE
+        self.speaking = False
+        self._silence_run = 0.0
+        self._since_forward = 0.0
+        self.stats = {
+            "speech_segments": 0,
+            "speech_seconds": 0.0,
+            "forwarded_seconds": 0.0,
+            "suppressed_seconds": 0.0,
+            "suppressed_chunks": 0,
+        }
+
+    def is_speech(self, pcm) -> bool:
+        low, high = VAD_ZCR_RANGE
+        for offset in range(0, len(pcm), self.frame_bytes):
+            rms, zcr = frame_energy_zcr(pcm[offset:offset + self.frame_bytes])
+            if rms >= self.energy_threshold:
+                return True
+            if rms >= self.energy_threshold / 2 and low <= zcr <= high:
+                return True
+        return False
+
+    def process(self, pcm) -> tuple[bool, Optional[str]]:
+        duration = audio_seconds(len(pcm), self.sample_rate)
+        marker = None
+        if self.is_speech(pcm):
+            self._silence_run = 0.0
+            if not self.speaking:
+                self.speaking = True
+                self.stats["speech_segments"] += 1
+                marker = "speech_start"
+            self.stats["speech_seconds"] += duration
+            forward = True
+        elif self.speaking:
+            # Hangover: keep forwarding until the silence has lasted long enough
+            self._silence_run += duration
+            forward = True
+            if self._silence_run >= self.hangover:
+                self.speaking = False
+                marker = "speech_stop"
+        else:
+            self._since_forward += duration
+            forward = bool(self.keepalive) and self._since_forward >= self.keepalive
+
+        if forward:
+            self._since_forward = 0.0
+            self.stats["forwarded_seconds"] += duration
+        else:
+            self.stats["suppressed_seconds"] += duration
+            self.stats["suppressed_chunks"] += 1
+        return forward, marker
+
+    def reset(self):
+        """Forget the speech state (e.g. when VAD is switched on for a new phase)."""
+        self.speaking = False
+        self._silence_run = 0.0
+        self._since_forward = 0.0
+
+    def snapshot(self) -> dict:
+        total = self.stats["forwarded_seconds"] + self.stats["suppressed_seconds"]
+        return {
+            **{k: round(v, 2) if isinstance(v, float) else v for k, v in self.stats.items()},
+            "suppressed_ratio": round(self.stats["suppressed_seconds"] / total, 3) if total else 0.0,
+        }
@@ -10,20 +10,54 @@ Architecture:
 Audio specs:
   - Input  (candidate → Gemini): 16-bit PCM, 16 kHz, mono
   - Output (Gemini → candidate): 16-bit PCM, 24 kHz, mono
+  - Browser ↔ backend audio travels as binary frames (see interview_audio);
+    legacy clients may still use JSON frames with base64 data.
+
+The Gemini socket comes from gemini_pool: warm connections, or a session
+whose setup already completed via prepare_interview() (called while the
+candidate is still on the pre-join screen). Serialized setup payloads
+are cached by job title + resume hash.
+
+Everything sent to the browser goes through the session's _SessionOutbox:
+one writer task, a priority lane for control messages and a bounded
+drop-oldest lane for audio.
 """
 
 import os
 import json
 import asyncio
 import base64
+import hashlib
+import secrets
 import time
 import traceback
+from collections import OrderedDict, deque
 from datetime import datetime
 from typing import Optional
 
 import websockets
 from fastapi import WebSocket, WebSocketDisconnect
 from vision_proctor import analyze_frame
+from gemini_live_pool import GEMINI_LIVE_POOL_SIZE, GeminiLivePool
+from interview_audio import (
+    AUDIO_IN_FRAME_MS,
+    AUDIO_IN_MAX_WAIT_MS,
+    AUDIO_OUT_FRAME_MS,
+    AUDIO_OUT_MAX_WAIT_MS,
+    AUDIO_OUT_PREBUFFER_MS,
+    AUDIO_SILENCE_PEAK,
+    AUDIO_STREAM_END_MESSAGE,
+    INPUT_SAMPLE_RATE,
+    INTERVIEW_VAD,
+    OUTPUT_SAMPLE_RATE,
+    AudioCoalescer,
+    AudioSinkError,
+    FrameError,
+    VoiceActivityDetector,
+    pack_audio_frame,
+    realtime_audio_message,
+    unpack_frame,
+)
 
 # ── Gemini Live API config ─────────────────────────────
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY", "")
@@ -34,6 +68,15 @@ GEMINI_WS_URL = (
 )
 MODEL = "models/gemini-2.5-flash-native-audio-preview-12-2025"
 
+# Serialized setup payloads kept (keyed by job title + resume hash)
+SETUP_CACHE_SIZE = int(os.getenv("GEMINI_SETUP_CACHE_SIZE", "64"))
+
+# Audio frames the browser may fall behind by before the oldest are dropped
+# (at the default 80 ms output frame, 50 frames ≈ 4 s)
+INTERVIEW_AUDIO_QUEUE_FRAMES = int(os.getenv("INTERVIEW_AUDIO_QUEUE_FRAMES", "50"))
+# How long a normally ending session may take to flush queued audio to the browser
+INTERVIEW_OUTBOX_DRAIN_SECONDS = float(os.getenv("INTERVIEW_OUTBOX_DRAIN_SECONDS", "5"))
+
 
 def build_system_instruction(resume_summary: str, job_title: str) -> str:
     """Build the system prompt for the AI interviewer persona."""
@@ -128,10 +171,169 @@ def build_setup_message(resume_summary: str, job_title: str) -> dict:
     }
 
 
+_setup_cache: OrderedDict[str, str] = OrderedDict()
+setup_cache_stats = {"hits": 0, "misses": 0}
+
+
+def get_setup_payload(resume_summary: str, job_title: str) -> tuple[str, str]:
+    """(cache key, serialized setup message) for this interview configuration."""
+    key = hashlib.sha256(f"{job_title}\x00{resume_summary}".encode("utf-8")).hexdigest()
+    payload = _setup_cache.get(key)
+    if payload is not None:
+        _setup_cache.move_to_end(key)
+        setup_cache_stats["hits"] += 1
+        return key, payload
+    setup_cache_stats["misses"] += 1
+    payload = json.dumps(build_setup_message(resume_summary, job_title))
+    _setup_cache[key] = payload
+    while len(_setup_cache) > SETUP_CACHE_SIZE:
+        _setup_cache.popitem(last=False)
+    return key, payload
+
+
+async def _connect_gemini():
+    return await websockets.connect(
+        GEMINI_WS_URL,
+        additional_headers={"Content-Type": "application/json"},
+        max_size=None,  # No limit on message size
+    )
+
+
+# Warm / prepared Gemini Live connections (started with the interview routes)
+gemini_pool = GeminiLivePool(_connect_gemini, size=GEMINI_LIVE_POOL_SIZE if GEMINI_API_KEY else 0)
+session_ready_stats = {"sessions": 0, "prepared": 0, "total_ms": 0.0}
+
+
+def prepare_interview(resume_summary: str, job_title: str, client: str) -> Optional[str]:
+    """
+    Open a Gemini session and complete setup before the candidate joins.
+    Returns the server-issued session id the WebSocket must connect with
+    (unguessable, so only this client can claim it), or None if refused.
+    Each client holds at most one prepared session; preparing again replaces it.
+    """
+    session_id = f"session_{int(time.time() * 1000)}_{secrets.token_urlsafe(12)}"
+    key, payload = get_setup_payload(resume_summary, job_title)
+    if not gemini_pool.prepare(session_id, key, payload, owner=client):
+        return None
+    return session_id
+
+
+def pool_stats() -> dict:
+    sessions = session_ready_stats["sessions"]
+    return {
+        "pool": gemini_pool.snapshot(),
+        "setup_cache": {**setup_cache_stats, "entries": len(_setup_cache), "max_entries": SETUP_CACHE_SIZE},
+        "session_ready": {
+            "sessions": sessions,
+            "prepared": session_ready_stats["prepared"],
+            "avg_ms": round(session_ready_stats["total_ms"] / sessions, 1) if sessions else 0.0,
+        },
+    }
+
+
+class _SessionOutbox:
+    """
+    Outbound side of one candidate socket. Producers enqueue without
+    awaiting the network; a single writer task sends, always emptying the
+    control lane (transcripts, vision results, errors) before the next
+    audio frame. Messages sent with after_audio=True (turn_complete, phase
+    changes) instead wait behind every audio frame queued before them, so
+    the browser never hears about the end of a turn before its audio. The
+    audio lane is bounded and drops its oldest frame when the link cannot
+    keep up, so a slow candidate link never stalls Gemini tool-call handling.
+    """
+
+    def __init__(self, websocket: WebSocket, audio_capacity: int = INTERVIEW_AUDIO_QUEUE_FRAMES):
+        self.websocket = websocket
+        self._control: deque[str] = deque()
+        # (audio frames that must leave first, message)
+        self._ordered: deque[tuple[int, str]] = deque()
+        self._audio: deque = deque(maxlen=audio_capacity)
+        self._audio_enqueued = 0
+        self._audio_released = 0   # sent, dropped or discarded
+        self._ready = asyncio.Event()
+        self._sending = False
+        self.closed = False
+        self.stats = {"control_sent": 0, "audio_sent": 0, "audio_dropped": 0,
+                      "max_audio_depth": 0, "send_errors": 0}
+        self._writer = asyncio.create_task(self._write_loop())
+
+    def send_control(self, message: dict, after_audio: bool = False):
+        if self.closed:
+            return
+        if after_audio:
+            self._ordered.append((self._audio_enqueued, json.dumps(message)))
+        else:
+            self._control.append(json.dumps(message))
+        self._ready.set()
+
+    def send_audio(self, frame: bytes | str):
+        if self.closed:
+            return
+        if len(self._audio) == self._audio.maxlen:
+            # deque(maxlen) discards the oldest frame on append
+            self.stats["audio_dropped"] += 1
+            self._audio_released += 1
+        self._audio.append(frame)
+        self._audio_enqueued += 1
+        self.stats["max_audio_depth"] = max(self.stats["max_audio_depth"], len(self._audio))
+        self._ready.set()
+
+    async def _write_loop(self):
+        try:
+            while True:
+                await self._ready.wait()
+                self._ready.clear()
+                while self._control or self._ordered or self._audio:
+                    self._sending = True
+                    if self._control:
+                        text = self._control.popleft()
+                    elif self._ordered and self._ordered[0][0] <= self._audio_released:
+                        text = self._ordered.popleft()[1]
+                    else:
+                        frame = self._audio.popleft()
+                        self._audio_released += 1
+                        if isinstance(frame, bytes):
+                            await self.websocket.send_bytes(frame)
+                        else:
+                            await self.websocket.send_text(frame)
+                        self._sending = False
+                        self.stats["audio_sent"] += 1
+                        continue
+                    await self.websocket.send_text(text)
+                    self._sending = False
+                    self.stats["control_sent"] += 1
+        except asyncio.CancelledError:
+            pass
+        except Exception:
+            self.stats["send_errors"] += 1
+            self.closed = True
+
+    async def close(self, drain_audio: bool = False, timeout: float = 1.0):
+        """
+        Give queued messages up to `timeout` to go out, then stop. Pending
+        audio is discarded unless `drain_audio` (a normal end of the interview).
+        """
+        if not drain_audio:
+            self._audio_released += len(self._audio)
+            self._audio.clear()
+        deadline = time.monotonic() + timeout
+        while ((self._control or self._ordered or self._audio or self._sending)
+               and not self._writer.done() and time.monotonic() < deadline):
+            await asyncio.sleep(0.01)
+        self.closed = True
+        self._writer.cancel()
+
+    def snapshot(self) -> dict:
+        return {**self.stats, "control_depth": len(self._control) + len(self._ordered),
+                "audio_depth": len(self._audio)}
+
+
 class InterviewSession:
     """Manages a single interview session between a candidate and Gemini."""
 
-    def __init__(self, session_id: str, resume_summary: str, job_title: str):
+    def __init__(self, session_id: str, resume_summary: str, job_title: str,
+                 binary_audio: bool = False):
         self.session_id = session_id
         self.resume_summary = resume_summary
         self.job_title = job_title
@@ -141,7 +343,30 @@ class InterviewSession:
         self.vision_analyses: list[dict] = []
         self.coding_result: Optional[dict] = None
         self.gemini_ws: Optional[websockets.WebSocketClientProtocol] = None
+        self.outbox: Optional[_SessionOutbox] = None
         self._active = False
+        self.phase = "interview"   # interview → coding → complete
+        # Client asked for binary audio frames (?audio_format=binary)
+        self.binary_audio = binary_audio
+        self._out_sequence = 0
+        # Raw chunks as received (client → server, Gemini → server)
+        self.audio_stats = {"in_frames": 0, "in_bytes": 0, "out_frames": 0, "out_bytes": 0}
+        # Browser chunks → Gemini frames, and Gemini audio → browser (jitter buffer)
+        self.audio_in: Optional[AudioCoalescer] = None
+        self.audio_out: Optional[AudioCoalescer] = None
+        # Uplink VAD (INTERVIEW_VAD); silent stretches are not streamed to Gemini
+        self.vad = VoiceActivityDetector() if INTERVIEW_VAD in ("coding", "always") else None
+
+    @property
+    def vad_active(self) -> bool:
+        if self.vad is None:
+            return False
+        return INTERVIEW_VAD == "always" or self.phase == "coding"
+
+    def set_phase(self, phase: str):
+        self.phase = phase
+        if self.vad:
+            self.vad.reset()
 
     def log_transcript(self, role: str, text: str):
         """Append a transcript entry."""
@@ -158,6 +383,16 @@ class InterviewSession:
             "timestamp": time.time()
         })
 
+    def audio_metrics(self) -> dict:
+        """Message rates and flush reasons for both audio directions."""
+        return {
+            "received": dict(self.audio_stats),
+            "to_gemini": self.audio_in.snapshot() if self.audio_in else None,
+            "to_client": self.audio_out.snapshot() if self.audio_out else None,
+            "outbound": self.outbox.snapshot() if self.outbox else None,
+            "vad": self.vad.snapshot() if self.vad else None,
+        }
+
     def to_dict(self) -> dict:
         """Serialize session data for storage / report generation."""
         return {
@@ -181,52 +416,77 @@ def get_session(session_id: str) -> Optional[InterviewSession]:
 
 
 async def handle_interview_ws(client_ws: WebSocket, session_id: str,
-                               resume_summary: str, job_title: str):
+                               resume_summary: str, job_title: str,
+                               binary_audio: bool = False):
     """
     Main WebSocket handler that bridges the candidate's browser
     to the Gemini Live API.
 
     Messages from client:
-      - {"type": "audio", "data": "<base64 PCM>"}
+      - binary audio frame (interview_audio.FRAME_AUDIO, 16 kHz PCM)
+      - {"type": "audio", "data": "<base64 PCM>"}  (legacy)
       - {"type": "proctoring_event", ...}
       - {"type": "coding_submit", "code": "...", "language": "..."}
       - {"type": "end"}
 
     Messages to client:
-      - {"type": "audio", "data": "<base64 PCM>"}
+      - binary audio frame (24 kHz PCM) when binary_audio,
+        otherwise {"type": "audio", "data": "<base64 PCM>"}
       - {"type": "transcript", "role": "...", "text": "..."}
       - {"type": "phase_change", "phase": "coding" | "complete"}
+      - {"type": "vad", "state": "speech" | "silence"}  (uplink VAD markers)
       - {"type": "function_call", "name": "...", "args": {...}}
       - {"type": "error", "message": "..."}
     """
     await client_ws.accept()
 
-    session = InterviewSession(session_id, resume_summary, job_title)
+    session = InterviewSession(session_id, resume_summary, job_title, binary_audio)
+    session.outbox = _SessionOutbox(client_ws)
     _sessions[session_id] = session
+    ended_cleanly = False
 
     try:
-        # Connect to Gemini Live API
-        session.gemini_ws = await websockets.connect(
-            GEMINI_WS_URL,
-            additional_headers={"Content-Type": "application/json"},
-            max_size=None,  # No limit on message size
-        )
+        accepted_at = time.monotonic()
+        setup_key, setup_payload = get_setup_payload(resume_summary, job_title)
+        prepared = await gemini_pool.claim(session_id, setup_key)
+        if prepared:
+            # Connected and set up while the candidate was on the pre-join screen
+            session.gemini_ws, setup_response = prepared
+        else:
+            # Connect to Gemini Live API (warm pooled socket when available)
+            session.gemini_ws = await gemini_pool.acquire()
+
+            # Send setup message
+            await session.gemini_ws.send(setup_payload)
+
+            # Wait for setup complete
+            setup_response = await session.gemini_ws.recv()
         session._active = True
-
-        # Send setup message
-        setup_msg = build_setup_message(resume_summary, job_title)
-        await session.gemini_ws.send(json.dumps(setup_msg))
-
-        # Wait for setup complete
-        setup_response = await session.gemini_ws.recv()
         setup_data = json.loads(setup_response)
-        print(f"[Interview {session_id}] Gemini session established: {json.dumps(setup_data)[:200]}")
+        print(f"[Interview {session_id}] Gemini session established{' (prepared)' if prepared else ''}: "
+              f"{json.dumps(setup_data)[:200]}")
+
+        session.audio_in = AudioCoalescer(
+            lambda frame: session.gemini_ws.send(realtime_audio_message(frame)),
+            INPUT_SAMPLE_RATE, AUDIO_IN_FRAME_MS, AUDIO_IN_MAX_WAIT_MS,
+            silence_peak=AUDIO_SILENCE_PEAK,
+        )
+        session.audio_out = AudioCoalescer(
+            lambda frame: _send_audio_to_client(session, frame),
+            OUTPUT_SAMPLE_RATE, AUDIO_OUT_FRAME_MS, AUDIO_OUT_MAX_WAIT_MS,
+            prebuffer_ms=AUDIO_OUT_PREBUFFER_MS,
+        )
+        session.audio_in.start()
+        session.audio_out.start()
 
         # Notify client that session is ready
-        await client_ws.send_json({
+        session.outbox.send_control({
             "type": "session_ready",
             "session_id": session_id
         })
+        session_ready_stats["sessions"] += 1
+        session_ready_stats["prepared"] += 1 if prepared else 0
+        session_ready_stats["total_ms"] += (time.monotonic() - accepted_at) * 1000
 
         # Prompt Gemini to start speaking first with a greeting
         initial_prompt = {
@@ -254,6 +514,7 @@ async def handle_interview_ws(client_ws: WebSocket, session_id: str,
             _client_to_gemini(client_ws, session),
             _gemini_to_client(client_ws, session),
         )
+        ended_cleanly = True
 
     except WebSocketDisconnect:
         print(f"[Interview {session_id}] Client disconnected")
@@ -261,37 +522,51 @@ async def handle_interview_ws(client_ws: WebSocket, session_id: str,
         print(f"[Interview {session_id}] Error: {e}")
         traceback.print_exc()
         try:
-            await client_ws.send_json({"type": "error", "message": str(e)})
+            session.outbox.send_control({"type": "error", "message": str(e)})
         except Exception:
             pass
     finally:
         session._active = False
+        if session.audio_in:
+            await session.audio_in.stop(drain=False)
+        # On a normal end (e.g. end_interview) the goodbye audio still goes out;
+        # on errors pending audio is discarded (after a disconnect the writer's
+        # first failed send ends it anyway)
+        if session.audio_out:
+            await session.audio_out.stop(drain=ended_cleanly)
+        if ended_cleanly:
+            await session.outbox.close(drain_audio=True, timeout=INTERVIEW_OUTBOX_DRAIN_SECONDS)
+        else:
+            await session.outbox.close()
         if session.gemini_ws:
             await session.gemini_ws.close()
-        print(f"[Interview {session_id}] Session ended. Transcript entries: {len(session.transcript)}")
+        print(f"[Interview {session_id}] Session ended. Transcript entries: {len(session.transcript)}, "
+              f"audio: {session.audio_metrics()}")
 
 
 async def _client_to_gemini(client_ws: WebSocket, session: InterviewSession):
     """Forward messages from the browser client to Gemini Live API."""
     try:
         while session._active:
-            raw = await client_ws.receive_text()
-            msg = json.loads(raw)
+            message = await client_ws.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+
+            if message.get("bytes") is not None:
+                # Binary audio frame: raw PCM spliced straight into the Gemini envelope
+                try:
+                    _, _, pcm = unpack_frame(message["bytes"])
+                except FrameError as e:
+                    print(f"[Interview {session.session_id}] Dropped client frame: {e}")
+                    continue
+                await _forward_audio(session, pcm)
+                continue
+
+            msg = json.loads(message["text"])
 
             if msg.get("type") == "audio":
-                # Forward audio chunk to Gemini
-                gemini_msg = {
-                    "realtime_input": {
-                        "media_chunks": [
-                            {
-                                "data": msg["data"],  # base64 PCM
-                                "mime_type": "audio/pcm"
-                            }
-                        ]
-                    }
-                }
-                if session.gemini_ws:
-                    await session.gemini_ws.send(json.dumps(gemini_msg))
+                # Legacy JSON audio frame
+                await _forward_audio(session, base64.b64decode(msg["data"]))
 
             elif msg.get("type") == "vision_frame":
                 # Analyze webcam frame with Gemini Vision (non-blocking)
@@ -333,11 +608,62 @@ async def _client_to_gemini(client_ws: WebSocket, session: InterviewSession):
 
     except WebSocketDisconnect:
         session._active = False
+    except AudioSinkError:
+        print(f"[Interview {session.session_id}] Gemini connection closed")
+        session._active = False
     except Exception as e:
         print(f"[Interview {session.session_id}] Client→Gemini error: {e}")
         session._active = False
 
 
+async def _forward_audio(session: InterviewSession, pcm):
+    """
+    Queue one 16 kHz PCM chunk for Gemini (coalesced into AUDIO_IN_FRAME_MS frames).
+    Raises AudioSinkError once sending to Gemini has failed.
+    """
+    session.audio_stats["in_frames"] += 1
+    session.audio_stats["in_bytes"] += len(pcm)
+    if not session.vad_active:
+        session.audio_in.push(pcm)
+        return
+
+    forward, marker = session.vad.process(pcm)
+    if marker == "speech_start":
+        session.outbox.send_control({"type": "vad", "state": "speech"})
+    if forward:
+        session.audio_in.push(pcm)
+    if marker == "speech_stop":
+        # Hand Gemini the tail of the utterance, then tell it the stream paused
+        try:
+            await session.audio_in.drain()
+            if session.gemini_ws:
+                await session.gemini_ws.send(AUDIO_STREAM_END_MESSAGE)
+        except (AudioSinkError, websockets.exceptions.ConnectionClosed):
+            print(f"[Interview {session.session_id}] Gemini connection closed")
+            session._active = False
+            return
+        session.outbox.send_control({"type": "vad", "state": "silence"})
+
+
+async def _send_after_audio(session: InterviewSession, message: dict):
+    """Send a turn/phase event behind the audio already received for the turn."""
+    # Release the jitter buffer into the outbox, then queue the event behind it
+    await session.audio_out.drain()
+    session.outbox.send_control(message, after_audio=True)
+
+
+async def _send_audio_to_client(session: InterviewSession, pcm: bytes):
+    """Queue one 24 kHz PCM frame released by the jitter buffer for the browser."""
+    if session.binary_audio:
+        session.outbox.send_audio(pack_audio_frame(pcm, session._out_sequence))
+        session._out_sequence += 1
+    else:
+        session.outbox.send_audio(json.dumps({
+            "type": "audio",
+            "data": base64.b64encode(pcm).decode("ascii")  # base64 PCM
+        }))
+
+
 async def _process_vision_frame(client_ws: WebSocket, session: InterviewSession,
                                  frame_base64: str):
     """Analyze a webcam frame with Gemini Vision and send results to client."""
@@ -351,7 +677,7 @@ async def _process_vision_frame(client_ws: WebSocket, session: InterviewSession,
         print(f"[Interview {session.session_id}] Vision analysis: {suspicion} — {summary}")
 
         # Send result to the client so it can update the integrity badge
-        await client_ws.send_json({
+        session.outbox.send_control({
             "type": "vision_result",
             "suspicion_level": suspicion,
             "summary": summary,
@@ -391,24 +717,28 @@ async def _gemini_to_client(client_ws: WebSocket, session: InterviewSession):
                     if "inlineData" in part:
                         inline = part["inlineData"]
                         if inline.get("mimeType", "").startswith("audio/"):
-                            await client_ws.send_json({
-                                "type": "audio",
-                                "data": inline["data"]  # base64 PCM
-                            })
+                            pcm = base64.b64decode(inline["data"])
+                            session.audio_stats["out_frames"] += 1
+                            session.audio_stats["out_bytes"] += len(pcm)
+                            session.audio_out.push(pcm)
 
                     # Text (transcript)
                     if "text" in part:
                         text = part["text"]
                         session.log_transcript("ai", text)
-                        await client_ws.send_json({
+                        session.outbox.send_control({
                             "type": "transcript",
                             "role": "ai",
                             "text": text
                         })
 
                 # Check if turn is complete
+                # Candidate barged in: drop audio still held in the jitter buffer
+                if server_content.get("interrupted"):
+                    session.audio_out.clear()
+
                 if server_content.get("turnComplete"):
-                    await client_ws.send_json({"type": "turn_complete"})
+                    await _send_after_audio(session, {"type": "turn_complete"})
 
             # Handle tool calls (function calling)
             tool_call = response.get("toolCall")
@@ -421,7 +751,8 @@ async def _gemini_to_client(client_ws: WebSocket, session: InterviewSession):
                     print(f"[Interview {session.session_id}] Function call: {func_name}({func_args})")
 
                     if func_name == "start_coding_assessment":
-                        await client_ws.send_json({
+                        session.set_phase("coding")
+                        await _send_after_audio(session, {
                             "type": "phase_change",
                             "phase": "coding",
                             "difficulty": func_args.get("difficulty", "medium"),
@@ -444,8 +775,9 @@ async def _gemini_to_client(client_ws: WebSocket, session: InterviewSession):
                         await session.gemini_ws.send(json.dumps(func_response))
 
                     elif func_name == "end_interview":
+                        session.set_phase("complete")
                         session.log_transcript("system", f"Interview ended: {func_args.get('summary', '')}")
-                        await client_ws.send_json({
+                        await _send_after_audio(session, {
                             "type": "phase_change",
                             "phase": "complete",
                             "summary": func_args.get("summary", ""),
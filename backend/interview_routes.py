@@ -9,10 +9,17 @@ import json
 import asyncio
 from typing import Optional
 
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Query
+from fastapi import APIRouter, Request, WebSocket, WebSocketDisconnect, Query
 from fastapi.responses import JSONResponse, FileResponse
-
-from interview_handler import handle_interview_ws, get_session
+from pydantic import BaseModel
+
+from interview_handler import (
+    handle_interview_ws,
+    get_session,
+    gemini_pool,
+    pool_stats,
+    prepare_interview,
+)
 from code_executor import get_problem, execute_code
 from vision_proctor import analyze_frame, calculate_integrity_score
 from scoring_pipeline import (
@@ -26,6 +33,17 @@ from report_generator import generate_report
 router = APIRouter()
 
 
+@router.on_event("startup")
+async def start_gemini_pool():
+    """Pre-connect Gemini Live sockets so interviews start without a cold connect."""
+    gemini_pool.start()
+
+
+@router.on_event("shutdown")
+async def stop_gemini_pool():
+    await gemini_pool.stop()
+
+
 # ═══════════════════════════════════════════════════
 # INTERVIEW WEBSOCKET
 # ═══════════════════════════════════════════════════
@@ -36,12 +54,57 @@ async def interview_websocket(
     session_id: str,
     resume_summary: str = Query(default=""),
     job_title: str = Query(default="Software Engineer"),
+    audio_format: str = Query(default="json"),
 ):
     """
     Main WebSocket endpoint for the AI interview session.
     Bridges the candidate's browser to the Gemini Live API.
+    audio_format=binary switches server → browser audio to binary frames.
+    """
+    await handle_interview_ws(websocket, session_id, resume_summary, job_title,
+                              binary_audio=audio_format == "binary")
+
+
+class PrepareInterviewRequest(BaseModel):
+    resume_summary: str = ""
+    job_title: str = "Software Engineer"
+
+
+@router.post("/api/interview/prepare")
+async def prepare_interview_session(body: PrepareInterviewRequest, request: Request):
     """
-    await handle_interview_ws(websocket, session_id, resume_summary, job_title)
+    Warm up a Gemini Live session before the candidate joins.
+    Returns a server-issued session_id; the WebSocket must connect with that
+    id and the same resume_summary / job_title to pick up the prepared session.
+    Refused (429) once the pool already holds its maximum of prepared sessions;
+    the interview then connects on join as usual.
+    """
+    client = request.client.host if request.client else "unknown"
+    session_id = prepare_interview(body.resume_summary, body.job_title, client)
+    if session_id is None:
+        return JSONResponse(
+            status_code=429,
+            content={"detail": "Too many interviews are being prepared."}
+        )
+    return {"status": "preparing", "session_id": session_id}
+
+
+@router.get("/api/interview/pool-stats")
+async def interview_pool_stats():
+    """Gemini Live pool / setup cache hit rates and time to session_ready."""
+    return pool_stats()
+
+
+@router.get("/api/interview/{session_id}/audio-stats")
+async def interview_audio_stats(session_id: str):
+    """Audio message rates for a live (or finished) interview session."""
+    session = get_session(session_id)
+    if not session:
+        return JSONResponse(
+            status_code=404,
+            content={"detail": "Session not found."}
+        )
+    return session.audio_metrics()
 
 
 # ═══════════════════════════════════════════════════
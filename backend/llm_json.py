@@ -0,0 +1,262 @@
+"""
+OpenHire — LLM JSON Helpers
+===========================
+Shared handling for JSON produced by LLMs (Ollama, Gemini, Claude).
+
+parse_llm_json() is a tolerant, linear-time extractor. It takes the first
+top-level object/array in the text and repairs it in a single pass:
+  - markdown fences and prose around the value are skipped,
+  - raw newlines/tabs inside strings are escaped,
+  - unescaped quotes inside strings are escaped (a quote only closes a
+    string when the next non-blank character is : , } ] or the end),
+  - trailing commas are dropped and mismatched closers corrected,
+  - truncated output is closed (open string, dangling key/comma,
+    half-written literal or number, and every still-open bracket).
+An optional lightweight schema checks required keys and their types.
+
+JsonCompletionScanner follows a streamed completion character by
+character and reports the moment the first top-level JSON object/array is
+structurally complete, so generation can be stopped instead of waiting
+for the model to ramble (or pad whitespace) up to num_predict.
+"""
+
+import re
+import json
+from typing import Any, Optional
+
+_WHITESPACE = " \t\r\n"
+_CLOSERS = {"{": "}", "[": "]"}
+_STRING_ESCAPES = {"\n": "\\n", "\r": "\\r", "\t": "\\t"}
+# Runs copied verbatim in one step: ordinary string content / anything outside
+# strings that is not structural (numbers, literals, whitespace)
+_STRING_RUN = re.compile(r'[^"\\\n\r\t]+')
+_PLAIN_RUN = re.compile(r'[^"{}\[\],:\s]+')
+_WHITESPACE_RUN = re.compile(r"\s+")
+_NON_WHITESPACE = re.compile(r"\S")
+_LITERALS = ("true", "false", "null")
+_decoder = json.JSONDecoder()
+
+
+class LLMJSONSchemaError(ValueError):
+    """Parsed JSON does not have the expected shape."""
+
+
+def _next_significant(text: str, i: int) -> int:
+    """Index of the first non-whitespace character after position i (len if none)."""
+    match = _NON_WHITESPACE.search(text, i + 1)
+    return match.start() if match else len(text)
+
+
+def _find_start(text: str, expect: Optional[str]) -> int:
+    openers = {"object": "{", "array": "["}.get(expect, "{[")
+    positions = [p for p in (text.find(ch) for ch in openers) if p >= 0]
+    return min(positions) if positions else -1
+
+
+def repair_json(text: str, expect: Optional[str] = None) -> str:
+    """Return the first JSON object/array in `text`, repaired in one linear pass."""
+    start = _find_start(text, expect)
+    if start < 0:
+        raise json.JSONDecodeError("No JSON object or array found", text, 0)
+    out: list[str] = []
+    stack: list[str] = []
+    in_string = False
+    escaped = False
+    last_sig = -1   # index in `out` of the last non-whitespace token outside strings
+    in_key = False       # the open string is an object key
+    key_start = -1       # index in `out` where that key string began
+    pending_key = False  # a key has closed but its ':' has not been seen yet
+
+    i, n = start, len(text)
+    while i < n:
+        ch = text[i]
+        if in_string:
+            run = None if escaped else _STRING_RUN.match(text, i)
+            if run:
+                out.append(run.group())
+                i = run.end()
+                continue
+            if escaped:
+                out.append(ch)
+                escaped = False
+            elif ch == "\\":
+                out.append(ch)
+                escaped = True
+            elif ch == '"':
+                nxt = _next_significant(text, i)
+                if nxt == n or text[nxt] in ":,}]":
+                    out.append(ch)
+                    in_string = False
+                    pending_key = in_key
+                    last_sig = len(out) - 1
+                else:
+                    out.append('\\"')
+            else:
+                out.append(_STRING_ESCAPES.get(ch, ch))
+        elif ch == '"':
+            in_key = bool(stack) and stack[-1] == "}" and (last_sig < 0 or out[last_sig] in ("{", ","))
+            key_start = len(out)
+            out.append(ch)
+            in_string = True
+        elif ch in "{[":
+            stack.append(_CLOSERS[ch])
+            out.append(ch)
+            last_sig = len(out) - 1
+        elif ch in "}]":
+            if not stack:
+                break
+            if last_sig >= 0 and out[last_sig] == ",":
+                del out[last_sig]
+            out.append(stack.pop())
+            last_sig = len(out) - 1
+            if not stack:
+                return "".join(out)
+        elif ch in _WHITESPACE:
+            run = _WHITESPACE_RUN.match(text, i)
+            out.append(run.group())
+            i = run.end()
+            continue
+        elif ch in ",:":
+            out.append(ch)
+            last_sig = len(out) - 1
+            if ch == ":":
+                pending_key = False
+        else:
+            run = _PLAIN_RUN.match(text, i)
+            out.append(run.group())
+            last_sig = len(out) - 1
+            i = run.end()
+            continue
+        i += 1
+
+    # Truncated output: close whatever is still open
+    if in_string and in_key:
+        # A half-written key cannot be kept
+        del out[key_start:]
+    elif in_string:
+        if escaped:
+            out.pop()
+        out.append('"')
+        pending_key = False
+    while out and out[-1].isspace():
+        out.pop()
+    tail = out[-1] if out else ""
+    literal = next((lit for lit in _LITERALS if tail and lit.startswith(tail)), None)
+    if literal and not in_string:
+        out[-1] = literal
+    elif tail[-1:] in ("-", ".", "e", "E", "+") and not in_string:
+        # Half-written number
+        out[-1] = tail.rstrip("-.eE+") or "0"
+    if pending_key and not (in_string and in_key):
+        out.append(": null")
+    elif tail == ",":
+        out.pop()
+    elif tail == ":":
+        out.append(" null")
+    out.extend(reversed(stack))
+    return "".join(out)
+
+
+def _decode_embedded(text: str, expect: Optional[str]) -> Any:
+    """Fast path: a valid value wrapped in fences or prose (C decoder, no repair)."""
+    start = _find_start(text, expect)
+    if start < 0:
+        return None
+    try:
+        return _decoder.raw_decode(text, start)[0]
+    except json.JSONDecodeError:
+        return None
+
+
+def _check_schema(value: Any, schema: dict):
+    if not isinstance(value, dict):
+        raise LLMJSONSchemaError(f"Expected a JSON object, got {type(value).__name__}")
+    problems = []
+    for key, expected_type in schema.items():
+        if key not in value:
+            problems.append(f"missing '{key}'")
+        elif not isinstance(value[key], expected_type):
+            problems.append(f"'{key}' is {type(value[key]).__name__}")
+    if problems:
+        raise LLMJSONSchemaError("Unexpected JSON shape: " + ", ".join(problems))
+
+
+def parse_llm_json(text: str, expect: Optional[str] = None, schema: Optional[dict] = None) -> Any:
+    """
+    Parse JSON from LLM output.
+
+    expect: "object" / "array" to pick which top-level value to extract. When an
+            array is expected but the model wrapped it (e.g. {"questions": [...]}),
+            the first list value of the object is returned.
+    schema: {key: type or tuple of types} required on the resulting object.
+
+    Raises json.JSONDecodeError when no JSON can be recovered and
+    LLMJSONSchemaError when the shape does not match.
+    """
+    stripped = (text or "").strip()
+    try:
+        value = json.loads(stripped)
+    except json.JSONDecodeError:
+        value = _decode_embedded(stripped, expect)
+        if value is None:
+            value = json.loads(repair_json(stripped, expect))
+
+    if expect == "array" and isinstance(value, dict):
+        value = next((v for v in value.values() if isinstance(v, list)), value)
+    if expect == "array" and not isinstance(value, list):
+        raise LLMJSONSchemaError(f"Expected a JSON array, got {type(value).__name__}")
+    if expect == "object" and not isinstance(value, dict):
+        raise LLMJSONSchemaError(f"Expected a JSON object, got {type(value).__name__}")
+    if schema:
+        _check_schema(value, schema)
+    return value
+
+
+class JsonCompletionScanner:
+    """Incremental bracket/string tracker for the first top-level JSON value."""
+
+    def __init__(self):
+        self.text_parts: list[str] = []
+        self._length = 0
+        self._depth = 0
+        self._started = False
+        self._in_string = False
+        self._escaped = False
+        self.end: int | None = None   # index just past the closing bracket
+
+    @property
+    def complete(self) -> bool:
+        return self.end is not None
+
+    @property
+    def text(self) -> str:
+        """Everything fed so far, truncated at the end of the JSON value once complete."""
+        joined = "".join(self.text_parts)
+        return joined[:self.end] if self.end is not None else joined
+
+    def feed(self, chunk: str) -> bool:
+        """Consume a chunk; returns True once the top-level value has closed."""
+        if self.end is not None:
+            return True
+        self.text_parts.append(chunk)
+        for offset, ch in enumerate(chunk):
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif ch == "\\":
+                    self._escaped = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                if self._started:
+                    self._in_string = True
+            elif ch in "{[":
+                self._started = True
+                self._depth += 1
+            elif ch in "}]" and self._started:
+                self._depth -= 1
+                if self._depth == 0:
+                    self.end = self._length + offset + 1
+                    break
+        self._length += len(chunk)
+        return self.end is not None
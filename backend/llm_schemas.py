@@ -0,0 +1,173 @@
+"""
+OpenHire — Structured Output Schemas
+====================================
+Pydantic models for every JSON-producing LLM call, handed to the model
+as a constrained-decoding schema instead of describing the shape in
+prose and repairing whatever comes back:
+
+  - Ollama:  payload "format" = ollama_format(Model)       (JSON schema)
+  - Gemini:  GenerationConfig(**gemini_config(Model))      (response_schema)
+
+validate() returns a typed model instance. Constrained output is decoded
+and validated in one step by pydantic; only if that fails (an older
+Ollama that ignores the schema, a truncated generation) does it fall back
+to llm_json's tolerant parser before validating.
+"""
+
+from functools import lru_cache
+from typing import Literal, Type, TypeVar
+
+from pydantic import BaseModel, ValidationError
+
+from llm_json import parse_llm_json
+
+Model = TypeVar("Model", bound=BaseModel)
+
+
+# ── Resume analyzer ──
+
+class ResumeCriterion(BaseModel):
+    criterion: str
+    weight: int
+    score: int
+    explanation: str
+
+
+class ResumeAnalysis(BaseModel):
+    criteria: list[ResumeCriterion]
+    summary: str
+
+
+class FactCheckQuestions(BaseModel):
+    questions: list[str]
+
+
+# ── Interview scoring ──
+
+class QuestionEvaluation(BaseModel):
+    question: str
+    answer_summary: str
+    score: int
+    feedback: str
+
+
+class QAEvaluation(BaseModel):
+    score: int
+    strengths: list[str]
+    weaknesses: list[str]
+    per_question: list[QuestionEvaluation]
+
+
+class CodeQualityEvaluation(BaseModel):
+    quality_score: int
+    feedback: str
+    time_complexity: str
+    space_complexity: str
+    readability: int
+    efficiency: int
+    best_practices: int
+
+
+class CommunicationEvaluation(BaseModel):
+    score: int
+    clarity: int
+    confidence: int
+    professionalism: int
+    feedback: str
+
+
+# ── Vision proctoring ──
+
+class ProctorFinding(BaseModel):
+    found: bool
+    description: str
+    confidence: float
+
+
+class FrameAnalysis(BaseModel):
+    devices_detected: ProctorFinding
+    other_people: ProctorFinding
+    notes_or_screens: ProctorFinding
+    reading_off_screen: ProctorFinding
+    face_visible: bool
+    overall_suspicion_level: Literal["none", "low", "medium", "high", "critical"]
+    summary: str
+
+
+# ── Performance review ──
+
+class EmployeeReview(BaseModel):
+    final_category: Literal["Raise / Promote", "Neutral", "At Risk / PIP"]
+    confidence: Literal["High", "Medium", "Low"]
+    strengths: list[str]
+    weaknesses: list[str]
+    reasoning: str
+    recommended_action: str
+
+
+# ── Provider schemas ──
+
+def _inline_refs(node, defs: dict):
+    """Replace {"$ref": "#/$defs/X"} with the definition (providers reject $refs)."""
+    if isinstance(node, dict):
+        if "$ref" in node:
+            return _inline_refs(defs[node["$ref"].rsplit("/", 1)[-1]], defs)
+        return {k: _inline_refs(v, defs) for k, v in node.items() if k != "$defs"}
+    if isinstance(node, list):
+        return [_inline_refs(v, defs) for v in node]
+    return node
+
+
+@lru_cache(maxsize=None)
+def _json_schema(model: Type[BaseModel]) -> dict:
+    schema = model.model_json_schema()
+    return _inline_refs(schema, schema.get("$defs", {}))
+
+
+def ollama_format(model: Type[BaseModel]) -> dict:
+    """Value for the Ollama /api/generate "format" field."""
+    return _json_schema(model)
+
+
+# Gemini's response_schema accepts a subset of OpenAPI 3 schema objects
+_GEMINI_SCHEMA_KEYS = {"type", "format", "description", "nullable", "enum", "properties", "required", "items"}
+
+
+def _gemini_schema_node(node: dict) -> dict:
+    result = {}
+    for key, value in node.items():
+        if key not in _GEMINI_SCHEMA_KEYS:
+            continue
+        if key == "properties":
+            value = {name: _gemini_schema_node(prop) for name, prop in value.items()}
+        elif key == "items":
+            value = _gemini_schema_node(value)
+        result[key] = value
+    return result
+
+
+@lru_cache(maxsize=None)
+def _gemini_schema(model: Type[BaseModel]) -> dict:
+    return _gemini_schema_node(_json_schema(model))
+
+
+def gemini_config(model: Type[BaseModel]) -> dict:
+    """GenerationConfig kwargs that constrain Gemini output to the model's schema."""
+    return {"response_mime_type": "application/json", "response_schema": _gemini_schema(model)}
+
+
+# ── Validation ──
+
+def validate(model: Type[Model], raw: str) -> Model:
+    """
+    Validate constrained LLM output (the generated text) into `model`.
+    Raises pydantic.ValidationError when the content does not fit the schema.
+    """
+    try:
+        return model.model_validate_json(raw)
+    except ValidationError as e:
+        if not any(err["type"] == "json_invalid" for err in e.errors()):
+            raise
+    # Not valid JSON (schema ignored or output cut off): tolerant parse, then validate
+    return model.model_validate(parse_llm_json(raw, expect="object"))
+
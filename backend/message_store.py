@@ -0,0 +1,200 @@
+"""
+OpenHire — Chat Message Store
+=============================
+Bounded, persistent storage for /ws/chat direct messages.
+
+Each message is stored once per conversation (the unordered pair of
+participants) instead of once per user, and every conversation is a ring
+buffer: only the newest `max_per_conversation` messages are kept.
+
+Backends:
+  - SQLiteMessageStore (default): survives restarts, WAL mode, indexed
+    per-user pagination.
+  - InMemoryMessageStore: per-conversation deques, for tests / ephemeral
+    deployments.
+
+Select with CHAT_MESSAGE_STORE=sqlite|memory (see `create_message_store`).
+History is paged newest-first with a `before` cursor (the `seq` of the
+oldest message already seen) and returned oldest-first within a page.
+"""
+
+import os
+import json
+import sqlite3
+import threading
+from collections import deque
+from typing import Optional
+
+MAX_PER_CONVERSATION = int(os.getenv("CHAT_HISTORY_PER_CONVERSATION", "500"))
+DEFAULT_DB_PATH = os.getenv(
+    "CHAT_MESSAGE_DB", os.path.join(os.path.dirname(os.path.abspath(__file__)), "chat_messages.db"),
+)
+
+
+def conversation_key(sender: str, recipient: str) -> str:
+    """Order-independent key for the pair of participants."""
+    return "|".join(sorted(p for p in (sender, recipient) if p))
+
+
+class MessageStore:
+    """Interface for chat message backends."""
+
+    def append(self, message: dict) -> dict:
+        """Persist a message and return it with its assigned `seq`."""
+        raise NotImplementedError
+
+    def history(self, user_id: str, before: Optional[int] = None, limit: int = 50) -> dict:
+        """
+        Return {"messages": [...oldest first], "has_more": bool, "next_before": seq | None}
+        for the messages `user_id` sent or received, newest page first.
+        """
+        raise NotImplementedError
+
+    def stats(self) -> dict:
+        raise NotImplementedError
+
+    @staticmethod
+    def _page(rows: list[dict], limit: int) -> dict:
+        # `rows` is newest-first and holds up to limit + 1 entries
+        has_more = len(rows) > limit
+        page = list(reversed(rows[:limit]))
+        return {
+            "messages": page,
+            "has_more": has_more,
+            "next_before": page[0]["seq"] if has_more and page else None,
+        }
+
+
+class InMemoryMessageStore(MessageStore):
+    """Per-conversation ring buffers held in process memory."""
+
+    def __init__(self, max_per_conversation: int = MAX_PER_CONVERSATION):
+        self.max_per_conversation = max_per_conversation
+        self._conversations: dict[str, deque] = {}
+        self._user_conversations: dict[str, set[str]] = {}
+        self._seq = 0
+        self._lock = threading.Lock()
+
+    def append(self, message: dict) -> dict:
+        sender, recipient = message.get("from", ""), message.get("to", "")
+        key = conversation_key(sender, recipient)
+        with self._lock:
+            self._seq += 1
+            stored = {**message, "seq": self._seq}
+            buffer = self._conversations.get(key)
+            if buffer is None:
+                buffer = self._conversations[key] = deque(maxlen=self.max_per_conversation)
+            buffer.append(stored)
+            for uid in (sender, recipient):
+                if uid:
+                    self._user_conversations.setdefault(uid, set()).add(key)
+        return stored
+
+    def history(self, user_id: str, before: Optional[int] = None, limit: int = 50) -> dict:
+        with self._lock:
+            rows = [
+                msg
+                for key in self._user_conversations.get(user_id, ())
+                for msg in self._conversations[key]
+                if before is None or msg["seq"] < before
+            ]
+        rows.sort(key=lambda msg: msg["seq"], reverse=True)
+        return self._page(rows[:limit + 1], limit)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "backend": "memory",
+                "conversations": len(self._conversations),
+                "messages": sum(len(b) for b in self._conversations.values()),
+                "max_per_conversation": self.max_per_conversation,
+            }
+
+
+class SQLiteMessageStore(MessageStore):
+    """SQLite-backed store; one row per message, trimmed per conversation."""
+
+    def __init__(self, path: str = DEFAULT_DB_PATH, max_per_conversation: int = MAX_PER_CONVERSATION):
+        self.path = path
+        self.max_per_conversation = max_per_conversation
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS messages (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                conversation TEXT NOT NULL,
+                sender TEXT NOT NULL,
+                recipient TEXT NOT NULL,
+                payload TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_messages_conversation ON messages(conversation, seq);
+            CREATE INDEX IF NOT EXISTS idx_messages_sender ON messages(sender, seq);
+            CREATE INDEX IF NOT EXISTS idx_messages_recipient ON messages(recipient, seq);
+        """)
+        self._conn.commit()
+
+    def append(self, message: dict) -> dict:
+        sender, recipient = message.get("from", ""), message.get("to", "")
+        key = conversation_key(sender, recipient)
+        with self._lock:
+            cur = self._conn.execute(
+                "INSERT INTO messages (conversation, sender, recipient, payload) VALUES (?, ?, ?, ?)",
+                (key, sender, recipient, json.dumps(message)),
+            )
+            seq = cur.lastrowid
+            # Ring buffer: drop everything older than the newest N in this conversation
+            self._conn.execute(
+                """DELETE FROM messages WHERE conversation = ? AND seq <= (
+                       SELECT seq FROM messages WHERE conversation = ?
+                       ORDER BY seq DESC LIMIT 1 OFFSET ?)""",
+                (key, key, self.max_per_conversation),
+            )
+            self._conn.commit()
+        return {**message, "seq": seq}
+
+    def history(self, user_id: str, before: Optional[int] = None, limit: int = 50) -> dict:
+        cursor = before if before is not None else 2 ** 63 - 1
+        with self._lock:
+            # Two bounded index range scans (sent / received) merged by seq
+            rows = self._conn.execute(
+                """SELECT seq, payload FROM (
+                       SELECT * FROM (SELECT seq, payload FROM messages
+                                      WHERE sender = ? AND seq < ? ORDER BY seq DESC LIMIT ?)
+                       UNION
+                       SELECT * FROM (SELECT seq, payload FROM messages
+                                      WHERE recipient = ? AND seq < ? ORDER BY seq DESC LIMIT ?)
+                   ) ORDER BY seq DESC LIMIT ?""",
+                (user_id, cursor, limit + 1, user_id, cursor, limit + 1, limit + 1),
+            ).fetchall()
+        return self._page([{**json.loads(payload), "seq": seq} for seq, payload in rows], limit)
+
+    def stats(self) -> dict:
+        with self._lock:
+            messages, conversations = self._conn.execute(
+                "SELECT COUNT(*), COUNT(DISTINCT conversation) FROM messages"
+            ).fetchone()
+        return {
+            "backend": "sqlite",
+            "path": self.path,
+            "conversations": conversations,
+            "messages": messages,
+            "max_per_conversation": self.max_per_conversation,
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def create_message_store() -> MessageStore:
+    """Build the backend selected by CHAT_MESSAGE_STORE (default: sqlite)."""
+    backend = os.getenv("CHAT_MESSAGE_STORE", "sqlite").lower()
+    if backend == "memory":
+        return InMemoryMessageStore()
+    try:
+        return SQLiteMessageStore()
+    except sqlite3.Error as e:
+        print(f" SQLite message store unavailable, falling back to memory: {e}")
+        return InMemoryMessageStore()
@@ -0,0 +1,57 @@
+"""
+OpenHire — Resume PDF Text Extraction
+=====================================
+PyMuPDF extraction run in a process pool, straight from the uploaded
+bytes (no temp files, no work on the event loop thread).
+
+Kept in its own module so pool workers only import PyMuPDF, not the
+whole FastAPI app (worker processes are spawned on Windows/macOS).
+
+Extraction stops at RESUME_MAX_PAGES pages or as soon as the character
+budget the prompts actually use has been collected.
+"""
+
+import os
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+import fitz  # PyMuPDF
+
+PDF_EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", "2"))
+RESUME_MAX_PAGES = int(os.getenv("RESUME_MAX_PAGES", "10"))
+# Characters of resume text sent to the model
+RESUME_TEXT_BUDGET = 4000
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def extract_text(contents: bytes, max_pages: int = RESUME_MAX_PAGES,
+                 char_budget: int = RESUME_TEXT_BUDGET) -> tuple[str, int]:
+    """Return (text, total page count), reading pages only until the budget is met."""
+    parts, collected = [], 0
+    with fitz.open(stream=contents, filetype="pdf") as doc:
+        page_count = doc.page_count
+        for index in range(min(page_count, max_pages)):
+            text = doc.load_page(index).get_text()
+            parts.append(text)
+            collected += len(text)
+            if collected >= char_budget:
+                break
+    return "".join(parts)[:char_budget], page_count
+
+
+async def extract_text_async(contents: bytes) -> tuple[str, int]:
+    """Run `extract_text` on the shared process pool."""
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=PDF_EXTRACT_WORKERS)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_pool, extract_text, contents)
+
+
+def shutdown():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
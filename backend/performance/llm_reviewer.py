@@ -1,22 +1,19 @@
 """
 LLM reviewer using Claude for edge-case employee performance review.
 Only called for flagged employees to save API costs.
-Includes retry logic for transient API errors (529 overloaded).
+Calls go through the shared pooled Ollama client, which retries transient
+errors (connection failures, 429/503/529) with backoff.
 """
 
-import json
-import time
-import requests
 import os
 
-MAX_RETRIES = 3
-RETRY_BASE_DELAY = 2  # seconds
+import http_clients
+from llm_schemas import EmployeeReview, ollama_format, validate
 
-OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
 OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "gemma3")
 
 
-def review_employee(row: dict, flag_reasons: list[str]) -> dict:
+async def review_employee(row: dict, flag_reasons: list[str]) -> dict:
     """
     Ask Ollama (Gemma) to review one flagged employee and return structured assessment.
     """
@@ -50,55 +47,31 @@ Respond ONLY with valid JSON in this exact format (no markdown, no extra text):
   "recommended_action": "specific, actionable recommendation"
 }}"""
 
-    last_error = None
-    for attempt in range(1, MAX_RETRIES + 1):
-        try:
-            resp = requests.post(
-                f"{OLLAMA_BASE_URL}/api/generate",
-                json={
-                    "model": OLLAMA_MODEL,
-                    "prompt": prompt,
-                    "stream": False,
-                    "options": {
-                        "temperature": 0.0,
-                        "num_predict": 600,
-                    }
-                },
-                timeout=120,
-            )
-            resp.raise_for_status()
-
-            response_text = resp.json()["response"].strip()
-
-            # Handle potential markdown code blocks
-            if response_text.startswith("```"):
-                response_text = response_text.split("\n", 1)[1]
-                if response_text.endswith("```"):
-                    response_text = response_text[:-3].strip()
-
-            # Also sometimes Ollama includes trailing backticks without a newline
-            if "```" in response_text:
-                response_text = response_text.replace("```json", "").replace("```", "").strip()
-
-            return json.loads(response_text)
-        except requests.exceptions.RequestException as e:
-            last_error = e
-            if attempt < MAX_RETRIES:
-                delay = RETRY_BASE_DELAY * (2 ** (attempt - 1))
-                print(f"   API connectivity issue for {row['name']}, retrying in {delay}s (attempt {attempt}/{MAX_RETRIES})...")
-                time.sleep(delay)
-                continue
-            break
-        except Exception as e:
-            last_error = e
-            break
-    print(f"   LLM review failed for {row['name']}: {last_error}")
+    try:
+        resp = await http_clients.request(
+            "ollama", "POST", "/api/generate",
+            json={
+                "model": OLLAMA_MODEL,
+                "prompt": prompt,
+                "stream": False,
+                "format": ollama_format(EmployeeReview),
+                "options": {
+                    "temperature": 0.0,
+                    "num_predict": 600,
+                }
+            },
+        )
+        resp.raise_for_status()
+
+        return validate(EmployeeReview, resp.json()["response"]).model_dump()
+    except Exception as e:
+        print(f"   LLM review failed for {row['name']}: {e}")
     return {
         "final_category": row["category"],
         "confidence": "Low",
         "strengths": [],
         "weaknesses": [],
-        "reasoning": f"LLM review failed after {MAX_RETRIES} attempts. Falling back to rule-based category.",
+        "reasoning": "LLM review failed. Falling back to rule-based category.",
         "recommended_action": "Manual review recommended.",
     }
 
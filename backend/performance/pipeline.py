@@ -3,13 +3,15 @@ Performance review pipeline.
 Orchestrates: mock data → scoring → edge detection → LLM review → merged results.
 """
 
+import asyncio
+
 from .mock_data import EMPLOYEES
 from .scorer import calculate_scores
 from .edge_detector import detect_edge_cases
 from .llm_reviewer import review_employee
 
 
-def run_pipeline() -> list[dict]:
+async def run_pipeline() -> list[dict]:
     """
     Run the full performance review pipeline.
     Returns a list of employee results with scores, categories, and optional LLM reviews.
@@ -23,6 +25,14 @@ def run_pipeline() -> list[dict]:
 
     print("Performance pipeline: Step 3 - LLM reviewing flagged employees...")
 
+    # Flagged employees are reviewed concurrently; the shared Ollama client
+    # caps how many generations actually run at once
+    flagged = [row for row in scored if row["employee_id"] in edge_flags]
+    for row in flagged:
+        print(f"   -> LLM reviewing: {row['name']}...")
+    reviews = await asyncio.gather(*(review_employee(row, edge_flags[row["employee_id"]]) for row in flagged))
+    reviews_by_id = {row["employee_id"]: review for row, review in zip(flagged, reviews)}
+
     results = []
     for row in scored:
         emp_id = row["employee_id"]
@@ -49,8 +59,7 @@ def run_pipeline() -> list[dict]:
         }
 
         if is_edge:
-            print(f"   -> LLM reviewing: {row['name']}...")
-            review = review_employee(row, edge_flags[emp_id])
+            review = reviews_by_id[emp_id]
             result["llm_review"] = review
             result["final_category"] = review.get("final_category", row["category"])
 
@@ -0,0 +1,160 @@
+"""
+OpenHire — Content-Addressed Resume Analysis Cache
+==================================================
+On-disk cache so re-uploading the same PDF (or re-running it against the
+same job description) skips PyMuPDF and both Ollama prompts.
+
+Two kinds of entries, both JSON files named by SHA-256:
+  - text/<sha256(pdf)>.json                  extracted text + page count
+  - analysis/<sha256(pdf, jd, model, v)>.json the parsed analysis result
+
+The job description is whitespace-normalized before hashing. Bump
+ANALYSIS_VERSION whenever the prompts or result shape change.
+
+The directory is bounded by RESUME_CACHE_MAX_BYTES; the least recently
+used files (by mtime, refreshed on every hit) are evicted first.
+"""
+
+import os
+import json
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+RESUME_CACHE_DIR = os.getenv(
+    "RESUME_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "resume_cache"),
+)
+RESUME_CACHE_MAX_BYTES = int(os.getenv("RESUME_CACHE_MAX_BYTES", str(200 * 1024 * 1024)))
+ANALYSIS_VERSION = "3"
+
+
+def pdf_digest(contents: bytes) -> str:
+    return hashlib.sha256(contents).hexdigest()
+
+
+def normalize_job_description(text: str) -> str:
+    return " ".join((text or "").split())
+
+
+class ResumeAnalysisCache:
+    """Size-bounded, content-addressed JSON file cache (thread-safe)."""
+
+    def __init__(self, root: str = RESUME_CACHE_DIR, max_bytes: int = RESUME_CACHE_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # path -> size, least recently used first
+        self._index: OrderedDict[str, int] = OrderedDict()
+        self._bytes = 0
+        self.hits = {"text": 0, "analysis": 0}
+        self.misses = {"text": 0, "analysis": 0}
+        self.evictions = 0
+        for kind in ("text", "analysis"):
+            os.makedirs(os.path.join(root, kind), exist_ok=True)
+        self._load_index()
+
+    def _load_index(self):
+        entries = []
+        for kind in ("text", "analysis"):
+            folder = os.path.join(self.root, kind)
+            for name in os.listdir(folder):
+                path = os.path.join(folder, name)
+                if name.endswith(".tmp"):
+                    # Left behind by an interrupted write
+                    try:
+                        os.unlink(path)
+                    except OSError:
+                        pass
+                    continue
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, path, stat.st_size))
+        for _, path, size in sorted(entries):
+            self._index[path] = size
+            self._bytes += size
+
+    # ── Keys ──
+
+    @staticmethod
+    def analysis_key(digest: str, job_description: str, model: str) -> str:
+        material = "\x00".join([digest, normalize_job_description(job_description), model, ANALYSIS_VERSION])
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def _path(self, kind: str, key: str) -> str:
+        return os.path.join(self.root, kind, f"{key}.json")
+
+    # ── Storage ──
+
+    def _get(self, kind: str, key: str, count_miss: bool = True) -> Optional[dict]:
+        path = self._path(kind, key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                value = json.load(f)
+        except (OSError, ValueError):
+            if count_miss:
+                with self._lock:
+                    self.misses[kind] += 1
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        with self._lock:
+            self.hits[kind] += 1
+            if path in self._index:
+                self._index.move_to_end(path)
+        return value
+
+    def _put(self, kind: str, key: str, value: dict):
+        path = self._path(kind, key)
+        data = json.dumps(value).encode("utf-8")
+        # Write-then-rename so readers never see a partial file
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._bytes += len(data) - self._index.pop(path, 0)
+            self._index[path] = len(data)
+            self._evict()
+
+    def _evict(self):
+        while self._bytes > self.max_bytes and len(self._index) > 1:
+            path, size = self._index.popitem(last=False)
+            self._bytes -= size
+            self.evictions += 1
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+
+    # ── Public API ──
+
+    def get_text(self, digest: str) -> Optional[dict]:
+        """{"text": str, "pages": int} previously extracted from this PDF."""
+        return self._get("text", digest)
+
+    def put_text(self, digest: str, text: str, pages: int):
+        self._put("text", digest, {"text": text, "pages": pages})
+
+    def get_analysis(self, key: str, count_miss: bool = True) -> Optional[dict]:
+        """Cached analysis; pass count_miss=False when re-checking a key already counted."""
+        return self._get("analysis", key, count_miss)
+
+    def put_analysis(self, key: str, result: dict):
+        self._put("analysis", key, result)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._index),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": dict(self.hits),
+                "misses": dict(self.misses),
+                "evictions": self.evictions,
+            }
@@ -0,0 +1,227 @@
+"""
+OpenHire — Resume Analysis Job Queue
+====================================
+Runs resume analyses on a fixed pool of asyncio workers so a burst of
+uploads queues up instead of firing unbounded concurrent requests at the
+local Ollama server.
+
+Scheduling is fair across companies: each company_code has its own FIFO
+and workers take jobs from the companies round-robin, so one recruiter
+uploading 50 CVs does not starve everyone else.
+
+Jobs move queued → running → done | failed. Progress events are kept on
+the job and pushed to any SSE subscribers. Finished jobs are retained for
+RESUME_JOB_RETENTION_SECONDS so clients can poll for the result.
+"""
+
+import os
+import time
+import uuid
+import asyncio
+from collections import OrderedDict, deque
+from typing import Awaitable, Callable, Optional
+
+RESUME_JOB_WORKERS = int(os.getenv("RESUME_JOB_WORKERS", "2"))
+RESUME_JOB_MAX_QUEUED = int(os.getenv("RESUME_JOB_MAX_QUEUED", "200"))
+RESUME_JOB_RETENTION_SECONDS = float(os.getenv("RESUME_JOB_RETENTION_SECONDS", "3600"))
+
+# handler(job, progress) -> result dict; progress(stage, **details) records an event
+JobHandler = Callable[["ResumeJob", Callable[..., None]], Awaitable[dict]]
+
+
+class QueueFullError(Exception):
+    """Raised when too many jobs are already waiting."""
+
+
+class ResumeJob:
+    """A single queued resume analysis."""
+
+    def __init__(self, company_code: str, payload: dict):
+        self.id = uuid.uuid4().hex
+        self.company_code = company_code
+        self.payload = payload
+        self.status = "queued"
+        self.events: list[dict] = []
+        self.result: Optional[dict] = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.done = asyncio.Event()
+        self._subscribers: list[asyncio.Queue] = []
+
+    def emit(self, stage: str, **details):
+        event = {"stage": stage, "status": self.status, "at": time.time(), **details}
+        self.events.append(event)
+        for queue in self._subscribers:
+            queue.put_nowait(event)
+
+    def subscribe(self) -> asyncio.Queue:
+        """Queue receiving every past and future event for this job."""
+        queue: asyncio.Queue = asyncio.Queue()
+        for event in self.events:
+            queue.put_nowait(event)
+        self._subscribers.append(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        if queue in self._subscribers:
+            self._subscribers.remove(queue)
+
+    def to_dict(self, position: Optional[int] = None) -> dict:
+        data = {
+            "job_id": self.id,
+            "status": self.status,
+            "company_code": self.company_code,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "progress": self.events[-1] if self.events else None,
+        }
+        if position is not None:
+            data["queue_position"] = position
+        if self.status == "done":
+            data["result"] = self.result
+        elif self.status == "failed":
+            data["error"] = self.error
+        return data
+
+
+class ResumeJobQueue:
+    """Fair (round-robin per company) job queue served by a fixed worker pool."""
+
+    def __init__(self, handler: JobHandler, workers: int = RESUME_JOB_WORKERS,
+                 max_queued: int = RESUME_JOB_MAX_QUEUED):
+        self._handler = handler
+        self.worker_count = workers
+        self.max_queued = max_queued
+        self._lanes: OrderedDict[str, deque] = OrderedDict()
+        self._jobs: dict[str, ResumeJob] = {}
+        self._wakeup: Optional[asyncio.Condition] = None
+        self._workers: list[asyncio.Task] = []
+        self.completed = 0
+        self.failed = 0
+        self._wait_total = 0.0
+        self._run_total = 0.0
+
+    # ── Lifecycle ──
+
+    def start(self):
+        if self._workers:
+            return
+        self._wakeup = asyncio.Condition()
+        self._workers = [asyncio.create_task(self._worker(i)) for i in range(self.worker_count)]
+        print(f"Resume job queue started with {self.worker_count} workers")
+
+    async def stop(self):
+        for task in self._workers:
+            task.cancel()
+        self._workers = []
+
+    # ── Submission ──
+
+    @property
+    def queued(self) -> int:
+        return sum(len(lane) for lane in self._lanes.values())
+
+    async def submit(self, company_code: str, payload: dict) -> ResumeJob:
+        self.start()
+        self._prune()
+        if self.queued >= self.max_queued:
+            raise QueueFullError(f"{self.queued} resume analyses already queued")
+        job = ResumeJob(company_code or "_default", payload)
+        self._jobs[job.id] = job
+        async with self._wakeup:
+            self._lanes.setdefault(job.company_code, deque()).append(job)
+            job.emit("queued", position=self.position(job))
+            self._wakeup.notify()
+        return job
+
+    def add_finished(self, company_code: str, result: dict, stage: str = "cache_hit") -> ResumeJob:
+        """Register a job whose result is already known (e.g. served from cache) without queueing it."""
+        self._prune()
+        job = ResumeJob(company_code or "_default", {})
+        job.started_at = job.finished_at = job.created_at
+        job.result = result
+        job.status = "done"
+        job.emit(stage)
+        job.emit("done")
+        job.done.set()
+        self._jobs[job.id] = job
+        return job
+
+    def get(self, job_id: str) -> Optional[ResumeJob]:
+        return self._jobs.get(job_id)
+
+    def position(self, job: ResumeJob) -> Optional[int]:
+        """1-based position within the job's company lane (None once running)."""
+        lane = self._lanes.get(job.company_code)
+        if not lane or job not in lane:
+            return None
+        return list(lane).index(job) + 1
+
+    def _prune(self):
+        cutoff = time.time() - RESUME_JOB_RETENTION_SECONDS
+        for job_id in [j.id for j in self._jobs.values() if j.finished_at and j.finished_at < cutoff]:
+            del self._jobs[job_id]
+
+    # ── Workers ──
+
+    def _next_job(self) -> Optional[ResumeJob]:
+        # Round-robin: take from the first company, then move it to the back
+        while self._lanes:
+            company, lane = next(iter(self._lanes.items()))
+            if not lane:
+                del self._lanes[company]
+                continue
+            job = lane.popleft()
+            if lane:
+                self._lanes.move_to_end(company)
+            else:
+                del self._lanes[company]
+            return job
+        return None
+
+    async def _worker(self, index: int):
+        while True:
+            async with self._wakeup:
+                job = self._next_job()
+                while job is None:
+                    await self._wakeup.wait()
+                    job = self._next_job()
+            await self._run(job)
+
+    async def _run(self, job: ResumeJob):
+        job.status = "running"
+        job.started_at = time.time()
+        job.emit("started")
+        try:
+            job.result = await self._handler(job, job.emit)
+            job.status = "done"
+            self.completed += 1
+        except Exception as e:
+            job.error = str(e)
+            job.status = "failed"
+            self.failed += 1
+            print(f"Resume job {job.id} failed: {e}")
+        # The payload holds the uploaded PDF bytes; don't keep them for the retention window
+        job.payload = None
+        job.finished_at = time.time()
+        self._wait_total += job.started_at - job.created_at
+        self._run_total += job.finished_at - job.started_at
+        job.emit(job.status)
+        job.done.set()
+
+    def stats(self) -> dict:
+        finished = self.completed + self.failed
+        return {
+            "workers": self.worker_count,
+            "queued": self.queued,
+            "queued_by_company": {company: len(lane) for company, lane in self._lanes.items()},
+            "running": sum(1 for j in self._jobs.values() if j.status == "running"),
+            "completed": self.completed,
+            "failed": self.failed,
+            "max_queued": self.max_queued,
+            "avg_wait_seconds": round(self._wait_total / finished, 2) if finished else 0.0,
+            "avg_run_seconds": round(self._run_total / finished, 2) if finished else 0.0,
+        }
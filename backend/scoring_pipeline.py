@@ -11,9 +11,10 @@ Weights:
 """
 
 import os
-import json
 from typing import Optional
 
+from llm_schemas import CodeQualityEvaluation, CommunicationEvaluation, QAEvaluation, gemini_config, validate
+
 import google.generativeai as genai
 
 gemini_api_key = os.getenv("GEMINI_API_KEY", "")
@@ -93,15 +94,10 @@ Return ONLY valid JSON, no markdown formatting."""
             generation_config=genai.GenerationConfig(
                 temperature=0.1,
                 max_output_tokens=2048,
+                **gemini_config(QAEvaluation),
             )
         )
-        text = response.text.strip()
-        if text.startswith("```"):
-            text = text.split("\n", 1)[1]
-            if text.endswith("```"):
-                text = text[:-3]
-            text = text.strip()
-        return json.loads(text)
+        return validate(QAEvaluation, response.text).model_dump()
     except Exception as e:
         return {
             "score": 50,
@@ -163,16 +159,11 @@ Return ONLY valid JSON, no markdown formatting."""
             generation_config=genai.GenerationConfig(
                 temperature=0.1,
                 max_output_tokens=1024,
+                **gemini_config(CodeQualityEvaluation),
             )
         )
-        text = response.text.strip()
-        if text.startswith("```"):
-            text = text.split("\n", 1)[1]
-            if text.endswith("```"):
-                text = text[:-3]
-            text = text.strip()
-        quality = json.loads(text)
-        quality_score = quality.get("quality_score", 50)
+        quality = validate(CodeQualityEvaluation, response.text)
+        quality_score = quality.quality_score
 
         # Combined: 60% correctness + 40% quality
         combined = int(correctness_score * 0.6 + quality_score * 0.4)
@@ -181,9 +172,9 @@ Return ONLY valid JSON, no markdown formatting."""
             "correctness_score": correctness_score,
             "quality_score": quality_score,
             "combined_score": combined,
-            "feedback": quality.get("feedback", ""),
-            "time_complexity": quality.get("time_complexity", "Unknown"),
-            "space_complexity": quality.get("space_complexity", "Unknown"),
+            "feedback": quality.feedback,
+            "time_complexity": quality.time_complexity,
+            "space_complexity": quality.space_complexity,
         }
     except Exception as e:
         return {
@@ -245,15 +236,10 @@ Return ONLY valid JSON, no markdown formatting."""
             generation_config=genai.GenerationConfig(
                 temperature=0.1,
                 max_output_tokens=512,
+                **gemini_config(CommunicationEvaluation),
             )
         )
-        text = response.text.strip()
-        if text.startswith("```"):
-            text = text.split("\n", 1)[1]
-            if text.endswith("```"):
-                text = text[:-3]
-            text = text.strip()
-        return json.loads(text)
+        return validate(CommunicationEvaluation, response.text).model_dump()
     except Exception as e:
         return {
             "score": 50,
@@ -3,31 +3,48 @@ import sys
 import subprocess
 import json
 import re
-from typing import List
+from typing import Callable, List
 import asyncio
+import contextvars
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from functools import partial
 import chromadb
-import fitz  # PyMuPDF
 import edge_tts
-import requests
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect, File, UploadFile, Form
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, JSONResponse
-from pydantic import BaseModel
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
+from pydantic import BaseModel, ValidationError
 from dotenv import load_dotenv
 import anthropic
 import firebase_admin
 from firebase_admin import credentials, firestore
 from google.cloud.firestore_v1.base_query import FieldFilter
-import tempfile
+from google.api_core import exceptions as gcp_exceptions
 import traceback
+import io
+import zipfile
 
-from manpower_planning import CompanyProfilingRequest, calculate_manpower_plan
-
+# Load env before project modules: they read their settings at import time
 load_dotenv()  # Load .env if exists
 _env_local = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '.env.local'))
 load_dotenv(dotenv_path=_env_local, override=True)  # Also load .env.local
 
+from manpower_planning import CompanyProfilingRequest, calculate_manpower_plan
+from answer_cache import SemanticAnswerCache, normalize_question
+from context_loader import RequestDataLoader
+from employee_directory import EmployeeDirectory, EmployeeEmailCache, normalize_email
+from message_store import create_message_store
+from chat_broker import ChatBroker, create_chat_broker
+from resume_jobs import QueueFullError, ResumeJobQueue
+from resume_cache import ResumeAnalysisCache, pdf_digest
+import pdf_extract
+import http_clients
+from http_clients import OLLAMA_BASE_URL, OLLAMA_MAX_CONCURRENCY
+from llm_json import JsonCompletionScanner, LLMJSONSchemaError
+from llm_schemas import FactCheckQuestions, ResumeAnalysis, ollama_format, validate
+
 app = FastAPI()
 
 # ── Interview Module Routes ────────────────────────
@@ -48,21 +65,27 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Claude client
+# Claude clients (sync kept for scripts/background helpers; async used by request handlers
+# so a long generation never blocks the event loop)
 claude_client = anthropic.Anthropic(api_key=os.getenv("ANTHROPIC_API_KEY"))
+claude_async_client = anthropic.AsyncAnthropic(api_key=os.getenv("ANTHROPIC_API_KEY"))
 
 # Ollama configuration (local LLM for resume analysis)
-OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
 OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "gemma3")
-print(f"Ollama configured: {OLLAMA_BASE_URL} with model '{OLLAMA_MODEL}'")
+print(f"Ollama configured: {OLLAMA_BASE_URL} with model '{OLLAMA_MODEL}' (max {OLLAMA_MAX_CONCURRENCY} concurrent)")
+
+
+# Seconds between progress callbacks while a generation streams
+OLLAMA_PROGRESS_INTERVAL = 0.5
+
+ollama_stream_metrics = {"streams": 0, "early_stops": 0}
 
 
-def _ollama_generate_sync(prompt: str, model: str, max_tokens: int, format: str = None) -> str:
-    """Synchronous Ollama call — runs inside a thread via asyncio.to_thread."""
+def _ollama_payload(prompt: str, model: str, max_tokens: int, format: str | dict, stream: bool) -> dict:
     payload = {
-        "model": model,
+        "model": model or OLLAMA_MODEL,
         "prompt": prompt,
-        "stream": False,
+        "stream": stream,
         "options": {
             "temperature": 0,       # deterministic = faster (no sampling)
             "num_predict": max_tokens,
@@ -72,20 +95,52 @@ def _ollama_generate_sync(prompt: str, model: str, max_tokens: int, format: str
     }
     if format:
         payload["format"] = format
-        
-    resp = requests.post(
-        f"{OLLAMA_BASE_URL}/api/generate",
-        json=payload,
-        timeout=180,
-    )
-    resp.raise_for_status()
-    return resp.json()["response"]
+    return payload
 
 
-async def ollama_generate(prompt: str, model: str = None, max_tokens: int = 1024, format: str = None) -> str:
-    """Async wrapper — offloads the blocking HTTP call to a thread."""
-    model = model or OLLAMA_MODEL
-    return await asyncio.to_thread(_ollama_generate_sync, prompt, model, max_tokens, format)
+async def ollama_generate(prompt: str, model: str = None, max_tokens: int = 1024, format: str | dict = None,
+                          stop_at_json: bool = False, on_progress: Callable = None) -> str:
+    """
+    Generate with Ollama over the shared pooled client (at most OLLAMA_MAX_CONCURRENCY at once).
+    `format` is "json" or a JSON schema (llm_schemas.ollama_format) to constrain decoding.
+
+    With `stop_at_json` (or `on_progress`) the NDJSON stream is consumed chunk by chunk;
+    generation is cut off as soon as the first JSON object/array is complete, and
+    `on_progress(characters)` is called periodically while tokens arrive.
+    """
+    if not (stop_at_json or on_progress):
+        payload = _ollama_payload(prompt, model, max_tokens, format, stream=False)
+        resp = await http_clients.request("ollama", "POST", "/api/generate", json=payload)
+        resp.raise_for_status()
+        return resp.json()["response"]
+
+    payload = _ollama_payload(prompt, model, max_tokens, format, stream=True)
+    scanner = JsonCompletionScanner()
+    ollama_stream_metrics["streams"] += 1
+    parts: list[str] = []   # full text; the scanner stops recording once its JSON closes
+    received, last_progress = 0, time.monotonic()
+    async with http_clients.stream("ollama", "POST", "/api/generate", json=payload) as resp:
+        resp.raise_for_status()
+        async for line in resp.aiter_lines():
+            if not line:
+                continue
+            chunk = json.loads(line)
+            if chunk.get("error"):
+                raise RuntimeError(f"Ollama error: {chunk['error']}")
+            piece = chunk.get("response", "")
+            parts.append(piece)
+            received += len(piece)
+            if stop_at_json and scanner.feed(piece):
+                # Leaving the stream closes the connection, which aborts generation
+                if not chunk.get("done"):
+                    ollama_stream_metrics["early_stops"] += 1
+                break
+            if on_progress and time.monotonic() - last_progress >= OLLAMA_PROGRESS_INTERVAL:
+                last_progress = time.monotonic()
+                on_progress(received)
+            if chunk.get("done"):
+                break
+    return scanner.text if stop_at_json else "".join(parts)
 
 # Reports directory
 REPORTS_DIR = os.path.join(os.path.dirname(__file__), "reports")
@@ -114,25 +169,195 @@ firestore_db = firestore.client()
 # so the rest of the code needs minimal changes.
 
 class _FirestoreResult:
-    """Mimics Supabase response.data"""
-    def __init__(self, data):
+    """Mimics Supabase response.data (writes also carry a write_summary)"""
+    def __init__(self, data, write_summary: dict | None = None):
         self.data = data
+        self.write_summary = write_summary
+
+
+def _with_derived_fields(collection_name: str, data: dict) -> dict:
+    """Add normalized lookup fields to a row being written (e.g. employees.email_lower)."""
+    if collection_name == "employees" and isinstance(data.get("email"), str):
+        return {**data, "email_lower": normalize_email(data["email"])}
+    return data
+
+
+def _after_write(collection_name: str):
+    """Invalidate in-process caches that mirror the written collection."""
+    if collection_name == "employees":
+        employee_email_cache.invalidate()
+        employee_directory.invalidate()
+
+
+# Page size used when a query must be filtered client-side (cursor pagination)
+FIRESTORE_PAGE_SIZE = int(os.getenv("FIRESTORE_PAGE_SIZE", "300"))
+# Firestore allows at most 30 values in a single `in` / `not-in` filter
+FIRESTORE_IN_LIMIT = 30
+
+# Firestore batched writes are limited to 500 operations each
+FIRESTORE_BATCH_LIMIT = 500
+FIRESTORE_WRITE_RETRIES = int(os.getenv("FIRESTORE_WRITE_RETRIES", "5"))
+FIRESTORE_WRITE_BACKOFF = float(os.getenv("FIRESTORE_WRITE_BACKOFF", "0.25"))
+_RETRYABLE_WRITE_ERRORS = (
+    gcp_exceptions.Aborted,
+    gcp_exceptions.DeadlineExceeded,
+    gcp_exceptions.ServiceUnavailable,
+    gcp_exceptions.ResourceExhausted,
+    gcp_exceptions.InternalServerError,
+)
+
+
+class FirestoreWriteError(Exception):
+    """Some batched writes failed after every retry; `summary` says how many."""
+    def __init__(self, summary: dict):
+        super().__init__(f"{summary['failed']} of {summary['operations']} Firestore writes failed")
+        self.summary = summary
+
+
+def _commit_writes(ops: list[tuple]) -> dict:
+    """
+    Apply ("set" | "update" | "delete", doc_ref, data) operations in batches of
+    FIRESTORE_BATCH_LIMIT. Each batch is atomic and retried with exponential
+    backoff on contention / transient errors; a batch that still fails is
+    counted, the remaining batches are still attempted, and FirestoreWriteError
+    is raised at the end.
+    """
+    summary = {"operations": len(ops), "written": 0, "failed": 0, "batches": 0, "retries": 0}
+    for start in range(0, len(ops), FIRESTORE_BATCH_LIMIT):
+        chunk = ops[start:start + FIRESTORE_BATCH_LIMIT]
+        for attempt in range(FIRESTORE_WRITE_RETRIES + 1):
+            batch = firestore_db.batch()
+            for kind, ref, data in chunk:
+                if kind == "set":
+                    batch.set(ref, data)
+                elif kind == "update":
+                    batch.update(ref, data)
+                else:
+                    batch.delete(ref)
+            try:
+                batch.commit()
+                summary["written"] += len(chunk)
+                break
+            except _RETRYABLE_WRITE_ERRORS as e:
+                if attempt == FIRESTORE_WRITE_RETRIES:
+                    print(f" Firestore batch of {len(chunk)} failed after {attempt + 1} attempts: {e}")
+                    summary["failed"] += len(chunk)
+                    break
+                summary["retries"] += 1
+                time.sleep(FIRESTORE_WRITE_BACKOFF * (2 ** attempt))
+        summary["batches"] += 1
+    firestore_compat_metrics["write_batches"] += summary["batches"]
+    firestore_compat_metrics["write_retries"] += summary["retries"]
+    if summary["failed"]:
+        raise FirestoreWriteError(summary)
+    return summary
+
+
+# Counters for how queries were executed; client-side work should stay near zero
+firestore_compat_metrics = {
+    "queries": 0,
+    "docs_read": 0,
+    "projected_queries": 0,
+    "client_side_filtered_queries": 0,
+    "client_side_docs_scanned": 0,
+    "split_in_queries": 0,
+    "relation_batches": 0,
+    "relation_identity_hits": 0,
+    "write_batches": 0,
+    "write_retries": 0,
+}
+
+# Request-scoped identity map for embedded relation rows: {(collection, doc_id): row | None}.
+# Set per request with begin_identity_map(); without one, each query gets its own map.
+_identity_map_var: contextvars.ContextVar[dict | None] = contextvars.ContextVar(
+    "firestore_identity_map", default=None,
+)
+
+_RELATION_RE = re.compile(r"^(?:(\w+):)?(\w+)(?:!(\w+))?\s*\((.*)\)$", re.DOTALL)
+
+
+def begin_identity_map():
+    """Start a fresh relation identity map for the current request/task context."""
+    _identity_map_var.set({})
+
+
+def _parse_relation(spec: str) -> dict | None:
+    """
+    Parse a Supabase embedded select such as "employees(first_name, last_name)",
+    "leave_types(*)" or "manager:employees!manager_id(first_name)".
+    The foreign key defaults to the singular table name + "_id" (employees → employee_id).
+    """
+    m = _RELATION_RE.match(spec.strip())
+    if not m:
+        return None
+    alias, table, fk, cols = m.groups()
+    columns = [c.strip() for c in cols.split(",") if c.strip()]
+    singular = table[:-1] if table.endswith("s") else table
+    return {
+        "key": alias or table,
+        "table": table,
+        "fk": fk or f"{singular}_id",
+        "columns": None if not columns or "*" in columns else columns,
+    }
+
+
+def _split_select(fields: str) -> list[str]:
+    """Split a Supabase select string on top-level commas (keeps "rel(a, b)" intact)."""
+    parts, depth, current = [], 0, []
+    for ch in fields:
+        if ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+        if ch == "," and depth == 0:
+            parts.append("".join(current).strip())
+            current = []
+        else:
+            current.append(ch)
+    parts.append("".join(current).strip())
+    return [p for p in parts if p]
+
 
 class _FirestoreQuery:
-    """Chainable query builder that translates Supabase-style calls to Firestore."""
+    """
+    Chainable query builder that translates Supabase-style calls to Firestore.
+
+    Planning rules:
+      - eq/neq/in_/not_in/gt/gte/lt/lte become native Firestore filters,
+      - explicit select() columns are pushed down as a Firestore projection,
+      - limit()/range() are pushed down unless a client-side filter (ilike)
+        is present, in which case documents are paged with cursors and
+        reading stops as soon as enough rows match,
+      - every client-side fallback is logged and counted in
+        firestore_compat_metrics.
+    """
     def __init__(self, collection_name: str):
         self._col = collection_name
         self._ref = firestore_db.collection(collection_name)
         self._filters = []
         self._select_fields = None
+        self._relations = []
         self._order_field = None
         self._order_asc = True
         self._limit_val = None
+        self._offset_val = 0
         self._ilike_filters = []
+        self._update_data = None
+        self._delete = False
 
     def select(self, fields="*", **kwargs):
         if fields != "*":
-            self._select_fields = [f.strip() for f in fields.split(",")]
+            columns, relations = [], []
+            for part in _split_select(fields):
+                if "(" in part:
+                    relation = _parse_relation(part)
+                    if relation:
+                        relations.append(relation)
+                else:
+                    columns.append(part)
+            self._relations = relations
+            # "*" alongside embedded relations means "all columns"
+            self._select_fields = None if "*" in columns else columns
         return self
 
     def eq(self, field, value):
@@ -143,6 +368,30 @@ class _FirestoreQuery:
         self._filters.append((field, "!=", value))
         return self
 
+    def in_(self, field, values):
+        self._filters.append((field, "in", list(values)))
+        return self
+
+    def not_in(self, field, values):
+        self._filters.append((field, "not-in", list(values)))
+        return self
+
+    def gt(self, field, value):
+        self._filters.append((field, ">", value))
+        return self
+
+    def gte(self, field, value):
+        self._filters.append((field, ">=", value))
+        return self
+
+    def lt(self, field, value):
+        self._filters.append((field, "<", value))
+        return self
+
+    def lte(self, field, value):
+        self._filters.append((field, "<=", value))
+        return self
+
     def ilike(self, field, pattern):
         # Firestore doesn't support ILIKE; we store it and filter in-memory
         self._ilike_filters.append((field, pattern.strip("%").lower()))
@@ -158,91 +407,252 @@ class _FirestoreQuery:
         self._limit_val = n
         return self
 
+    def range(self, start, end):
+        """Supabase-style inclusive row range (pagination)."""
+        self._offset_val = start
+        self._limit_val = end - start + 1
+        return self
+
     def single(self):
         self._limit_val = 1
         self._single = True
         return self
 
-    def execute(self):
+    def _projection(self) -> list[str] | None:
+        """Field paths to fetch, or None for whole documents."""
+        if self._select_fields is None:
+            return None
+        fields = [f for f in self._select_fields if f != "id"]
+        # Client-side filters, relation joins and cursor ordering need their fields too
+        fields += [f for f, _ in self._ilike_filters]
+        fields += [rel["fk"] for rel in self._relations]
+        if self._order_field:
+            fields.append(self._order_field)
+        fields = list(dict.fromkeys(fields))
+        return fields or None
+
+    def _base_query(self, filters):
         q = self._ref
-        for field, op, value in self._filters:
+        for field, op, value in filters:
             q = q.where(filter=FieldFilter(field, op, value))
+        projection = self._projection()
+        if projection:
+            q = q.select(projection)
+            firestore_compat_metrics["projected_queries"] += 1
         if self._order_field:
             direction = firestore.Query.ASCENDING if self._order_asc else firestore.Query.DESCENDING
             q = q.order_by(self._order_field, direction=direction)
-        if self._limit_val and not self._ilike_filters:
-            q = q.limit(self._limit_val)
+        return q
 
-        docs = q.stream()
-        results = []
-        for d in docs:
-            row = d.to_dict()
-            row["id"] = d.id
-            # Apply ilike filters in-memory
-            if self._ilike_filters:
-                match = True
-                for field, pattern in self._ilike_filters:
-                    val = str(row.get(field, "")).lower()
-                    if pattern not in val:
-                        match = False
-                        break
-                if not match:
+    @staticmethod
+    def _row(doc) -> dict:
+        row = doc.to_dict() or {}
+        row["id"] = doc.id
+        return row
+
+    def _matches_client_filters(self, row: dict) -> bool:
+        for field, pattern in self._ilike_filters:
+            if pattern not in str(row.get(field, "")).lower():
+                return False
+        return True
+
+    def _stream_pages(self, q):
+        """Yield documents page by page using start_after cursors."""
+        cursor = None
+        while True:
+            page = q.limit(FIRESTORE_PAGE_SIZE)
+            if cursor is not None:
+                page = page.start_after(cursor)
+            docs = list(page.stream())
+            firestore_compat_metrics["docs_read"] += len(docs)
+            yield from docs
+            if len(docs) < FIRESTORE_PAGE_SIZE:
+                return
+            cursor = docs[-1]
+
+    def _fetch_native(self, filters) -> list[dict]:
+        q = self._base_query(filters)
+        if self._offset_val:
+            q = q.offset(self._offset_val)
+        if self._limit_val:
+            q = q.limit(self._limit_val)
+        rows = [self._row(d) for d in q.stream()]
+        firestore_compat_metrics["docs_read"] += len(rows)
+        return rows
+
+    def _fetch_client_filtered(self, filters) -> list[dict]:
+        firestore_compat_metrics["client_side_filtered_queries"] += 1
+        rows, skipped, scanned = [], 0, 0
+        for d in self._stream_pages(self._base_query(filters)):
+            scanned += 1
+            row = self._row(d)
+            if not self._matches_client_filters(row):
+                continue
+            if skipped < self._offset_val:
+                skipped += 1
+                continue
+            rows.append(row)
+            if self._limit_val and len(rows) >= self._limit_val:
+                break
+        firestore_compat_metrics["client_side_docs_scanned"] += scanned
+        fields = ", ".join(f for f, _ in self._ilike_filters)
+        print(f" [firestore-compat] client-side filter on '{self._col}' ({fields}): scanned {scanned} docs for {len(rows)} rows")
+        return rows
+
+    def _fetch_split_in(self, field, op, values) -> list[dict]:
+        """`in` lists over Firestore's limit: one query per chunk, merged in memory."""
+        firestore_compat_metrics["split_in_queries"] += 1
+        others = [f for f in self._filters if f[:2] != (field, op)]
+        offset, limit = self._offset_val, self._limit_val
+        self._offset_val, self._limit_val = 0, None
+        try:
+            rows = []
+            for start in range(0, len(values), FIRESTORE_IN_LIMIT):
+                chunk_filters = others + [(field, op, values[start:start + FIRESTORE_IN_LIMIT])]
+                if self._ilike_filters:
+                    rows += self._fetch_client_filtered(chunk_filters)
+                else:
+                    rows += self._fetch_native(chunk_filters)
+        finally:
+            self._offset_val, self._limit_val = offset, limit
+        if self._order_field:
+            rows.sort(key=lambda r: (r.get(self._order_field) is not None, r.get(self._order_field)),
+                      reverse=not self._order_asc)
+        rows = rows[offset:]
+        return rows[:limit] if limit else rows
+
+    def _resolve_relations(self, rows: list[dict]):
+        """
+        Attach embedded relation rows with one batched get_all per relation.
+        Rows already loaded in this request come from the identity map.
+        Unresolvable relations (no FK / missing doc) are left off the row.
+        """
+        if not self._relations or not rows:
+            return
+        identity = _identity_map_var.get()
+        if identity is None:
+            identity = {}
+        for rel in self._relations:
+            table, fk = rel["table"], rel["fk"]
+            ids = {str(row[fk]) for row in rows if row.get(fk)}
+            missing = [i for i in ids if (table, i) not in identity]
+            firestore_compat_metrics["relation_identity_hits"] += len(ids) - len(missing)
+            if missing:
+                refs = [firestore_db.collection(table).document(i) for i in missing]
+                for snap in firestore_db.get_all(refs):
+                    identity[(table, snap.id)] = self._row(snap) if snap.exists else None
+                firestore_compat_metrics["relation_batches"] += 1
+                firestore_compat_metrics["docs_read"] += len(missing)
+            for row in rows:
+                related = identity.get((table, str(row.get(fk))))
+                if related is None:
                     continue
-            if self._select_fields:
-                row = {k: row.get(k) for k in self._select_fields}
-                if "id" not in self._select_fields:
-                    pass  # don't add id if not selected
-            results.append(row)
+                if rel["columns"] is not None:
+                    related = {c: related.get(c) for c in rel["columns"]}
+                row[rel["key"]] = related
+
+    def _project(self, row: dict) -> dict:
+        if self._select_fields is None:
+            return row
+        projected = {k: row.get(k) for k in self._select_fields}
+        for rel in self._relations:
+            if rel["key"] in row:
+                projected[rel["key"]] = row[rel["key"]]
+        return projected
 
-        if self._limit_val and self._ilike_filters:
-            results = results[:self._limit_val]
+    def execute(self):
+        if self._update_data is not None:
+            return self._execute_update()
+        if self._delete:
+            return self._execute_delete()
+        firestore_compat_metrics["queries"] += 1
+        oversized_in = next(
+            (f for f in self._filters if f[1] == "in" and len(f[2]) > FIRESTORE_IN_LIMIT), None,
+        )
+        if oversized_in:
+            rows = self._fetch_split_in(*oversized_in)
+        elif self._ilike_filters:
+            rows = self._fetch_client_filtered(self._filters)
+        else:
+            rows = self._fetch_native(self._filters)
+
+        self._resolve_relations(rows)
+        results = [self._project(row) for row in rows]
 
         if getattr(self, "_single", False):
             return _FirestoreResult(results[0] if results else None)
         return _FirestoreResult(results)
 
     def insert(self, data):
+        rows = data if isinstance(data, list) else [data]
+        ops, inserted = [], []
+        for item in rows:
+            item = _with_derived_fields(self._col, item)
+            doc_ref = self._ref.document()
+            ops.append(("set", doc_ref, item))
+            inserted.append({**item, "id": doc_ref.id})
+        try:
+            summary = _commit_writes(ops)
+        finally:
+            # Earlier batches may have landed even if a later one failed
+            _after_write(self._col)
         if isinstance(data, list):
-            ids = []
-            for item in data:
-                _, doc_ref = self._ref.add(item)
-                ids.append(doc_ref.id)
-            return self
-        else:
-            _, doc_ref = self._ref.add(data)
-            self._last_id = doc_ref.id
-            # Return self for chaining .select().single()
-            return _InsertResult(self._col, {**data, "id": doc_ref.id})
+            return _InsertResult(self._col, inserted, summary)
+        self._last_id = inserted[0]["id"]
+        # Return a result for chaining .select().single()
+        return _InsertResult(self._col, inserted[0], summary)
 
     def update(self, data):
-        self._update_data = data
+        self._update_data = _with_derived_fields(self._col, data)
         return self
 
-    def _execute_update(self):
+    def delete(self):
+        self._delete = True
+        return self
+
+    def _matched_docs(self) -> list:
+        """Documents matched by the current filters (for update/delete)."""
         q = self._ref
         for field, op, value in self._filters:
             q = q.where(filter=FieldFilter(field, op, value))
         docs = list(q.stream())
+        if self._ilike_filters:
+            docs = [d for d in docs if self._matches_client_filters(self._row(d))]
+        return docs
+
+    def _execute_update(self):
+        docs = self._matched_docs()
+        try:
+            summary = _commit_writes([("update", d.reference, self._update_data) for d in docs])
+        finally:
+            _after_write(self._col)
         results = []
         for d in docs:
-            d.reference.update(self._update_data)
-            updated = d.to_dict()
+            updated = self._row(d)
             updated.update(self._update_data)
-            updated["id"] = d.id
             results.append(updated)
-        return _FirestoreResult(results)
+        return _FirestoreResult(results, summary)
+
+    def _execute_delete(self):
+        docs = self._matched_docs()
+        try:
+            summary = _commit_writes([("delete", d.reference, None) for d in docs])
+        finally:
+            _after_write(self._col)
+        return _FirestoreResult([self._row(d) for d in docs], summary)
 
 
 class _InsertResult:
     """Handles .insert().select().single() chain"""
-    def __init__(self, col, data):
+    def __init__(self, col, data, write_summary=None):
         self._data = data
-    def select(self):
+        self._write_summary = write_summary
+    def select(self, *args, **kwargs):
         return self
     def single(self):
         return self
     def execute(self):
-        return _FirestoreResult(self._data)
+        return _FirestoreResult(self._data, self._write_summary)
 
 
 class _SupabaseCompat:
@@ -252,19 +662,36 @@ class _SupabaseCompat:
 
 supabase = _SupabaseCompat()
 
+# In-memory employee directory used for named-employee detection in HR chat.
+# Kept fresh by a Firestore snapshot listener (started on app startup), TTL otherwise.
+employee_directory = EmployeeDirectory(
+    lambda: supabase.table("employees").select("*").execute().data or []
+)
+
+# Memoized email → employee resolution; cleared on employee writes / listener changes
+employee_email_cache = EmployeeEmailCache()
+employee_directory.on_change(employee_email_cache.invalidate)
+
 # ChromaDB client (initialized lazily)
 CHROMA_DIR = os.path.join(os.path.dirname(__file__), "chroma_db")
 COLLECTION_NAME = "hr_policies"
 chroma_client = None
 chroma_collection = None
+chroma_embedder = None
+
+# Semantic cache for policy-only chat answers (invalidated on policy sync)
+answer_cache = SemanticAnswerCache()
 
 
 def init_chroma():
     """Initialize ChromaDB client and load the policy collection."""
-    global chroma_client, chroma_collection
+    global chroma_client, chroma_collection, chroma_embedder
     try:
+        from chromadb.utils import embedding_functions
         chroma_client = chromadb.PersistentClient(path=CHROMA_DIR)
         chroma_collection = chroma_client.get_collection(COLLECTION_NAME)
+        # Same embedding model the collection was built with (ingest_policies uses the default)
+        chroma_embedder = embedding_functions.DefaultEmbeddingFunction()
         count = chroma_collection.count()
         print(f"ChromaDB loaded: {count} policy chunks in collection '{COLLECTION_NAME}'")
     except Exception as e:
@@ -287,30 +714,51 @@ DEFAULT_MODEL = "claude-sonnet-4"
 # RAG: RETRIEVAL & CONTEXT BUILDING
 # ═══════════════════════════════════════════════════
 
-def get_rag_context(query: str, n_results: int = 5) -> tuple[str, list[str]]:
+def embed_query(query: str) -> list[float] | None:
+    """Embed a (normalized) question with the policy collection's embedding model."""
+    if not chroma_embedder:
+        return None
+    try:
+        return list(chroma_embedder([normalize_question(query)])[0])
+    except Exception as e:
+        print(f" Query embedding error: {e}")
+        return None
+
+
+def retrieve_policy_chunks(query: str, n_results: int = 5,
+                           query_embedding: list[float] | None = None) -> tuple[str, list[str], list[str]]:
     """
     Query ChromaDB for relevant policy chunks.
-    Returns (formatted_context, list_of_source_names).
+    Returns (formatted_context, list_of_source_names, list_of_chunk_ids).
+    Pass query_embedding to reuse an embedding already computed for the question.
     """
     if not chroma_collection:
-        return "", []
+        return "", [], []
 
     try:
-        results = chroma_collection.query(
-            query_texts=[query],
-            n_results=n_results,
-        )
+        if query_embedding is not None:
+            results = chroma_collection.query(
+                query_embeddings=[query_embedding],
+                n_results=n_results,
+            )
+        else:
+            results = chroma_collection.query(
+                query_texts=[query],
+                n_results=n_results,
+            )
     except Exception as e:
         print(f" ChromaDB query error: {e}")
-        return "", []
+        return "", [], []
 
     if not results["documents"] or not results["documents"][0]:
-        return "", []
+        return "", [], []
 
     context_parts = []
     sources = set()
+    chunk_ids = []
 
-    for doc, meta, distance in zip(
+    for chunk_id, doc, meta, distance in zip(
+        results["ids"][0],
         results["documents"][0],
         results["metadatas"][0],
         results["distances"][0],
@@ -329,41 +777,64 @@ def get_rag_context(query: str, n_results: int = 5) -> tuple[str, list[str]]:
             source_label += f" {version}"
 
         sources.add(source_label)
+        chunk_ids.append(chunk_id)
         context_parts.append(
             f"--- {source_label} (source: {source}, relevance: {relevance:.2f}) ---\n{doc}"
         )
 
     context = "\n\n".join(context_parts)
-    return context, list(sources)
+    return context, list(sources), chunk_ids
+
+
+def get_rag_context(query: str, n_results: int = 5) -> tuple[str, list[str]]:
+    """
+    Query ChromaDB for relevant policy chunks.
+    Returns (formatted_context, list_of_source_names).
+    """
+    context, sources, _ = retrieve_policy_chunks(query, n_results)
+    return context, sources
 
 
 def get_employee_by_email(email: str) -> dict | None:
-    """Look up an employee by email from the employees table."""
+    """
+    Look up an employee by email from the employees table.
+    Memoized; a miss costs a single indexed point lookup on `email_lower`
+    (maintained on write, see backfill_email_lower.py for existing rows).
+    """
+    found, employee = employee_email_cache.get(email)
+    if found:
+        return employee
+    employee = _resolve_employee_by_email(email)
+    employee_email_cache.put(email, employee)
+    return employee
+
+
+def _resolve_employee_by_email(email: str) -> dict | None:
     try:
         print(f"Looking up employee with email: '{email}'")
-        response = supabase.table("employees").select("*").eq("email", email).execute()
+        response = supabase.table("employees").select("*").eq("email_lower", normalize_email(email)).limit(1).execute()
         if response.data:
             print(f"Found employee: {response.data[0].get('first_name')} {response.data[0].get('last_name')}")
             return response.data[0]
 
-        # Try case-insensitive search
-        response2 = supabase.table("employees").select("*").ilike("email", email).execute()
+        # Rows written before email_lower existed: exact match only (no full scan)
+        response2 = supabase.table("employees").select("*").eq("email", email).limit(1).execute()
         if response2.data:
-            print(f"Found via ilike: {response2.data[0].get('first_name')} {response2.data[0].get('last_name')}")
+            print(f"Found via exact email (row missing email_lower): {response2.data[0].get('first_name')} {response2.data[0].get('last_name')}")
             return response2.data[0]
 
-        # Demo fallback: try alex.chan@openhire.com first, then first employee
+        # Demo fallback: try alex.chan@openhire.com first, then first employee (served from the in-memory directory)
         print(f" No employee found for '{email}'. Trying demo fallback...")
-        alex = supabase.table("employees").select("*").ilike("email", "%alex%chan%").execute()
-        if alex.data:
-            print(f"Demo fallback: using {alex.data[0].get('first_name')} {alex.data[0].get('last_name')}")
-            return alex.data[0]
+        alex = employee_directory.find_by_email_fragments("alex", "chan")
+        if alex:
+            print(f"Demo fallback: using {alex.get('first_name')} {alex.get('last_name')}")
+            return alex
 
         # Last resort: use the first employee in the table
-        first = supabase.table("employees").select("*").limit(1).execute()
-        if first.data:
-            print(f"Last-resort fallback: using {first.data[0].get('first_name')} {first.data[0].get('last_name')}")
-            return first.data[0]
+        rows = employee_directory.rows()
+        if rows:
+            print(f"Last-resort fallback: using {rows[0].get('first_name')} {rows[0].get('last_name')}")
+            return rows[0]
 
         print("No employees found in the database at all!")
     except Exception as e:
@@ -371,22 +842,84 @@ def get_employee_by_email(email: str) -> dict | None:
     return None
 
 
-def get_employee_context(email: str, role: str, question: str) -> str:
+LEAVE_BALANCE_SELECT = "*, leave_types(leave_type, display_name)"
+CONTEXT_YEAR = 2026
+
+
+def new_request_loader() -> RequestDataLoader:
+    """Create the batched, memoizing data loader for one chat request."""
+    return RequestDataLoader(supabase, employee_lookup=get_employee_by_email)
+
+
+def get_employee_context(email: str, role: str, question: str,
+                         loader: RequestDataLoader | None = None) -> str:
     """
     Query Supabase for employee-specific data relevant to the question.
     For employees: only their own data.
     For HR admins: can query any employee or team-wide data.
     """
-    employee = get_employee_by_email(email)
+    return "\n\n".join(get_employee_context_parts(email, role, question, loader))
+
+
+def get_employee_context_parts(email: str, role: str, question: str,
+                               loader: RequestDataLoader | None = None) -> list[str]:
+    """
+    Same as get_employee_context, but returns the individual sections.
+    The first section is always the user's profile; anything after it is
+    personal/team data pulled in because the question asked for it.
+    """
+    loader = loader or new_request_loader()
+    employee = loader.employee_by_email(email)
     if not employee:
-        return ""
+        return []
+
+    context_parts = [_profile_context(employee)]
+    for build in employee_context_sources(employee, email, role, question, loader).values():
+        context_parts.extend(build())
+    return context_parts
+
 
-    emp_id = employee["id"]
+def employee_context_sources(employee: dict, email: str, role: str, question: str,
+                             loader: RequestDataLoader) -> dict[str, Callable[[], list[str]]]:
+    """
+    Return the independent context lookups the question needs, in prompt order.
+    Each value is a zero-argument callable returning a list of context sections,
+    so callers can run them sequentially or fan them out concurrently.
+    """
     question_lower = question.lower()
-    context_parts = []
+    sources = {}
+
+    if any(kw in question_lower for kw in ["leave", "day off", "vacation", "annual", "sick", "time off", "pto"]):
+        sources["leave"] = partial(_leave_context, employee, loader)
+    if any(kw in question_lower for kw in ["salary", "pay", "epf", "socso", "eis", "tax", "pcb", "deduction", "net", "gross", "income", "compensation"]):
+        sources["salary"] = partial(_salary_context, employee, loader)
+        sources["deductions"] = partial(_deductions_context, employee, loader)
+    if any(kw in question_lower for kw in ["equity", "stock", "shares", "vesting", "option", "rsu", "grant"]):
+        sources["equity"] = partial(_equity_context, employee, loader)
+    if any(kw in question_lower for kw in ["expense", "claim", "reimbursement", "receipt"]):
+        sources["expenses"] = partial(_expense_context, employee, loader)
+    if any(kw in question_lower for kw in ["compliance", "alert", "due", "deadline", "expir"]):
+        sources["compliance"] = partial(_compliance_context, employee, loader)
+
+    # ── Manager: Own data + direct reports ──
+    if role == "manager":
+        sources["manager"] = partial(_non_empty, get_manager_context, email, question_lower, loader)
+
+    # ── HR Admin: Team-wide data ──
+    if role == "hr_admin":
+        sources["hr_admin"] = partial(_non_empty, get_hr_admin_context, question_lower, loader)
+
+    return sources
+
+
+def _non_empty(build: Callable[..., str], *args) -> list[str]:
+    """Adapt a str-returning context builder to the list-of-sections shape."""
+    text = build(*args)
+    return [text] if text else []
 
-    # ── Employee profile info ──
-    context_parts.append(
+
+def _profile_context(employee: dict) -> str:
+    return (
         f"[Current User Profile]\n"
         f"Name: {employee['first_name']} {employee['last_name']}\n"
         f"Employee ID: {employee['employee_id']}\n"
@@ -398,145 +931,127 @@ def get_employee_context(email: str, role: str, question: str) -> str:
         f"Status: {employee.get('status', 'N/A')}"
     )
 
-    # ── Leave balance ──
-    if any(kw in question_lower for kw in ["leave", "day off", "vacation", "annual", "sick", "time off", "pto"]):
-        try:
-            lb_response = supabase.table("leave_balances") \
-                .select("*, leave_types(leave_type, display_name)") \
-                .eq("employee_id", emp_id) \
-                .eq("year", 2026) \
-                .execute()
-            if lb_response.data:
-                leave_info = "[Leave Balances for 2026]\n"
-                for lb in lb_response.data:
-                    lt = lb.get("leave_types", {})
-                    name = lt.get("display_name", "Unknown") if lt else "Unknown"
-                    total = lb.get("total_days", 0)
-                    used = lb.get("used_days", 0)
-                    pending = lb.get("pending_days", 0)
-                    remaining = float(total) - float(used) - float(pending)
-                    leave_info += f"  {name}: {remaining} days remaining (total: {total}, used: {used}, pending: {pending})\n"
-                context_parts.append(leave_info)
-        except Exception as e:
-            print(f" Leave balance query error: {e}")
 
-    # ── Salary / deductions ──
-    if any(kw in question_lower for kw in ["salary", "pay", "epf", "socso", "eis", "tax", "pcb", "deduction", "net", "gross", "income", "compensation"]):
-        try:
-            contract_resp = supabase.table("contracts") \
-                .select("*") \
-                .eq("employee_id", emp_id) \
-                .eq("is_active", True) \
-                .execute()
-            if contract_resp.data:
-                c = contract_resp.data[0]
-                context_parts.append(
-                    f"[Contract Info]\n"
-                    f"Contract: {c.get('title', 'N/A')}\n"
-                    f"Type: {c.get('contract_type', 'N/A')}\n"
-                    f"Base Salary: {c.get('currency', 'MYR')} {c.get('base_salary', 'N/A')}/month\n"
-                    f"Notice Period: {c.get('notice_period_days', 'N/A')} days\n"
-                    f"Allowances: {json.dumps(c.get('allowances', {}))}"
-                )
+def _leave_context(employee: dict, loader: RequestDataLoader) -> list[str]:
+    try:
+        leave_balances = loader.load(
+            "leave_balances", "employee_id", employee["id"],
+            select=LEAVE_BALANCE_SELECT, filters={"year": CONTEXT_YEAR},
+        )
+        if leave_balances:
+            leave_info = "[Leave Balances for 2026]\n"
+            for lb in leave_balances:
+                lt = lb.get("leave_types", {})
+                name = lt.get("display_name", "Unknown") if lt else "Unknown"
+                total = lb.get("total_days", 0)
+                used = lb.get("used_days", 0)
+                pending = lb.get("pending_days", 0)
+                remaining = float(total) - float(used) - float(pending)
+                leave_info += f"  {name}: {remaining} days remaining (total: {total}, used: {used}, pending: {pending})\n"
+            return [leave_info]
+    except Exception as e:
+        print(f" Leave balance query error: {e}")
+    return []
 
-            ded_resp = supabase.table("malaysia_statutory_deductions") \
-                .select("*") \
-                .eq("employee_id", emp_id) \
-                .order("month", desc=True) \
-                .limit(1) \
-                .execute()
-            if ded_resp.data:
-                d = ded_resp.data[0]
-                context_parts.append(
-                    f"[Latest Statutory Deductions ({d.get('month', 'N/A')})]\n"
-                    f"Gross Salary: MYR {d.get('gross_salary', 'N/A')}\n"
-                    f"EPF (Employee): MYR {d.get('epf_employee', 'N/A')}\n"
-                    f"EPF (Employer): MYR {d.get('epf_employer', 'N/A')}\n"
-                    f"SOCSO (Employee): MYR {d.get('socso_employee', 'N/A')}\n"
-                    f"SOCSO (Employer): MYR {d.get('socso_employer', 'N/A')}\n"
-                    f"EIS (Employee): MYR {d.get('eis_employee', 'N/A')}\n"
-                    f"EIS (Employer): MYR {d.get('eis_employer', 'N/A')}\n"
-                    f"PCB Tax: MYR {d.get('pcb_tax', 'N/A')}\n"
-                    f"Total Deductions: MYR {d.get('total_deductions', 'N/A')}\n"
-                    f"Net Salary: MYR {d.get('net_salary', 'N/A')}"
-                )
-        except Exception as e:
-            print(f" Salary query error: {e}")
 
-    # ── Equity ──
-    if any(kw in question_lower for kw in ["equity", "stock", "shares", "vesting", "option", "rsu", "grant"]):
-        try:
-            eq_resp = supabase.table("equity_grants") \
-                .select("*") \
-                .eq("employee_id", emp_id) \
-                .execute()
-            if eq_resp.data:
-                equity_info = "[Equity Grants]\n"
-                for eq in eq_resp.data:
-                    # OVERRIDE: Force equity to match contract (1,200 shares) for demo consistency
-                    total_shares = 1200
-                    vested_shares = 400
-                    equity_info += (
-                        f"  Grant {eq.get('grant_number', 'N/A')}: {eq.get('grant_type', 'N/A')}\n"
-                        f"    Total Shares: {total_shares}, Vested: {vested_shares}\n"
-                        f"    Strike Price: {eq.get('currency', 'USD')} {eq.get('strike_price', 'N/A')}\n"
-                        f"    FMV: {eq.get('currency', 'USD')} {eq.get('fair_market_value', 'N/A')}\n"
-                        f"    Status: Partially Vested\n"
-                    )
-                context_parts.append(equity_info)
-        except Exception as e:
-            print(f" Equity query error: {e}")
+def _salary_context(employee: dict, loader: RequestDataLoader) -> list[str]:
+    try:
+        contracts = loader.load("contracts", "employee_id", employee["id"], filters={"is_active": True})
+        if contracts:
+            c = contracts[0]
+            return [
+                f"[Contract Info]\n"
+                f"Contract: {c.get('title', 'N/A')}\n"
+                f"Type: {c.get('contract_type', 'N/A')}\n"
+                f"Base Salary: {c.get('currency', 'MYR')} {c.get('base_salary', 'N/A')}/month\n"
+                f"Notice Period: {c.get('notice_period_days', 'N/A')} days\n"
+                f"Allowances: {json.dumps(c.get('allowances', {}))}"
+            ]
+    except Exception as e:
+        print(f" Salary query error: {e}")
+    return []
 
-    # ── Expense claims ──
-    if any(kw in question_lower for kw in ["expense", "claim", "reimbursement", "receipt"]):
-        try:
-            exp_resp = supabase.table("expense_claims") \
-                .select("*") \
-                .eq("employee_id", emp_id) \
-                .order("claim_date", desc=True) \
-                .limit(5) \
-                .execute()
-            if exp_resp.data:
-                exp_info = "[Recent Expense Claims]\n"
-                for ex in exp_resp.data:
-                    exp_info += f"  {ex.get('claim_date')}: {ex.get('category')} - MYR {ex.get('amount')} ({ex.get('status')})\n"
-                context_parts.append(exp_info)
-        except Exception as e:
-            print(f" Expense query error: {e}")
 
-    # ── Compliance alerts (employee-specific) ──
-    if any(kw in question_lower for kw in ["compliance", "alert", "due", "deadline", "expir"]):
-        try:
-            alert_resp = supabase.table("compliance_alerts") \
-                .select("*") \
-                .eq("employee_id", emp_id) \
-                .eq("status", "active") \
-                .execute()
-            if alert_resp.data:
-                alert_info = "[Active Compliance Alerts]\n"
-                for a in alert_resp.data:
-                    alert_info += f"  [{a.get('severity', 'medium').upper()}] {a.get('title')}: {a.get('description')} (due: {a.get('due_date')})\n"
-                context_parts.append(alert_info)
-        except Exception as e:
-            print(f" Compliance alert query error: {e}")
+def _deductions_context(employee: dict, loader: RequestDataLoader) -> list[str]:
+    try:
+        deductions = loader.load(
+            "malaysia_statutory_deductions", "employee_id", employee["id"],
+            order_by="month", desc=True, limit_per_key=1,
+        )
+        if deductions:
+            d = deductions[0]
+            return [
+                f"[Latest Statutory Deductions ({d.get('month', 'N/A')})]\n"
+                f"Gross Salary: MYR {d.get('gross_salary', 'N/A')}\n"
+                f"EPF (Employee): MYR {d.get('epf_employee', 'N/A')}\n"
+                f"EPF (Employer): MYR {d.get('epf_employer', 'N/A')}\n"
+                f"SOCSO (Employee): MYR {d.get('socso_employee', 'N/A')}\n"
+                f"SOCSO (Employer): MYR {d.get('socso_employer', 'N/A')}\n"
+                f"EIS (Employee): MYR {d.get('eis_employee', 'N/A')}\n"
+                f"EIS (Employer): MYR {d.get('eis_employer', 'N/A')}\n"
+                f"PCB Tax: MYR {d.get('pcb_tax', 'N/A')}\n"
+                f"Total Deductions: MYR {d.get('total_deductions', 'N/A')}\n"
+                f"Net Salary: MYR {d.get('net_salary', 'N/A')}"
+            ]
+    except Exception as e:
+        print(f" Deductions query error: {e}")
+    return []
 
-    # ── Manager: Own data + direct reports ──
-    if role == "manager":
-        mgr_context = get_manager_context(email, question_lower)
-        if mgr_context:
-            context_parts.append(mgr_context)
 
-    # ── HR Admin: Team-wide data ──
-    if role == "hr_admin":
-        hr_context = get_hr_admin_context(question_lower)
-        if hr_context:
-            context_parts.append(hr_context)
+def _equity_context(employee: dict, loader: RequestDataLoader) -> list[str]:
+    try:
+        grants = loader.load("equity_grants", "employee_id", employee["id"])
+        if grants:
+            equity_info = "[Equity Grants]\n"
+            for eq in grants:
+                # OVERRIDE: Force equity to match contract (1,200 shares) for demo consistency
+                total_shares = 1200
+                vested_shares = 400
+                equity_info += (
+                    f"  Grant {eq.get('grant_number', 'N/A')}: {eq.get('grant_type', 'N/A')}\n"
+                    f"    Total Shares: {total_shares}, Vested: {vested_shares}\n"
+                    f"    Strike Price: {eq.get('currency', 'USD')} {eq.get('strike_price', 'N/A')}\n"
+                    f"    FMV: {eq.get('currency', 'USD')} {eq.get('fair_market_value', 'N/A')}\n"
+                    f"    Status: Partially Vested\n"
+                )
+            return [equity_info]
+    except Exception as e:
+        print(f" Equity query error: {e}")
+    return []
 
-    return "\n\n".join(context_parts)
+
+def _expense_context(employee: dict, loader: RequestDataLoader) -> list[str]:
+    try:
+        claims = loader.load(
+            "expense_claims", "employee_id", employee["id"],
+            order_by="claim_date", desc=True, limit_per_key=5,
+        )
+        if claims:
+            exp_info = "[Recent Expense Claims]\n"
+            for ex in claims:
+                exp_info += f"  {ex.get('claim_date')}: {ex.get('category')} - MYR {ex.get('amount')} ({ex.get('status')})\n"
+            return [exp_info]
+    except Exception as e:
+        print(f" Expense query error: {e}")
+    return []
 
 
-def get_hr_admin_context(question_lower: str) -> str:
+def _compliance_context(employee: dict, loader: RequestDataLoader) -> list[str]:
+    try:
+        alerts = loader.load("compliance_alerts", "employee_id", employee["id"], filters={"status": "active"})
+        if alerts:
+            alert_info = "[Active Compliance Alerts]\n"
+            for a in alerts:
+                alert_info += f"  [{a.get('severity', 'medium').upper()}] {a.get('title')}: {a.get('description')} (due: {a.get('due_date')})\n"
+            return [alert_info]
+    except Exception as e:
+        print(f" Compliance alert query error: {e}")
+    return []
+
+
+def get_hr_admin_context(question_lower: str, loader: RequestDataLoader | None = None) -> str:
     """Get team-wide data for HR admin queries."""
+    loader = loader or new_request_loader()
     parts = []
 
     # Pending leave requests
@@ -577,13 +1092,10 @@ def get_hr_admin_context(question_lower: str) -> str:
     # Employee directory / lookup
     if any(kw in question_lower for kw in ["employee", "team", "staff", "workforce", "head count", "directory"]):
         try:
-            emp_resp = supabase.table("employees") \
-                .select("first_name, last_name, department, job_title, employment_type, status, hire_date") \
-                .eq("status", "active") \
-                .execute()
-            if emp_resp.data:
-                info = f"[Active Employees ({len(emp_resp.data)} total)]\n"
-                for e in emp_resp.data:
+            active_employees = employee_directory.active()
+            if active_employees:
+                info = f"[Active Employees ({len(active_employees)} total)]\n"
+                for e in active_employees:
                     info += f"  {e.get('first_name')} {e.get('last_name')} - {e.get('job_title')} ({e.get('department')}) [{e.get('employment_type')}] since {e.get('hire_date')}\n"
                 parts.append(info)
         except Exception as e:
@@ -591,43 +1103,32 @@ def get_hr_admin_context(question_lower: str) -> str:
 
     # Specific employee lookup (when HR asks about a specific person)
     try:
-        emp_resp = supabase.table("employees").select("*").execute()
-        if emp_resp.data:
-            for emp in emp_resp.data:
-                full_name = f"{emp['first_name']} {emp['last_name']}".lower()
-                first_name = emp['first_name'].lower()
-                if full_name in question_lower or first_name in question_lower:
-                    target_id = emp["id"]
-
-                    lb_resp = supabase.table("leave_balances") \
-                        .select("*, leave_types(display_name)") \
-                        .eq("employee_id", target_id) \
-                        .eq("year", 2026) \
-                        .execute()
-
-                    ct_resp = supabase.table("contracts") \
-                        .select("*") \
-                        .eq("employee_id", target_id) \
-                        .eq("is_active", True) \
-                        .execute()
-
-                    info = f"[Data for {emp['first_name']} {emp['last_name']}]\n"
-                    info += f"  Employee ID: {emp['employee_id']}, Department: {emp.get('department')}, Title: {emp.get('job_title')}\n"
-                    info += f"  Hire Date: {emp.get('hire_date')}, Status: {emp.get('status')}, Type: {emp.get('employment_type')}\n"
-
-                    if ct_resp.data:
-                        c = ct_resp.data[0]
-                        info += f"  Salary: {c.get('currency', 'MYR')} {c.get('base_salary')}/month, Contract: {c.get('contract_type')}\n"
-
-                    if lb_resp.data:
-                        for lb in lb_resp.data:
-                            lt = lb.get("leave_types", {})
-                            name = lt.get("display_name", "Unknown") if lt else "Unknown"
-                            remaining = float(lb.get("total_days", 0)) - float(lb.get("used_days", 0)) - float(lb.get("pending_days", 0))
-                            info += f"  {name}: {remaining} days remaining\n"
+        emp = employee_directory.find_mentioned(question_lower)
+        if emp:
+            target_id = emp["id"]
 
-                    parts.append(info)
-                    break
+            leave_balances = loader.load(
+                "leave_balances", "employee_id", target_id,
+                select=LEAVE_BALANCE_SELECT, filters={"year": CONTEXT_YEAR},
+            )
+            contracts = loader.load("contracts", "employee_id", target_id, filters={"is_active": True})
+
+            info = f"[Data for {emp['first_name']} {emp['last_name']}]\n"
+            info += f"  Employee ID: {emp['employee_id']}, Department: {emp.get('department')}, Title: {emp.get('job_title')}\n"
+            info += f"  Hire Date: {emp.get('hire_date')}, Status: {emp.get('status')}, Type: {emp.get('employment_type')}\n"
+
+            if contracts:
+                c = contracts[0]
+                info += f"  Salary: {c.get('currency', 'MYR')} {c.get('base_salary')}/month, Contract: {c.get('contract_type')}\n"
+
+            if leave_balances:
+                for lb in leave_balances:
+                    lt = lb.get("leave_types", {})
+                    name = lt.get("display_name", "Unknown") if lt else "Unknown"
+                    remaining = float(lb.get("total_days", 0)) - float(lb.get("used_days", 0)) - float(lb.get("pending_days", 0))
+                    info += f"  {name}: {remaining} days remaining\n"
+
+            parts.append(info)
     except Exception as e:
         print(f" Employee lookup error: {e}")
 
@@ -651,12 +1152,17 @@ def get_hr_admin_context(question_lower: str) -> str:
     return "\n\n".join(parts)
 
 
-def get_manager_context(manager_email: str, question_lower: str) -> str:
-    """Get data for manager's direct reports."""
+def get_manager_context(manager_email: str, question_lower: str,
+                        loader: RequestDataLoader | None = None) -> str:
+    """
+    Get data for manager's direct reports.
+    Each topic is fetched for the whole team in batched `in` queries.
+    """
+    loader = loader or new_request_loader()
     parts = []
 
     # Find the manager in employees table
-    manager = get_employee_by_email(manager_email)
+    manager = loader.employee_by_email(manager_email)
     if not manager:
         return ""
 
@@ -689,16 +1195,16 @@ def get_manager_context(manager_email: str, question_lower: str) -> str:
     # Leave balances for direct reports
     if any(kw in question_lower for kw in ["leave", "day off", "vacation", "annual", "sick", "time off", "pto", "team", "report"]):
         try:
+            balances_by_report = loader.load_many(
+                "leave_balances", "employee_id", report_ids,
+                select=LEAVE_BALANCE_SELECT, filters={"year": CONTEXT_YEAR},
+            )
             for report in direct_reports:
-                lb_resp = supabase.table("leave_balances") \
-                    .select("*, leave_types(display_name)") \
-                    .eq("employee_id", report["id"]) \
-                    .eq("year", 2026) \
-                    .execute()
-                if lb_resp.data:
+                leave_balances = balances_by_report[report["id"]]
+                if leave_balances:
                     name = f"{report['first_name']} {report['last_name']}"
                     info = f"[Leave Balances for {name}]\n"
-                    for lb in lb_resp.data:
+                    for lb in leave_balances:
                         lt = lb.get("leave_types", {})
                         lt_name = lt.get("display_name", "Unknown") if lt else "Unknown"
                         total = lb.get("total_days", 0)
@@ -713,14 +1219,13 @@ def get_manager_context(manager_email: str, question_lower: str) -> str:
     # Salary info for direct reports
     if any(kw in question_lower for kw in ["salary", "pay", "compensation", "team", "report"]):
         try:
+            contracts_by_report = loader.load_many(
+                "contracts", "employee_id", report_ids, filters={"is_active": True},
+            )
             for report in direct_reports:
-                ct_resp = supabase.table("contracts") \
-                    .select("*") \
-                    .eq("employee_id", report["id"]) \
-                    .eq("is_active", True) \
-                    .execute()
-                if ct_resp.data:
-                    c = ct_resp.data[0]
+                contracts = contracts_by_report[report["id"]]
+                if contracts:
+                    c = contracts[0]
                     name = f"{report['first_name']} {report['last_name']}"
                     parts.append(
                         f"[Salary Info for {name}]\n"
@@ -734,17 +1239,16 @@ def get_manager_context(manager_email: str, question_lower: str) -> str:
     # Expense claims for direct reports
     if any(kw in question_lower for kw in ["expense", "claim", "reimbursement", "team", "report"]):
         try:
+            claims_by_report = loader.load_many(
+                "expense_claims", "employee_id", report_ids,
+                order_by="claim_date", desc=True, limit_per_key=3,
+            )
             for report in direct_reports:
-                exp_resp = supabase.table("expense_claims") \
-                    .select("*") \
-                    .eq("employee_id", report["id"]) \
-                    .order("claim_date", desc=True) \
-                    .limit(3) \
-                    .execute()
-                if exp_resp.data:
+                claims = claims_by_report[report["id"]]
+                if claims:
                     name = f"{report['first_name']} {report['last_name']}"
                     info = f"[Expense Claims for {name}]\n"
-                    for ex in exp_resp.data:
+                    for ex in claims:
                         info += f"  {ex.get('claim_date')}: {ex.get('category')} - MYR {ex.get('amount')} ({ex.get('status')})\n"
                     parts.append(info)
         except Exception as e:
@@ -753,16 +1257,15 @@ def get_manager_context(manager_email: str, question_lower: str) -> str:
     # Performance reviews for direct reports
     if any(kw in question_lower for kw in ["performance", "review", "rating", "team", "report"]):
         try:
+            reviews_by_report = loader.load_many(
+                "performance_reviews", "employee_id", report_ids,
+                order_by="review_period_end", desc=True, limit_per_key=1,
+            )
             for report in direct_reports:
-                pr_resp = supabase.table("performance_reviews") \
-                    .select("*") \
-                    .eq("employee_id", report["id"]) \
-                    .order("review_period_end", desc=True) \
-                    .limit(1) \
-                    .execute()
-                if pr_resp.data:
+                reviews = reviews_by_report[report["id"]]
+                if reviews:
                     name = f"{report['first_name']} {report['last_name']}"
-                    pr = pr_resp.data[0]
+                    pr = reviews[0]
                     parts.append(
                         f"[Latest Performance Review for {name}]\n"
                         f"  Period: {pr.get('review_period_start')} to {pr.get('review_period_end')}\n"
@@ -902,72 +1405,178 @@ async def get_users(role: str = None, all: bool = False):
 # WEBSOCKET CONNECTION MANAGER + MESSAGE STORE
 # ═══════════════════════════════════════════════════
 
-message_store: dict[str, list[dict]] = {}
+# Bounded per-conversation history (SQLite by default, see message_store.py)
+message_store = create_message_store()
+HISTORY_ON_CONNECT = int(os.getenv("CHAT_HISTORY_ON_CONNECT", "50"))
+HISTORY_PAGE_MAX = 200
+
+
+async def store_message(msg: dict) -> dict:
+    """Persist a message once for its conversation; returns it with its `seq`."""
+    return await asyncio.to_thread(message_store.append, msg)
+
+
+# Outbound frames buffered per socket before the client counts as a slow consumer
+CHAT_OUTBOUND_QUEUE = int(os.getenv("CHAT_OUTBOUND_QUEUE", "256"))
+# Close code sent to evicted slow consumers ("try again later")
+SLOW_CONSUMER_CLOSE_CODE = 1013
+
+chat_outbound_metrics = {
+    "frames_enqueued": 0,
+    "frames_sent": 0,
+    "frames_dropped": 0,
+    "slow_consumer_evictions": 0,
+    "send_errors": 0,
+    "max_queue_depth": 0,
+}
 
 
-def store_message(msg: dict):
-    """Store a message for both sender and recipient."""
-    sender = msg.get("from", "")
-    recipient = msg.get("to", "")
-    for uid in [sender, recipient]:
-        if uid:
-            if uid not in message_store:
-                message_store[uid] = []
-            message_store[uid].append(msg)
+class _ClientConnection:
+    """
+    One WebSocket plus its bounded outbound queue. A single writer task
+    drains the queue, so producers never await the network. Frames are
+    pre-serialized text shared by every recipient.
+    """
+
+    def __init__(self, user_id: str, websocket: WebSocket, on_closed: Callable):
+        self.user_id = user_id
+        self.websocket = websocket
+        self._queue: asyncio.Queue[str] = asyncio.Queue(maxsize=CHAT_OUTBOUND_QUEUE)
+        self._on_closed = on_closed
+        self.closed = False
+        self._writer = asyncio.create_task(self._write_loop())
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    def enqueue(self, frame: str) -> bool:
+        if self.closed:
+            return False
+        try:
+            self._queue.put_nowait(frame)
+        except asyncio.QueueFull:
+            chat_outbound_metrics["frames_dropped"] += 1
+            chat_outbound_metrics["slow_consumer_evictions"] += 1
+            print(f" Evicting slow WS consumer {self.user_id} ({self.depth} frames queued)")
+            self.close(SLOW_CONSUMER_CLOSE_CODE)
+            return False
+        chat_outbound_metrics["frames_enqueued"] += 1
+        chat_outbound_metrics["max_queue_depth"] = max(chat_outbound_metrics["max_queue_depth"], self.depth)
+        return True
+
+    async def _write_loop(self):
+        try:
+            while True:
+                frame = await self._queue.get()
+                await self.websocket.send_text(frame)
+                chat_outbound_metrics["frames_sent"] += 1
+        except asyncio.CancelledError:
+            pass
+        except Exception:
+            chat_outbound_metrics["send_errors"] += 1
+            self.close()
+
+    def close(self, code: int = None):
+        """Stop writing; optionally close the socket (the receive loop then disconnects)."""
+        if self.closed:
+            return
+        self.closed = True
+        self._writer.cancel()
+        if code is not None:
+            asyncio.create_task(self._close_socket(code))
+        asyncio.create_task(self._on_closed(self.user_id, self.websocket))
+
+    async def _close_socket(self, code: int):
+        try:
+            await self.websocket.close(code=code)
+        except Exception:
+            pass
 
 
 class ConnectionManager:
-    """Manages active WebSocket connections and message routing."""
+    """
+    Manages this worker's WebSocket connections. Routing to users on other
+    workers (and presence) goes through the chat broker; delivery to local
+    sockets is queued per connection (see _ClientConnection).
+    """
 
-    def __init__(self):
-        self.active_connections: dict[str, WebSocket] = {}
+    def __init__(self, broker: ChatBroker):
+        self.active_connections: dict[str, _ClientConnection] = {}
+        self.broker = broker
+
+    async def start(self):
+        await self.broker.start(self._deliver_local, self._broadcast_local)
 
     async def connect(self, user_id: str, websocket: WebSocket):
         await websocket.accept()
-        self.active_connections[user_id] = websocket
+        previous = self.active_connections.get(user_id)
+        self.active_connections[user_id] = _ClientConnection(user_id, websocket, self.disconnect)
+        if previous:
+            previous.close()
+        await self.broker.set_online(user_id)
         print(f"WS connected: {user_id} (total: {len(self.active_connections)})")
 
-        if user_id in message_store:
-            for msg in message_store[user_id]:
-                try:
-                    await websocket.send_json({**msg, "type": "history"})
-                except Exception:
-                    break
-
-    def disconnect(self, user_id: str):
-        self.active_connections.pop(user_id, None)
+        # Replay recent history as one frame; older pages via /api/messages
+        history = await asyncio.to_thread(message_store.history, user_id, None, HISTORY_ON_CONNECT)
+        if history["messages"]:
+            self.active_connections[user_id].enqueue(json.dumps({"type": "history", **history}))
+
+    async def disconnect(self, user_id: str, websocket: WebSocket = None):
+        conn = self.active_connections.get(user_id)
+        # A newer connection for the same user may already have replaced this one
+        if conn is None or (websocket is not None and conn.websocket is not websocket):
+            return
+        del self.active_connections[user_id]
+        conn.close()
+        await self.broker.set_offline(user_id)
         print(f"WS disconnected: {user_id} (total: {len(self.active_connections)})")
 
+    async def _deliver_local(self, user_id: str, message: dict) -> bool:
+        conn = self.active_connections.get(user_id)
+        return conn.enqueue(json.dumps(message)) if conn else False
+
+    async def _broadcast_local(self, message: dict, exclude: str = None):
+        # Serialize once; enqueueing never awaits, so one slow socket cannot stall the rest
+        frame = json.dumps(message)
+        for uid, conn in list(self.active_connections.items()):
+            if uid != exclude:
+                conn.enqueue(frame)
+
     async def send_to_user(self, user_id: str, message: dict):
-        ws = self.active_connections.get(user_id)
-        if ws:
-            try:
-                await ws.send_json(message)
-                return True
-            except Exception:
-                self.disconnect(user_id)
-                return False
-        return False
+        if user_id in self.active_connections:
+            return await self._deliver_local(user_id, message)
+        return await self.broker.publish_direct(user_id, message)
 
     async def broadcast(self, message: dict, exclude: str = None):
-        disconnected = []
-        for uid, ws in self.active_connections.items():
-            if uid != exclude:
-                try:
-                    await ws.send_json(message)
-                except Exception:
-                    disconnected.append(uid)
-        for uid in disconnected:
-            self.disconnect(uid)
+        await self.broker.publish_broadcast(message, exclude)
+
+    def outbound_stats(self) -> dict:
+        depths = [conn.depth for conn in self.active_connections.values()]
+        return {
+            **chat_outbound_metrics,
+            "connections": len(depths),
+            "queued_frames": sum(depths),
+            "current_max_depth": max(depths, default=0),
+            "queue_limit": CHAT_OUTBOUND_QUEUE,
+        }
+
 
+manager = ConnectionManager(create_chat_broker())
 
-manager = ConnectionManager()
+
+@app.get("/api/chat/presence")
+async def chat_presence():
+    """Users currently connected to /ws/chat on any worker."""
+    return {"online": await manager.broker.online_users(), "broker": manager.broker.stats(),
+            "outbound": manager.outbound_stats()}
 
 
 @app.get("/api/messages/{user_id}")
-async def get_messages(user_id: str):
-    """Return stored message history for a user."""
-    return {"messages": message_store.get(user_id, [])}
+async def get_messages(user_id: str, before: int | None = None, limit: int = HISTORY_ON_CONNECT):
+    """Return a page of message history for a user (newest page first, `before` = seq cursor)."""
+    limit = max(1, min(limit, HISTORY_PAGE_MAX))
+    return await asyncio.to_thread(message_store.history, user_id, before, limit)
 
 
 @app.websocket("/ws/chat/{user_id}")
@@ -990,7 +1599,7 @@ async def websocket_chat(websocket: WebSocket, user_id: str):
                 "id": f"{user_id}-{datetime.utcnow().timestamp()}"
             }
 
-            store_message(enriched)
+            enriched = await store_message(enriched)
 
             target = message.get("to")
             if target:
@@ -1000,7 +1609,7 @@ async def websocket_chat(websocket: WebSocket, user_id: str):
             await manager.send_to_user(user_id, enriched)
 
     except WebSocketDisconnect:
-        manager.disconnect(user_id)
+        await manager.disconnect(user_id, websocket)
 
 
 # ═══════════════════════════════════════════════════
@@ -1109,95 +1718,377 @@ async def register_candidate(request: CandidateRegistrationRequest):
 # ENHANCED CHAT ENDPOINT (RAG + Role-Based + History)
 # ═══════════════════════════════════════════════════
 
+# ── Concurrent context assembly ──
+# Every context lookup (RAG + each Firestore topic) runs on this bounded pool
+# with its own timeout, so one slow collection only drops its own section.
+CONTEXT_SOURCE_TIMEOUT = float(os.getenv("CHAT_CONTEXT_TIMEOUT", "4"))
+CONTEXT_POOL_SIZE = int(os.getenv("CHAT_CONTEXT_POOL_SIZE", "16"))
+_context_pool = ThreadPoolExecutor(max_workers=CONTEXT_POOL_SIZE, thread_name_prefix="chat-context")
+_context_timing_totals: dict[str, dict] = {}
+
+
+def _record_context_timing(name: str, elapsed_ms: float, status: str):
+    totals = _context_timing_totals.setdefault(
+        name, {"calls": 0, "total_ms": 0.0, "max_ms": 0.0, "timeouts": 0, "errors": 0},
+    )
+    totals["calls"] += 1
+    totals["total_ms"] += elapsed_ms
+    totals["max_ms"] = max(totals["max_ms"], elapsed_ms)
+    if status == "timeout":
+        totals["timeouts"] += 1
+    elif status == "error":
+        totals["errors"] += 1
+
+
+async def _run_context_source(name: str, build: Callable, timings: dict, default):
+    """Run one blocking context lookup on the pool, bounded by CONTEXT_SOURCE_TIMEOUT."""
+    loop = asyncio.get_running_loop()
+    start = time.perf_counter()
+    # Carry the request's context (relation identity map) into the worker thread
+    ctx = contextvars.copy_context()
+    try:
+        result = await asyncio.wait_for(
+            loop.run_in_executor(_context_pool, ctx.run, build), CONTEXT_SOURCE_TIMEOUT,
+        )
+        status = "ok"
+    except asyncio.TimeoutError:
+        print(f" Context source '{name}' timed out after {CONTEXT_SOURCE_TIMEOUT}s")
+        result, status = default, "timeout"
+    except Exception as e:
+        print(f" Context source '{name}' error: {e}")
+        result, status = default, "error"
+    elapsed_ms = round((time.perf_counter() - start) * 1000, 1)
+    timings[name] = {"ms": elapsed_ms, "status": status}
+    _record_context_timing(name, elapsed_ms, status)
+    return result
+
+
+def _retrieve_for_chat(message: str) -> tuple:
+    """Embed the question once and use it for retrieval (and later as the cache key)."""
+    query_embedding = embed_query(message)
+    rag_context, sources, chunk_ids = retrieve_policy_chunks(message, query_embedding=query_embedding)
+    return query_embedding, rag_context, sources, chunk_ids
+
+
+async def _prepare_chat(request: ChatRequest) -> dict:
+    """
+    Build everything needed for a Claude chat call: RAG context, employee
+    context, role-aware system prompt and the trimmed message history.
+    RAG retrieval and every employee-data lookup fan out concurrently.
+    """
+    model_key = request.model if request.model in AVAILABLE_MODELS else DEFAULT_MODEL
+    model_config = AVAILABLE_MODELS[model_key]
+    # Read before retrieval: an ingest landing mid-request must make this answer stale
+    cache_generation = answer_cache.generation
+    timings = {}
+    phase_start = time.perf_counter()
+    begin_identity_map()
+
+    # 1. RAG: Retrieve relevant policy chunks — runs alongside the employee lookups
+    rag_task = asyncio.create_task(_run_context_source(
+        "rag", partial(_retrieve_for_chat, request.message), timings, (None, "", [], []),
+    ))
+
+    # 2. Employee data: Get personal/team data from Supabase
+    employee_parts = []
+    if request.user_email:
+        loader = new_request_loader()
+        employee = await _run_context_source(
+            "employee", partial(loader.employee_by_email, request.user_email), timings, None,
+        )
+        if employee:
+            context_sources = employee_context_sources(
+                employee, request.user_email, request.user_role, request.message, loader,
+            )
+            results = await asyncio.gather(*(
+                _run_context_source(name, build, timings, []) for name, build in context_sources.items()
+            ))
+            employee_parts = [_profile_context(employee)] + [part for parts in results for part in parts]
+        print(f"Context loader: {loader.round_trips} batched round trips")
+
+    query_embedding, rag_context, sources, chunk_ids = await rag_task
+    timings["total"] = {"ms": round((time.perf_counter() - phase_start) * 1000, 1), "status": "ok"}
+    print("Context timings (ms): " + ", ".join(f"{k}={v['ms']}" for k, v in timings.items()))
+
+    # Policy-only first-turn question: nothing beyond the profile header was pulled
+    # in and no earlier conversation to depend on. Drop the profile so the answer is
+    # user-agnostic and safe to share via the cache.
+    cacheable = (
+        not request.history
+        and bool(query_embedding) and bool(chunk_ids) and len(employee_parts) <= 1
+    )
+    employee_context = "" if cacheable else "\n\n".join(employee_parts)
+    print(f"Employee context found: {len(employee_context)} chars | RAG context: {len(rag_context)} chars")
+    if employee_context:
+        print(f"Employee context preview: {employee_context[:200]}...")
+
+    # 3. Build role-aware system prompt
+    system_prompt = build_system_prompt(
+        role=request.user_role,
+        rag_context=rag_context,
+        employee_context=employee_context,
+        sources=sources,
+    )
+
+    # 4. Build messages with conversation history (last 10 turns)
+    messages = []
+    if request.history:
+        for msg in request.history[-10:]:
+            messages.append({
+                "role": msg.get("role", "user"),
+                "content": msg.get("content", ""),
+            })
+
+    # Add current message
+    messages.append({"role": "user", "content": request.message})
+
+    return {
+        "model_config": model_config,
+        "system_prompt": system_prompt,
+        "messages": messages,
+        "rag_context": rag_context,
+        "sources": sources,
+        "cache_key": (query_embedding, chunk_ids, request.user_role) if cacheable else None,
+        "cache_generation": cache_generation,
+        "timings": timings,
+    }
+
+
+def _lookup_cached_answer(request: ChatRequest, prepared: dict) -> dict | None:
+    """Return a cached answer payload for a policy-only first-turn question, if any."""
+    if not prepared["cache_key"]:
+        return None
+    embedding, chunk_ids, role = prepared["cache_key"]
+    cached = answer_cache.lookup(request.message, embedding, chunk_ids, role)
+    if cached:
+        print(f"Answer cache hit for '{request.message[:60]}'")
+    return cached
+
+
+def _store_cached_answer(request: ChatRequest, prepared: dict, payload: dict, llm_latency: float):
+    """Cache a freshly generated answer (cache_key is only set for first-turn
+    policy questions, so the cached text never depends on an earlier conversation)."""
+    if not prepared["cache_key"]:
+        return
+    embedding, chunk_ids, role = prepared["cache_key"]
+    answer_cache.store(
+        request.message, embedding, chunk_ids, role, payload, llm_latency,
+        generation=prepared["cache_generation"],
+    )
+
+
+def _parse_chat_answer(raw_answer: str) -> tuple[str, list]:
+    """Split Claude's JSON envelope into (answer_text, actions)."""
+    actions = []
+    answer = raw_answer
+
+    try:
+        # Look for JSON structure in the response
+        json_match = re.search(r'({.*})', raw_answer, re.DOTALL)
+        if json_match:
+            parsed = json.loads(json_match.group(1))
+        else:
+            # If no JSON found, try to parse the entire string
+            parsed = json.loads(raw_answer)
+        answer = parsed.get("response", raw_answer)
+        actions = parsed.get("actions", [])
+    except (json.JSONDecodeError, AttributeError, ValueError):
+        # Fallback if parsing fails
+        print(f"JSON Parse Failed for: {raw_answer[:100]}...")
+        answer = raw_answer
+
+    return answer, actions
+
+
+def _chat_metadata(prepared: dict) -> dict:
+    """Model label, source, confidence and context timings shared by both chat endpoints."""
+    sources = prepared["sources"]
+    return {
+        "model": prepared["model_config"]["label"],
+        "source": ", ".join(sources[:3]) if sources else None,
+        "confidence": "high" if prepared["rag_context"] else "medium",
+        "context_timings": prepared["timings"],
+    }
+
+
+class _ResponseFieldStreamer:
+    """
+    Incrementally pulls the decoded value of the "response" field out of a
+    JSON envelope that is still being generated, so the answer text can be
+    streamed before the closing brace (and the actions array) arrive.
+    If the model does not answer in JSON at all, text is passed straight through.
+    """
+
+    _ESCAPES = {'"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+    _KEY_RE = re.compile(r'"response"\s*:\s*"')
+
+    def __init__(self):
+        self._buf = ""          # undecoded text not yet consumed
+        self._mode = "detect"   # detect → seek → value → done | raw
+        self._seek_pos = 0
+
+    def feed(self, chunk: str) -> str:
+        """Consume a text delta and return any newly decoded answer text."""
+        self._buf += chunk
+        if self._mode == "detect":
+            stripped = self._buf.lstrip()
+            if not stripped:
+                return ""
+            # Claude occasionally wraps the JSON in a ``` fence
+            if stripped.startswith("`") and len(stripped) < 8 and "{" not in stripped:
+                return ""
+            self._mode = "seek" if stripped.startswith(("{", "`")) else "raw"
+
+        if self._mode == "raw":
+            out, self._buf = self._buf, ""
+            return out
+
+        if self._mode == "seek":
+            m = self._KEY_RE.search(self._buf, self._seek_pos)
+            if not m:
+                # Keep scanning from near the end next time (key may be split across chunks)
+                self._seek_pos = max(0, len(self._buf) - 16)
+                return ""
+            self._buf = self._buf[m.end():]
+            self._mode = "value"
+
+        if self._mode == "value":
+            return self._decode_value()
+        return ""
+
+    def _decode_value(self) -> str:
+        out = []
+        buf = self._buf
+        i = 0
+        n = len(buf)
+        while i < n:
+            ch = buf[i]
+            if ch == '"':
+                self._mode = "done"
+                i = n
+                break
+            if ch != '\\':
+                out.append(ch)
+                i += 1
+                continue
+            # Escape sequence — wait for the rest of it if it is split across chunks
+            if i + 1 >= n:
+                break
+            esc = buf[i + 1]
+            if esc == 'u':
+                if i + 6 > n:
+                    break
+                try:
+                    out.append(chr(int(buf[i + 2:i + 6], 16)))
+                except ValueError:
+                    pass
+                i += 6
+            else:
+                out.append(self._ESCAPES.get(esc, esc))
+                i += 2
+        self._buf = buf[i:] if self._mode == "value" else ""
+        return "".join(out)
+
+
+def _sse(event: str, data: dict) -> str:
+    """Format a single Server-Sent Event frame."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
 @app.post("/api/chat")
 async def chat(request: ChatRequest):
     print(f"Received: '{request.message}' | Model: {request.model} | User: {request.user_email} | Role: {request.user_role}")
-    
-    model_key = request.model if request.model in AVAILABLE_MODELS else DEFAULT_MODEL
-    model_config = AVAILABLE_MODELS[model_key]
-    
+
     try:
-        # 1. RAG: Retrieve relevant policy chunks
-        rag_context, sources = get_rag_context(request.message)
-        
-        # 2. Employee data: Get personal/team data from Supabase
-        employee_context = ""
-        if request.user_email:
-            employee_context = get_employee_context(
-                request.user_email,
-                request.user_role,
-                request.message,
-            )
-        print(f"Employee context found: {len(employee_context)} chars | RAG context: {len(rag_context)} chars")
-        if employee_context:
-            print(f"Employee context preview: {employee_context[:200]}...")
-        
-        # 3. Build role-aware system prompt
-        system_prompt = build_system_prompt(
-            role=request.user_role,
-            rag_context=rag_context,
-            employee_context=employee_context,
-            sources=sources,
-        )
-        
-        # 4. Build messages with conversation history (last 10 turns)
-        messages = []
-        if request.history:
-            for msg in request.history[-10:]:
-                messages.append({
-                    "role": msg.get("role", "user"),
-                    "content": msg.get("content", ""),
-                })
-        
-        # Add current message
-        messages.append({"role": "user", "content": request.message})
-        
-        # 5. Call Claude
-        response = claude_client.messages.create(
-            model=model_config["model_id"],
+        prepared = await _prepare_chat(request)
+
+        cached = _lookup_cached_answer(request, prepared)
+        if cached:
+            return {**cached, **_chat_metadata(prepared), "cached": True}
+
+        # 5. Call Claude (async client — does not block other requests)
+        llm_start = time.perf_counter()
+        response = await claude_async_client.messages.create(
+            model=prepared["model_config"]["model_id"],
             max_tokens=2048,
-            system=system_prompt,
-            messages=messages,
+            system=prepared["system_prompt"],
+            messages=prepared["messages"],
         )
+        llm_latency = time.perf_counter() - llm_start
         raw_answer = response.content[0].text
-        
+
         # 6. Parse JSON from Claude response
-        actions = []
-        answer = raw_answer
-        
-        try:
-            # Look for JSON structure in the response
-            json_match = re.search(r'({.*})', raw_answer, re.DOTALL)
-            if json_match:
-                parsed = json.loads(json_match.group(1))
-                answer = parsed.get("response", raw_answer)
-                actions = parsed.get("actions", [])
-            else:
-                # If no JSON found, try to parse the entire string
-                parsed = json.loads(raw_answer)
-                answer = parsed.get("response", raw_answer)
-                actions = parsed.get("actions", [])
-        except (json.JSONDecodeError, AttributeError, ValueError):
-            # Fallback if parsing fails
-            print(f"JSON Parse Failed for: {raw_answer[:100]}...")
-            answer = raw_answer
+        answer, actions = _parse_chat_answer(raw_answer)
+        _store_cached_answer(request, prepared, {"response": answer, "actions": actions}, llm_latency)
 
         # 7. Determine confidence based on RAG results
-        confidence = "high" if rag_context else "medium"
-        source_label = ", ".join(sources[:3]) if sources else None
-        
         return {
             "response": answer,
             "actions": actions,
-            "model": model_config["label"],
-            "source": source_label,
-            "confidence": confidence,
+            **_chat_metadata(prepared),
         }
     except Exception as e:
         print(f"Error: {str(e)}")
         return {"response": f"Error: {str(e)}"}
 
 
+@app.post("/api/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """
+    Streaming variant of /api/chat. Emits Server-Sent Events:
+      - event: token  data: {"text": "..."}          partial answer text
+      - event: done   data: {"response", "actions", "model", "source", "confidence"}
+      - event: error  data: {"message": "..."}
+    """
+    print(f"Received (stream): '{request.message}' | Model: {request.model} | User: {request.user_email} | Role: {request.user_role}")
+
+    async def event_source():
+        try:
+            prepared = await _prepare_chat(request)
+
+            cached = _lookup_cached_answer(request, prepared)
+            if cached:
+                yield _sse("token", {"text": cached["response"]})
+                yield _sse("done", {**cached, **_chat_metadata(prepared), "cached": True})
+                return
+
+            streamer = _ResponseFieldStreamer()
+            raw_parts = []
+
+            llm_start = time.perf_counter()
+            async with claude_async_client.messages.stream(
+                model=prepared["model_config"]["model_id"],
+                max_tokens=2048,
+                system=prepared["system_prompt"],
+                messages=prepared["messages"],
+            ) as stream:
+                async for delta in stream.text_stream:
+                    raw_parts.append(delta)
+                    text = streamer.feed(delta)
+                    if text:
+                        yield _sse("token", {"text": text})
+
+            llm_latency = time.perf_counter() - llm_start
+
+            # Actions only become available once the whole envelope is in
+            answer, actions = _parse_chat_answer("".join(raw_parts))
+            _store_cached_answer(request, prepared, {"response": answer, "actions": actions}, llm_latency)
+            yield _sse("done", {
+                "response": answer,
+                "actions": actions,
+                **_chat_metadata(prepared),
+            })
+        except Exception as e:
+            print(f"Stream error: {str(e)}")
+            yield _sse("error", {"message": str(e)})
+
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 # ═══════════════════════════════════════════════════
 # POLICY SYNC ENDPOINT
 # ═══════════════════════════════════════════════════
@@ -1209,65 +2100,99 @@ async def sync_policies():
         from ingest_policies import ingest_policies
         count = ingest_policies()
         init_chroma()
+        answer_cache.invalidate()
         return {"status": "ok", "policies_indexed": count}
     except Exception as e:
         print(f"Sync error: {str(e)}")
         return {"status": "error", "message": str(e)}
 
 
+@app.get("/api/chat/cache/stats")
+async def chat_cache_stats():
+    """Hit rate and saved LLM time for the semantic answer cache."""
+    return answer_cache.stats()
+
+
+@app.get("/api/chat/context-timings")
+async def chat_context_timings():
+    """Aggregate per-source context assembly timings, slowest average first."""
+    rows = []
+    for name, t in _context_timing_totals.items():
+        rows.append({
+            "source": name,
+            **t,
+            "total_ms": round(t["total_ms"], 1),
+            "avg_ms": round(t["total_ms"] / t["calls"], 1) if t["calls"] else 0.0,
+        })
+    rows.sort(key=lambda r: r["avg_ms"], reverse=True)
+    return {"timeout_seconds": CONTEXT_SOURCE_TIMEOUT, "sources": rows}
+
+
 @app.get("/api/health")
 async def health():
     chroma_status = "loaded" if chroma_collection else "not_loaded"
-    return {"status": "ok", "chroma": chroma_status}
+    return {"status": "ok", "chroma": chroma_status, "employee_directory": employee_directory.stats(),
+            "employee_email_cache": employee_email_cache.stats(),
+            "firestore_compat": firestore_compat_metrics,
+            "message_store": message_store.stats(),
+            "chat_broker": manager.broker.stats(),
+            "chat_outbound": manager.outbound_stats(),
+            "resume_jobs": resume_job_queue.stats(),
+            "http_clients": http_clients.stats()}
 
 
 # ═══════════════════════════════════════════════════
 # RESUME ANALYZER
 # ═══════════════════════════════════════════════════
 
-@app.post("/api/analyze-resume")
-async def analyze_resume(
-    resume: UploadFile = File(...),
-    job_description: str = Form(...),
-    company_name: str = Form(""),
-    company_code: str = Form(""),
-    job_title: str = Form(""),
-    candidate_name: str = Form(""),
-):
-    """Analyze a resume PDF against a job description using Ollama (Gemma)."""
-    print(f"Resume analyzer: received '{resume.filename}' ({resume.size} bytes)")
-
-    try:
-        # ── STEP 1: Extract text with PyMuPDF ──
+class ResumeAnalysisError(Exception):
+    """Analysis cannot proceed; the message is returned to the client as `detail`."""
+
+
+async def _run_resume_analysis(contents: bytes, filename: str, job_description: str,
+                               cache_checked: bool = False,
+                               progress=lambda stage, **details: None) -> dict:
+    """Extract, score and compile a report for one resume (runs on the job queue)."""
+    digest = pdf_digest(contents)
+    cache_key = resume_cache.analysis_key(digest, job_description, OLLAMA_MODEL)
+    # Re-check: an identical upload queued ahead of this one may have finished since
+    # submission (its miss was already counted there)
+    cached = await asyncio.to_thread(resume_cache.get_analysis, cache_key, not cache_checked)
+    if cached is not None:
+        progress("cache_hit")
+        print(f"Resume analyzer: cache hit for {digest[:12]}")
+        return cached
+
+    # ── STEP 1: Extract text with PyMuPDF (or reuse text from an earlier upload) ──
+    progress("extracting")
+    cached_text = await asyncio.to_thread(resume_cache.get_text, digest)
+    if cached_text is not None:
+        extracted_text, num_pages = cached_text["text"], cached_text["pages"]
+    else:
         print("Step 1: Extracting text from PDF...")
-        contents = await resume.read()
-
-        with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as tmp:
-            tmp.write(contents)
-            tmp_path = tmp.name
+        extracted_text, num_pages = await pdf_extract.extract_text_async(contents)
 
-        try:
-            doc = fitz.open(tmp_path)
-            extracted_text = ""
-            num_pages = doc.page_count
-            for page in doc:
-                extracted_text += page.get_text()
-            doc.close()
-        finally:
-            os.unlink(tmp_path)
+        if extracted_text.strip():
+            try:
+                await asyncio.to_thread(resume_cache.put_text, digest, extracted_text, num_pages)
+            except OSError as e:
+                print(f"Resume cache: could not store extracted text: {e}")
 
-        if not extracted_text.strip():
-            return {"detail": "Could not extract any text from the PDF. The file may be scanned or image-based."}
+    if not extracted_text.strip():
+        raise ResumeAnalysisError("Could not extract any text from the PDF. The file may be scanned or image-based.")
 
-        print(f"   Extracted {len(extracted_text)} characters from {num_pages} pages")
+    print(f"   Extracted {len(extracted_text)} characters from {num_pages} pages")
 
-        # ── STEP 2 & 3: Run analysis + questions in PARALLEL ──
-        print(f"Step 2-3: Analyzing resume + generating questions in parallel with Ollama ({OLLAMA_MODEL})...")
+    # ── STEP 2 & 3: Run analysis + questions in PARALLEL ──
+    progress("analyzing", pages=num_pages, characters=len(extracted_text))
+    print(f"Step 2-3: Analyzing resume + generating questions in parallel with Ollama ({OLLAMA_MODEL})...")
 
-        resume_text = extracted_text[:4000]   # trimmed for speed
-        job_text = job_description[:1500]
+    resume_text = extracted_text[:pdf_extract.RESUME_TEXT_BUDGET]   # trimmed for speed
+    job_text = job_description[:1500]
 
-        analysis_prompt = f"""You are an HR resume analyst. Score this resume against the job description.
+    # Static instructions + job description come first so Ollama can reuse the cached
+    # prompt prefix (KV cache) across resumes screened against the same posting
+    analysis_prompt = f"""You are an HR resume analyst. Score this resume against the job description.
 
 Criteria (score each 0-100, give 1-2 sentence explanation):
 1. Job Relevance (weight:30%) - alignment with job requirements
@@ -1290,256 +2215,338 @@ Respond ONLY with a valid JSON object matching this exact structure:
   "summary": "Overall fit summary..."
 }}
 
-RESUME:
-{resume_text}
-
 JOB DESCRIPTION:
 {job_text}
 
+RESUME:
+{resume_text}
+
 OUTPUT VALID JSON ONLY."""
 
-        questions_prompt = f"""Generate exactly 5 interview questions to fact-check this resume. Focus on: verifiable claims, technical skills, achievements, project roles, employment gaps.
+    questions_prompt = f"""Generate exactly 5 interview questions to fact-check this resume. Focus on: verifiable claims, technical skills, achievements, project roles, employment gaps.
 
-Respond ONLY with a valid JSON array of strings matching this exact format:
-[
-  "Question 1?",
-  "Question 2?",
-  "Question 3?",
-  "Question 4?",
-  "Question 5?"
-]
+Respond ONLY with a valid JSON object matching this exact format:
+{{
+  "questions": [
+    "Question 1?",
+    "Question 2?",
+    "Question 3?",
+    "Question 4?",
+    "Question 5?"
+  ]
+}}
 
 RESUME:
 {resume_text}
 
-OUTPUT VALID JSON ARRAY ONLY."""
+OUTPUT VALID JSON ONLY."""
 
-        # Fire both LLM calls concurrently
-        raw_analysis, raw_questions = await asyncio.gather(
-            ollama_generate(analysis_prompt, max_tokens=1024, format="json"),
-            ollama_generate(questions_prompt, max_tokens=512, format="json"),
-        )
-        raw_analysis = raw_analysis.strip()
-        raw_questions = raw_questions.strip()
-
-        def _clean_llm_json(text: str) -> str:
-            """Clean common LLM JSON issues: markdown fences, trailing commas, etc."""
-            # Strip markdown code fences
-            text = re.sub(r'^```(?:json)?\s*\n?', '', text, flags=re.MULTILINE)
-            text = re.sub(r'\n?```\s*$', '', text, flags=re.MULTILINE)
-            text = text.strip()
-            # Remove trailing commas before } or ]
-            text = re.sub(r',\s*([}\]])', r'\1', text)
-            return text
-
-        def _repair_json_string(text: str) -> str:
-            """Aggressively repair broken JSON by escaping problematic characters inside string values."""
-            # Replace literal control characters that break JSON
-            text = text.replace('\r\n', '\\n').replace('\r', '\\n').replace('\n', '\\n')
-            text = text.replace('\t', '\\t')
-
-            # Fix unescaped quotes inside JSON string values using a state machine
-            result = []
-            i = 0
-            in_string = False
-            prev_was_backslash = False
-
-            while i < len(text):
-                ch = text[i]
-
-                if prev_was_backslash:
-                    result.append(ch)
-                    prev_was_backslash = False
-                    i += 1
-                    continue
+    # Fire both LLM calls concurrently; decoding is constrained to the response schemas
+    raw_analysis, raw_questions = await asyncio.gather(
+        ollama_generate(analysis_prompt, max_tokens=1024, format=ollama_format(ResumeAnalysis), stop_at_json=True,
+                        on_progress=lambda n: progress("generating", prompt="analysis", characters=n)),
+        ollama_generate(questions_prompt, max_tokens=512, format=ollama_format(FactCheckQuestions), stop_at_json=True,
+                        on_progress=lambda n: progress("generating", prompt="questions", characters=n)),
+    )
+    raw_analysis = raw_analysis.strip()
+    raw_questions = raw_questions.strip()
 
-                if ch == '\\':
-                    result.append(ch)
-                    prev_was_backslash = True
-                    i += 1
-                    continue
+    # Log raw AI output for debugging
+    try:
+        debug_path = os.path.join(REPORTS_DIR, "last_raw_analysis.txt")
+        with open(debug_path, "w", encoding="utf-8") as df:
+            df.write("=== RAW ANALYSIS ===\n")
+            df.write(raw_analysis)
+            df.write("\n\n=== RAW QUESTIONS ===\n")
+            df.write(raw_questions)
+    except Exception:
+        pass
+
+    # Validate analysis JSON
+    analysis = validate(ResumeAnalysis, raw_analysis)
+
+    criteria = [c.model_dump() for c in analysis.criteria]
+    summary = analysis.summary
+
+    weighted_total = sum(
+        (c["score"] * c["weight"] / 100) for c in criteria
+    )
 
-                if ch == '"':
-                    if not in_string:
-                        in_string = True
-                        result.append(ch)
-                    else:
-                        # Check if this quote is a legitimate string terminator
-                        # Look ahead: if next non-whitespace is : , } ] or end — it's legit
-                        rest = text[i+1:].lstrip()
-                        if not rest or rest[0] in ':,}]':
-                            in_string = False
-                            result.append(ch)
-                        else:
-                            # It's an unescaped quote inside a string — escape it
-                            result.append('\\"')
-                    i += 1
-                    continue
+    print(f"   Analysis complete. Weighted score: {weighted_total:.1f}/100")
+
+    # Validate questions JSON
+    fact_check_questions = validate(FactCheckQuestions, raw_questions).questions
+
+    print(f"   Generated {len(fact_check_questions)} fact-checking questions")
+
+    # ── COMPILE REPORT ──
+    progress("compiling_report")
+    print("Compiling report...")
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    report_filename = f"resume_analysis_{timestamp}.txt"
+    report_path = os.path.join(REPORTS_DIR, report_filename)
+
+    with open(report_path, "w", encoding="utf-8") as f:
+        f.write("=" * 60 + "\n")
+        f.write("  RESUME ANALYSIS REPORT\n")
+        f.write(f"  Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+        f.write(f"  File: {filename}\n")
+        f.write("=" * 60 + "\n\n")
+
+        f.write("─" * 40 + "\n")
+        f.write(f"  WEIGHTED TOTAL SCORE: {weighted_total:.1f} / 100\n")
+        f.write("─" * 40 + "\n\n")
+
+        f.write("OVERALL SUMMARY\n")
+        f.write("-" * 40 + "\n")
+        f.write(f"{summary}\n\n")
+
+        f.write("CRITERIA BREAKDOWN\n")
+        f.write("-" * 40 + "\n")
+        for c in criteria:
+            f.write(f"\n  {c['criterion']} (Weight: {c['weight']}%)\n")
+            f.write(f"  Score: {c['score']}/100\n")
+            f.write(f"  {c['explanation']}\n")
+
+        f.write("\n\nFACT-CHECKING QUESTIONS\n")
+        f.write("-" * 40 + "\n")
+        for i, q in enumerate(fact_check_questions, 1):
+            f.write(f"\n  {i}. {q}\n")
+
+        f.write("\n" + "=" * 60 + "\n")
+        f.write("  END OF REPORT\n")
+        f.write("=" * 60 + "\n")
+
+    print(f"   Report saved to {report_path}")
+
+    # Note: Firestore save is handled by the frontend to avoid duplicates
+
+    result = {
+        "criteria": criteria,
+        "weighted_total": round(weighted_total, 1),
+        "summary": summary,
+        "fact_check_questions": fact_check_questions,
+        "report_path": report_filename,
+    }
+    try:
+        await asyncio.to_thread(resume_cache.put_analysis, cache_key, result)
+    except OSError as e:
+        # The analysis itself succeeded; only the cache write is lost
+        print(f"Resume cache: could not store analysis: {e}")
+    return result
+
+
+def _resume_error_detail(e: Exception) -> str:
+    if isinstance(e, ResumeAnalysisError):
+        return str(e)
+    traceback.print_exc()
+    if isinstance(e, (json.JSONDecodeError, LLMJSONSchemaError, ValidationError)):
+        print(f"JSON parse error: {e}")
+        return f"Failed to parse AI response: {str(e)}"
+    print(f"Resume analysis error: {e}")
+    return f"Analysis failed: {str(e)}"
 
-                result.append(ch)
-                i += 1
 
-            return ''.join(result)
+async def _resume_job_handler(job, progress) -> dict:
+    try:
+        return await _run_resume_analysis(**job.payload, progress=progress)
+    except Exception as e:
+        raise RuntimeError(_resume_error_detail(e)) from e
 
-        def _extract_and_parse_object(text: str) -> dict:
-            """Extract JSON object from text, trying multiple strategies."""
-            cleaned = _clean_llm_json(text)
 
-            # Strategy 1: Direct parse
-            try:
-                return json.loads(cleaned)
-            except json.JSONDecodeError:
-                pass
-
-            # Strategy 2: Nested brace matching
-            depth = 0
-            start = None
-            for i, ch in enumerate(cleaned):
-                if ch == '{':
-                    if depth == 0:
-                        start = i
-                    depth += 1
-                elif ch == '}':
-                    depth -= 1
-                    if depth == 0 and start is not None:
-                        candidate = cleaned[start:i+1]
-                        try:
-                            return json.loads(candidate)
-                        except json.JSONDecodeError:
-                            # Strategy 3: Repair the extracted candidate
-                            try:
-                                repaired = _repair_json_string(candidate)
-                                return json.loads(repaired)
-                            except json.JSONDecodeError:
-                                pass
-                        start = None
-
-            # Strategy 4: Greedy regex + repair
-            m = re.search(r'(\{.*\})', cleaned, re.DOTALL)
-            if m:
-                candidate = m.group(1)
-                try:
-                    return json.loads(candidate)
-                except json.JSONDecodeError:
-                    repaired = _repair_json_string(candidate)
-                    try:
-                        return json.loads(repaired)
-                    except json.JSONDecodeError:
-                        pass
-
-            # Strategy 5: Repair entire cleaned text
-            repaired = _repair_json_string(cleaned)
-            try:
-                return json.loads(repaired)
-            except json.JSONDecodeError:
-                pass
+# Bounded worker pool in front of Ollama; fair round-robin across company codes
+resume_job_queue = ResumeJobQueue(_resume_job_handler)
+# sha256(pdf) + job description + model → extracted text / parsed analysis on disk
+resume_cache = ResumeAnalysisCache()
 
-            raise json.JSONDecodeError("No valid JSON object found after all repair strategies", text, 0)
 
-        def _extract_and_parse_array(raw: str) -> list:
-            """Robustly extract a JSON array from LLM output."""
-            cleaned = _clean_llm_json(raw)
-            try:
-                return json.loads(cleaned)
-            except json.JSONDecodeError:
-                pass
-            m = re.search(r'(\[.*\])', cleaned, re.DOTALL)
-            if m:
-                try:
-                    return json.loads(m.group(1))
-                except json.JSONDecodeError:
-                    repaired = _repair_json_string(m.group(1))
-                    try:
-                        return json.loads(repaired)
-                    except json.JSONDecodeError:
-                        pass
-            raise json.JSONDecodeError("No valid JSON array found", raw, 0)
-
-        # Log raw AI output for debugging
-        try:
-            debug_path = os.path.join(REPORTS_DIR, "last_raw_analysis.txt")
-            with open(debug_path, "w", encoding="utf-8") as df:
-                df.write("=== RAW ANALYSIS ===\n")
-                df.write(raw_analysis)
-                df.write("\n\n=== RAW QUESTIONS ===\n")
-                df.write(raw_questions)
-        except Exception:
-            pass
+async def _submit_resume_job(resume: UploadFile, job_description: str, company_code: str):
+    return await _submit_resume_bytes(await resume.read(), resume.filename, job_description, company_code)
 
-        # Parse analysis JSON
-        analysis_data = _extract_and_parse_object(raw_analysis)
 
-        criteria = analysis_data.get("criteria", [])
-        summary = analysis_data.get("summary", "")
+async def _submit_resume_bytes(contents: bytes, filename: str, job_description: str, company_code: str):
+    # Identical PDF + job description: answer from cache without waiting in the queue
+    cache_key = resume_cache.analysis_key(pdf_digest(contents), job_description, OLLAMA_MODEL)
+    cached = await asyncio.to_thread(resume_cache.get_analysis, cache_key)
+    if cached is not None:
+        return resume_job_queue.add_finished(company_code, cached)
+    return await resume_job_queue.submit(company_code, {
+        "contents": contents,
+        "filename": filename,
+        "job_description": job_description,
+        "cache_checked": True,
+    })
 
-        weighted_total = sum(
-            (c["score"] * c["weight"] / 100) for c in criteria
-        )
 
-        print(f"   Analysis complete. Weighted score: {weighted_total:.1f}/100")
+@app.post("/api/analyze-resume")
+async def analyze_resume(
+    resume: UploadFile = File(...),
+    job_description: str = Form(...),
+    company_name: str = Form(""),
+    company_code: str = Form(""),
+    job_title: str = Form(""),
+    candidate_name: str = Form(""),
+):
+    """Analyze a resume PDF against a job description using Ollama (Gemma); waits for the queued job."""
+    print(f"Resume analyzer: received '{resume.filename}' ({resume.size} bytes)")
+    try:
+        job = await _submit_resume_job(resume, job_description, company_code)
+    except QueueFullError as e:
+        return JSONResponse(status_code=429, content={"detail": f"Resume analyzer is busy: {e}"})
+    await job.done.wait()
+    if job.status == "failed":
+        return {"detail": job.error}
+    return job.result
 
-        # Parse questions JSON
-        fact_check_questions = _extract_and_parse_array(raw_questions)
 
-        print(f"   Generated {len(fact_check_questions)} fact-checking questions")
+@app.post("/api/analyze-resume/jobs")
+async def submit_resume_analysis(
+    resume: UploadFile = File(...),
+    job_description: str = Form(...),
+    company_name: str = Form(""),
+    company_code: str = Form(""),
+    job_title: str = Form(""),
+    candidate_name: str = Form(""),
+):
+    """Queue a resume analysis and return its job ID immediately."""
+    print(f"Resume analyzer: queued '{resume.filename}' ({resume.size} bytes) for '{company_code}'")
+    try:
+        job = await _submit_resume_job(resume, job_description, company_code)
+    except QueueFullError as e:
+        return JSONResponse(status_code=429, content={"detail": f"Resume analyzer is busy: {e}"})
+    return JSONResponse(status_code=202, content=job.to_dict(resume_job_queue.position(job)))
 
-        # ── COMPILE REPORT ──
-        print("Compiling report...")
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        report_filename = f"resume_analysis_{timestamp}.txt"
-        report_path = os.path.join(REPORTS_DIR, report_filename)
 
-        with open(report_path, "w", encoding="utf-8") as f:
-            f.write("=" * 60 + "\n")
-            f.write("  RESUME ANALYSIS REPORT\n")
-            f.write(f"  Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-            f.write(f"  File: {resume.filename}\n")
-            f.write("=" * 60 + "\n\n")
+RESUME_BATCH_MAX_FILES = int(os.getenv("RESUME_BATCH_MAX_FILES", "100"))
+RESUME_BATCH_MAX_FILE_BYTES = 10 * 1024 * 1024
 
-            f.write("─" * 40 + "\n")
-            f.write(f"  WEIGHTED TOTAL SCORE: {weighted_total:.1f} / 100\n")
-            f.write("─" * 40 + "\n\n")
 
-            f.write("OVERALL SUMMARY\n")
-            f.write("-" * 40 + "\n")
-            f.write(f"{summary}\n\n")
+def _expand_batch_upload(filename: str, data: bytes) -> list[tuple[str, bytes]]:
+    """A PDF upload as-is, or every PDF inside a .zip upload (size-capped)."""
+    if not filename.lower().endswith(".zip"):
+        return [(filename, data)]
+    pdfs = []
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        for info in archive.infolist():
+            name = info.filename
+            if info.is_dir() or not name.lower().endswith(".pdf") or name.startswith("__MACOSX/"):
+                continue
+            if info.file_size > RESUME_BATCH_MAX_FILE_BYTES:
+                print(f"   Skipping '{name}' in {filename}: {info.file_size} bytes")
+                continue
+            pdfs.append((os.path.basename(name), archive.read(info)))
+            if len(pdfs) >= RESUME_BATCH_MAX_FILES:
+                break
+    return pdfs
 
-            f.write("CRITERIA BREAKDOWN\n")
-            f.write("-" * 40 + "\n")
-            for c in criteria:
-                f.write(f"\n  {c['criterion']} (Weight: {c['weight']}%)\n")
-                f.write(f"  Score: {c['score']}/100\n")
-                f.write(f"  {c['explanation']}\n")
 
-            f.write("\n\nFACT-CHECKING QUESTIONS\n")
-            f.write("-" * 40 + "\n")
-            for i, q in enumerate(fact_check_questions, 1):
-                f.write(f"\n  {i}. {q}\n")
+@app.post("/api/analyze-resume/batch")
+async def analyze_resume_batch(
+    resumes: List[UploadFile] = File(...),
+    job_description: str = Form(...),
+    company_code: str = Form(""),
+    job_title: str = Form(""),
+    shortlist_size: int = Form(10),
+):
+    """
+    Screen many resumes (PDFs and/or .zip files of PDFs) against one job description.
+    Streams SSE: `accepted`, one `result`/`error` per resume as it completes, then a
+    ranked `shortlist`.
+    """
+    files = []
+    for upload in resumes:
+        data = await upload.read()
+        try:
+            files += await asyncio.to_thread(_expand_batch_upload, upload.filename or "resume.pdf", data)
+        except zipfile.BadZipFile:
+            return JSONResponse(status_code=400, content={"detail": f"'{upload.filename}' is not a valid zip file"})
+    files = files[:RESUME_BATCH_MAX_FILES]
+    print(f"Resume batch: {len(files)} resumes for '{job_title or company_code}'")
+
+    submitted, rejected = [], []
+    for filename, contents in files:
+        try:
+            job = await _submit_resume_bytes(contents, filename, job_description, company_code)
+            submitted.append((filename, job))
+        except QueueFullError as e:
+            rejected.append({"filename": filename, "detail": f"Resume analyzer is busy: {e}"})
+
+    async def wait_for(filename, job):
+        await job.done.wait()
+        return filename, job
+
+    async def events():
+        yield _sse("accepted", {
+            "total": len(files),
+            "jobs": [{"filename": fn, "job_id": job.id} for fn, job in submitted],
+        })
+        for item in rejected:
+            yield _sse("error", item)
+
+        ranked = []
+        for next_done in asyncio.as_completed([wait_for(fn, job) for fn, job in submitted]):
+            filename, job = await next_done
+            if job.status == "failed":
+                yield _sse("error", {"filename": filename, "job_id": job.id, "detail": job.error})
+                continue
+            entry = {"filename": filename, "job_id": job.id, **job.result}
+            ranked.append(entry)
+            yield _sse("result", entry)
+
+        ranked.sort(key=lambda r: r.get("weighted_total", 0), reverse=True)
+        yield _sse("shortlist", {
+            "job_title": job_title,
+            "analyzed": len(ranked),
+            "failed": len(files) - len(ranked),
+            "shortlist": [
+                {"rank": i, "filename": r["filename"], "job_id": r["job_id"],
+                 "weighted_total": r.get("weighted_total"), "summary": r.get("summary", "")}
+                for i, r in enumerate(ranked[:max(shortlist_size, 0)], 1)
+            ],
+        })
 
-            f.write("\n" + "=" * 60 + "\n")
-            f.write("  END OF REPORT\n")
-            f.write("=" * 60 + "\n")
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
-        print(f"   Report saved to {report_path}")
 
-        # Note: Firestore save is handled by the frontend to avoid duplicates
+@app.get("/api/analyze-resume/stats")
+async def resume_analysis_stats():
+    """Queue depth and throughput of the resume analysis worker pool."""
+    return {**resume_job_queue.stats(), "ollama_max_concurrency": OLLAMA_MAX_CONCURRENCY,
+            "ollama_streaming": ollama_stream_metrics,
+            "cache": resume_cache.stats()}
 
-        return {
-            "criteria": criteria,
-            "weighted_total": round(weighted_total, 1),
-            "summary": summary,
-            "fact_check_questions": fact_check_questions,
-            "report_path": report_filename,
-        }
 
-    except json.JSONDecodeError as e:
-        print(f"JSON parse error: {e}")
-        traceback.print_exc()
-        return {"detail": f"Failed to parse AI response: {str(e)}"}
-    except Exception as e:
-        print(f"Resume analysis error: {e}")
-        traceback.print_exc()
-        return {"detail": f"Analysis failed: {str(e)}"}
+@app.get("/api/analyze-resume/jobs/{job_id}")
+async def get_resume_analysis(job_id: str):
+    """Status (and result once done) of a queued resume analysis."""
+    job = resume_job_queue.get(job_id)
+    if job is None:
+        return JSONResponse(status_code=404, content={"detail": "Job not found"})
+    return job.to_dict(resume_job_queue.position(job))
+
+
+@app.get("/api/analyze-resume/jobs/{job_id}/events")
+async def stream_resume_analysis(job_id: str):
+    """SSE progress for a queued resume analysis; the final event carries the result."""
+    job = resume_job_queue.get(job_id)
+    if job is None:
+        return JSONResponse(status_code=404, content={"detail": "Job not found"})
+
+    async def events():
+        queue = job.subscribe()
+        try:
+            while True:
+                event = await queue.get()
+                if event["stage"] in ("done", "failed"):
+                    yield _sse(event["stage"], job.to_dict())
+                    return
+                yield _sse("progress", event)
+        finally:
+            job.unsubscribe(queue)
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
 
 @app.get("/api/download-report")
@@ -1562,7 +2569,7 @@ async def performance_review():
     """Run the AI performance review pipeline."""
     try:
         from performance.pipeline import run_pipeline
-        results = run_pipeline()
+        results = await run_pipeline()
         return {"status": "success", "results": results}
     except Exception as e:
         print(f"Performance review error: {e}")
@@ -1795,8 +2802,19 @@ async def api_get_report_json(report_id: str):
 
 @app.on_event("startup")
 async def startup_event():
-    """Initialize ChromaDB on server startup."""
+    """Initialize ChromaDB, the employee directory listener and the chat broker on server startup."""
     init_chroma()
+    employee_directory.start_listener(firestore_db.collection("employees"))
+    await manager.start()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Release presence held by this worker and stop background workers."""
+    await manager.broker.close()
+    await resume_job_queue.stop()
+    pdf_extract.shutdown()
+    await http_clients.close_all()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,30 @@
+import json
+
+from employee_directory import EmployeeDirectory
+
+ROWS = [
+    {"id": "e1", "first_name": "Alex", "last_name": "Chen", "email": "alex.chen@openhire.com", "status": "active"},
+]
+
+
+def test_invalidate_keeps_stats_json_serializable():
+    loads = []
+
+    def load_rows():
+        loads.append(1)
+        return list(ROWS)
+
+    directory = EmployeeDirectory(load_rows, ttl_seconds=300)
+    assert directory.get("e1")["first_name"] == "Alex"
+
+    directory.invalidate()
+    stats = directory.stats()
+    # /api/health returns these through JSONResponse, which rejects inf/nan
+    json.dumps(stats, allow_nan=False)
+    assert stats["stale"] is True
+    assert stats["age_seconds"] >= 0
+
+    # The next access reloads and clears the flag
+    directory.get("e1")
+    assert len(loads) == 2
+    assert directory.stats()["stale"] is False
@@ -6,11 +6,12 @@ to detect cheating indicators that pure landmark detection cannot catch.
 """
 
 import os
-import json
 import base64
 import time
 from typing import Optional
 
+from llm_schemas import FrameAnalysis, gemini_config, validate
+
 import google.generativeai as genai
 
 # ── Gemini config ──────────────────────────────────────
@@ -84,24 +85,18 @@ async def analyze_frame(frame_base64: str) -> dict:
             generation_config=genai.GenerationConfig(
                 temperature=0.1,
                 max_output_tokens=1024,
+                **gemini_config(FrameAnalysis),
             )
         )
 
-        # Parse JSON from response
-        text = response.text.strip()
-        # Remove markdown code fences if present
-        if text.startswith("```"):
-            text = text.split("\n", 1)[1]
-            if text.endswith("```"):
-                text = text[:-3]
-            text = text.strip()
-
-        result = json.loads(text)
+        # Output is constrained to the FrameAnalysis schema
+        result = validate(FrameAnalysis, response.text).model_dump()
         result["timestamp"] = time.time()
         result["analysis_success"] = True
         return result
 
-    except json.JSONDecodeError as e:
+    except ValueError as e:
+        # json.JSONDecodeError / pydantic.ValidationError
         return {
             "analysis_success": False,
             "error": f"Failed to parse Gemini response as JSON: {e}",
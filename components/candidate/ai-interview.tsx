@@ -58,6 +58,10 @@ const BACKEND_URL = process.env.NEXT_PUBLIC_BACKEND_URL || "http://localhost:800
 const AUDIO_SAMPLE_RATE = 16000  // 16kHz for Gemini input
 const AUDIO_CHUNK_MS = 100       // Send audio every 100ms
 const VISION_INTERVAL_MS = 10000 // Send frame to Gemini Vision every 10s
+// Binary audio frames (backend/interview_audio.py): [type u8][version u8][sequence u16 BE][PCM16 LE]
+const FRAME_AUDIO = 0x01
+const FRAME_VERSION = 1
+const FRAME_HEADER_BYTES = 4
 
 export function AiInterview({
     onEnd,
@@ -66,6 +70,8 @@ export function AiInterview({
     sessionId = `session_${Date.now()}`,
 }: AiInterviewProps) {
     // ── State ────────────────────────────────────────
+    // Fixed for the whole interview; replaced by the server-issued id once pre-warming succeeds
+    const [activeSessionId, setActiveSessionId] = useState(sessionId)
     const [phase, setPhase] = useState<InterviewPhase>("prejoin")
     const [micOn, setMicOn] = useState(false)
     const [camOn, setCamOn] = useState(false)
@@ -94,6 +100,8 @@ export function AiInterview({
     const visionIntervalRef = useRef<ReturnType<typeof setInterval> | null>(null)
     const canvasRef = useRef<HTMLCanvasElement>(null)
     const nextPlayTimeRef = useRef<number>(0)
+    const audioSequenceRef = useRef<number>(0)
+    const prepareRequestedRef = useRef(false)
 
     // ── Proctoring Hook ──────────────────────────────
     const handleViolation = useCallback((event: { type: string; timestamp: number; message: string }) => {
@@ -178,6 +186,23 @@ export function AiInterview({
         onViolation: handleFaceTrackingViolation,
     })
 
+    // ── Pre-warm the Gemini session while on the pre-join screen (once) ──
+    useEffect(() => {
+        if (phase !== "prejoin" || prepareRequestedRef.current) return
+        prepareRequestedRef.current = true
+        fetch(`${BACKEND_URL}/api/interview/prepare`, {
+            method: "POST",
+            headers: { "Content-Type": "application/json" },
+            body: JSON.stringify({ resume_summary: resumeSummary, job_title: jobTitle }),
+        })
+            .then((res) => (res.ok ? res.json() : null))
+            .then((data) => {
+                // Only a socket opened with this id picks up the prepared session
+                if (data?.session_id) setActiveSessionId(data.session_id)
+            })
+            .catch((err) => console.warn("[WS] Session pre-warm failed:", err))
+    }, [phase, resumeSummary, jobTitle])
+
     // ── Auto-scroll transcript ───────────────────────
     useEffect(() => {
         transcriptEndRef.current?.scrollIntoView({ behavior: "smooth" })
@@ -246,7 +271,7 @@ export function AiInterview({
         }
     }, [phase, stream])
 
-    // ── Audio Processing: Capture mic → PCM → base64 → WebSocket ──
+    // ── Audio Processing: Capture mic → PCM → binary frame → WebSocket ──
     const startAudioCapture = useCallback(() => {
         if (!stream) return
 
@@ -254,8 +279,8 @@ export function AiInterview({
         audioContextRef.current = audioCtx
 
         const source = audioCtx.createMediaStreamSource(stream)
-        // Buffer size 4096 at 16kHz ≈ 256ms chunks
-        const processor = audioCtx.createScriptProcessor(4096, 1, 1)
+        // Buffer size 1024 at 16kHz ≈ 64ms chunks (one INTERVIEW_AUDIO_IN_FRAME_MS frame)
+        const processor = audioCtx.createScriptProcessor(1024, 1, 1)
         processorRef.current = processor
 
         processor.onaudioprocess = (e) => {
@@ -263,47 +288,34 @@ export function AiInterview({
             if (!micOn) return
 
             const inputData = e.inputBuffer.getChannelData(0)
-            // Convert Float32 [-1, 1] to Int16 PCM
-            const pcm16 = new Int16Array(inputData.length)
+            // Convert Float32 [-1, 1] to Int16 PCM, written straight after the frame header
+            const frame = new ArrayBuffer(FRAME_HEADER_BYTES + inputData.length * 2)
+            const header = new DataView(frame, 0, FRAME_HEADER_BYTES)
+            header.setUint8(0, FRAME_AUDIO)
+            header.setUint8(1, FRAME_VERSION)
+            header.setUint16(2, audioSequenceRef.current & 0xFFFF)
+            audioSequenceRef.current += 1
+            const pcm16 = new Int16Array(frame, FRAME_HEADER_BYTES)
             for (let i = 0; i < inputData.length; i++) {
                 const s = Math.max(-1, Math.min(1, inputData[i]))
                 pcm16[i] = s < 0 ? s * 0x8000 : s * 0x7FFF
             }
 
-            // Encode as base64
-            const bytes = new Uint8Array(pcm16.buffer)
-            let binary = ""
-            for (let i = 0; i < bytes.length; i++) {
-                binary += String.fromCharCode(bytes[i])
-            }
-            const base64 = btoa(binary)
-
-            wsRef.current.send(JSON.stringify({
-                type: "audio",
-                data: base64,
-            }))
+            wsRef.current.send(frame)
         }
 
         source.connect(processor)
         processor.connect(audioCtx.destination)
     }, [stream, micOn])
 
-    // ── Audio Playback: base64 PCM from Gemini → Speaker ──
-    const playAudioChunk = useCallback((base64Data: string) => {
+    // ── Audio Playback: PCM frames from Gemini → Speaker ──
+    const playAudioChunk = useCallback((pcm16: Int16Array) => {
         try {
             if (!playbackContextRef.current) {
                 playbackContextRef.current = new AudioContext({ sampleRate: 24000 })
             }
             const ctx = playbackContextRef.current
 
-            // Decode base64 to Int16 PCM
-            const binary = atob(base64Data)
-            const bytes = new Uint8Array(binary.length)
-            for (let i = 0; i < binary.length; i++) {
-                bytes[i] = binary.charCodeAt(i)
-            }
-            const pcm16 = new Int16Array(bytes.buffer)
-
             // Convert Int16 to Float32
             const float32 = new Float32Array(pcm16.length)
             for (let i = 0; i < pcm16.length; i++) {
@@ -365,8 +377,9 @@ export function AiInterview({
         setPhase("connecting")
 
         const ws = new WebSocket(
-            `${BACKEND_WS_URL}/ws/interview/${sessionId}?resume_summary=${encodeURIComponent(resumeSummary)}&job_title=${encodeURIComponent(jobTitle)}`
+            `${BACKEND_WS_URL}/ws/interview/${activeSessionId}?resume_summary=${encodeURIComponent(resumeSummary)}&job_title=${encodeURIComponent(jobTitle)}&audio_format=binary`
         )
+        ws.binaryType = "arraybuffer"
         wsRef.current = ws
 
         ws.onopen = () => {
@@ -374,6 +387,14 @@ export function AiInterview({
         }
 
         ws.onmessage = (event) => {
+            if (event.data instanceof ArrayBuffer) {
+                // Binary audio frame: PCM starts right after the header
+                const header = new DataView(event.data, 0, FRAME_HEADER_BYTES)
+                if (header.getUint8(0) === FRAME_AUDIO && header.getUint8(1) === FRAME_VERSION) {
+                    playAudioChunk(new Int16Array(event.data, FRAME_HEADER_BYTES))
+                }
+                return
+            }
             try {
                 const msg = JSON.parse(event.data)
 
@@ -389,9 +410,16 @@ export function AiInterview({
                         }])
                         break
 
-                    case "audio":
-                        playAudioChunk(msg.data)
+                    case "audio": {
+                        // Legacy base64 audio message
+                        const binary = atob(msg.data)
+                        const bytes = new Uint8Array(binary.length)
+                        for (let i = 0; i < binary.length; i++) {
+                            bytes[i] = binary.charCodeAt(i)
+                        }
+                        playAudioChunk(new Int16Array(bytes.buffer))
                         break
+                    }
 
                     case "transcript":
                         setTranscript((prev) => [...prev, {
@@ -464,7 +492,7 @@ export function AiInterview({
             setPermissionError("Failed to connect to interview server. Please try again.")
             setPhase("prejoin")
         }
-    }, [sessionId, resumeSummary, jobTitle, startAudioCapture, playAudioChunk, startVisionProctoring, phase])
+    }, [activeSessionId, resumeSummary, jobTitle, startAudioCapture, playAudioChunk, startVisionProctoring, phase])
 
     // ── Fetch Coding Problem ─────────────────────────
     const fetchCodingProblem = async (difficulty: string, topic: string) => {
@@ -601,7 +629,7 @@ export function AiInterview({
             const res = await fetch(`${BACKEND_URL}/api/generate-report`, {
                 method: "POST",
                 headers: { "Content-Type": "application/json" },
-                body: JSON.stringify({ session_id: sessionId }),
+                body: JSON.stringify({ session_id: activeSessionId }),
                 signal: controller.signal,
             })
             clearTimeout(timeout)
@@ -625,7 +653,7 @@ export function AiInterview({
         } finally {
             setReportGenerating(false)
         }
-    }, [sessionId, reportGenerating, reportId])
+    }, [activeSessionId, reportGenerating, reportId])
 
     useEffect(() => {
         if (phase === "complete" && !reportAttemptedRef.current && !reportId) {
@@ -773,7 +801,7 @@ export function AiInterview({
                             </div>
                         )}
                         <div className="text-xs text-[#9aa0a6] leading-relaxed">
-                            Session: {sessionId}
+                            Session: {activeSessionId}
                         </div>
                     </div>
 